@@ -0,0 +1,143 @@
+"""
+Internal document index: ingestion time and query latency on a large corpus
+
+Generates a synthetic corpus of strategy notes (Zipf-distributed vocabulary,
+one molecule per document), indexes it, then measures BM25 query latency,
+an incremental update after editing and deleting a few documents, and checks
+that edits and deletions are reflected in the results.
+
+Run with: python benchmarks/document_index_latency.py [--documents 20000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from document_index import DocumentIndex  # noqa: E402
+
+MOLECULES = [f'molecule{index:04d}' for index in range(500)]
+TOPICS = ['oncology', 'cardiology', 'formulation', 'pricing', 'tender', 'pediatric', 'biosimilar',
+          'reimbursement', 'manufacturing', 'licensing', 'trial', 'launch']
+
+
+def write_corpus(docs_dir, documents, words, seed=7):
+    rng = random.Random(seed)
+    vocabulary = [f'word{index}' for index in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    for index in range(documents):
+        molecule = MOLECULES[index % len(MOLECULES)]
+        body = rng.choices(vocabulary, weights, k=words)
+        for _ in range(6):
+            body.insert(rng.randrange(len(body)), molecule)
+            body.insert(rng.randrange(len(body)), rng.choice(TOPICS))
+        folder = os.path.join(docs_dir, f'team{index % 20}')
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f'note{index:06d}.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Field report on {molecule}\n{' '.join(body)}\n")
+
+
+def edit(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Make sure the change is visible even on filesystems with coarse mtimes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def disk_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 1024 / 1024
+
+
+def run(documents, words, queries, k):
+    work_dir = tempfile.mkdtemp(prefix='document_index_')
+    docs_dir = os.path.join(work_dir, 'docs')
+    failures = []
+    try:
+        write_corpus(docs_dir, documents, words)
+        index = DocumentIndex(os.path.join(work_dir, 'index'))
+
+        started = time.perf_counter()
+        counts = index.update(docs_dir)
+        ingest = time.perf_counter() - started
+        print(f"Indexed {counts['changed']} documents ({counts['passages']} passages) in {ingest:.1f} s, "
+              f"{disk_mb(os.path.join(work_dir, 'index')):.0f} MB on disk")
+
+        started = time.perf_counter()
+        index.update(docs_dir)
+        print(f"Update with nothing changed: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        rng = random.Random(11)
+        samples = []
+        index.search('warm up')
+        for _ in range(queries):
+            query = f"{rng.choice(MOLECULES)} {rng.choice(TOPICS)} strategy"
+            started = time.perf_counter()
+            index.search(query, k)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        print(f"Query latency over {queries} queries (top {k}): "
+              f"p50 {statistics.median(samples) * 1000:.2f} ms   "
+              f"p95 {samples[int(len(samples) * 0.95) - 1] * 1000:.2f} ms   max {samples[-1] * 1000:.2f} ms")
+
+        # Edit 1% of the documents, delete one and add one, then update incrementally
+        edited = os.path.join(docs_dir, 'team0', 'note000000.txt')
+        removed = os.path.join(docs_dir, 'team1', 'note000001.txt')
+        edit(edited, "Minutes: zanubrutinib partnering discussion with the oncology franchise.")
+        os.remove(removed)
+        edit(os.path.join(docs_dir, 'new.md'), "# Strategy deck\nquizartinib repurposing options in AML.")
+        for index_number in range(20, 20 + documents // 100):
+            path = os.path.join(docs_dir, f'team{index_number % 20}', f'note{index_number:06d}.txt')
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            edit(path, text + ' revised')
+        started = time.perf_counter()
+        counts = index.update(docs_dir)
+        print(f"Incremental update of {counts['changed']} changed and {counts['removed']} removed "
+              f"documents in {time.perf_counter() - started:.2f} s: {index.stats()}")
+
+        hits = index.search('zanubrutinib partnering')
+        if not hits or hits[0]['document'] != os.path.join('team0', 'note000000.txt'):
+            failures.append(f"edited document not found: {hits[:1]}")
+        if index.search('quizartinib')[:1] and index.search('quizartinib')[0]['document'] != 'new.md':
+            failures.append("new document not found")
+        if any(hit['document'] == os.path.join('team0', 'note000000.txt')
+               for hit in index.search(f'{MOLECULES[0]} field report', 50)):
+            failures.append("edited document still matches its old text")
+        if any(hit['document'] == os.path.join('team1', 'note000001.txt')
+               for hit in index.search(f'{MOLECULES[1]} field report', 50)):
+            failures.append("deleted document still matches")
+
+        # A second DocumentIndex (another worker) sees the update without reopening
+        other = DocumentIndex(os.path.join(work_dir, 'index'))
+        other.search('warm up')
+        edit(os.path.join(docs_dir, 'late.txt'), "ivosidenib field insight")
+        index.update(docs_dir)
+        if not other.search('ivosidenib'):
+            failures.append("another index instance did not pick up the update")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    print("OK" if not failures else f"{len(failures)} checks failed")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=400, help="Words per document")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.documents, args.words, args.queries, args.k) else 1)
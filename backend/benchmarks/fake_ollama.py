@@ -0,0 +1,357 @@
+"""
+Local fake Ollama server and fake web for benchmarks and checks
+
+FakeOllamaHandler answers Ollama and OpenAI-style chat/generate calls without a
+model: free-text answers name the molecules found in the prompt (or come from
+canned responses), structured calls get a sample instance of the requested JSON
+schema, and agents offered tools are first sent on a few tool calls. Latency is
+a fixed delay before the first token plus a per-token delay. It can also
+simulate Ollama's model loading (a one-off delay, repeated once the model's
+keep_alive runs out) and prompt evaluation with a prefix cache (a delay per
+prompt token not shared with a recent prompt).
+
+FakeWebHandler stands in for the internet: a Serper-compatible /search and
+/news API whose results link to generated pages on the same server, so the
+real search and scrape tools run against it (see SERPER_BASE_URL).
+
+Run standalone with:
+    python benchmarks/fake_ollama.py [--port 11434] [--web-port 8099] [--latency 0.2] [--token-latency 0.02]
+        [--load-latency 5] [--prompt-token-latency 0.001]
+then point OLLAMA_BASE_URL (and SERPER_BASE_URL) at it.
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse
+
+
+def sample_from_schema(schema, defs=None, name='value'):
+    """A small instance of a JSON schema: one item per array, placeholder scalars"""
+    defs = schema.get('$defs', {}) if defs is None else defs
+    if '$ref' in schema:
+        return sample_from_schema(defs[schema['$ref'].split('/')[-1]], defs, name)
+    if 'anyOf' in schema:
+        options = [option for option in schema['anyOf'] if option.get('type') != 'null']
+        return sample_from_schema(options[0], defs, name) if options else None
+    if 'enum' in schema:
+        return schema['enum'][0]
+
+    kind = schema.get('type')
+    if kind == 'object':
+        properties = schema.get('properties', {})
+        if not properties and isinstance(schema.get('additionalProperties'), dict):
+            return {'Sample': sample_from_schema(schema['additionalProperties'], defs, name)}
+        return {key: sample_from_schema(value, defs, key) for key, value in properties.items()}
+    if kind == 'array':
+        return [sample_from_schema(schema.get('items', {}), defs, name)]
+    if kind == 'integer':
+        return 1
+    if kind == 'number':
+        return 1.5
+    if kind == 'boolean':
+        return True
+    return f"Sample {name.replace('_', ' ')}"
+
+
+def keep_alive_seconds(value):
+    """Seconds of an Ollama keep_alive: a number or a duration like "30m"; None for forever"""
+    if isinstance(value, str) and value[-1:] in ('s', 'm', 'h'):
+        value = float(value[:-1]) * {'s': 1, 'm': 60, 'h': 3600}[value[-1]]
+    value = float(value)
+    return None if value < 0 else value
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Fake Ollama/OpenAI-compatible completion server. Configure it by
+    subclassing or setting class attributes:
+
+        molecules: Names looked for in the prompt for free-text answers
+        responses: Dict of prompt substring -> canned answer; '{molecules}' in
+            an answer is replaced by the molecules found
+        latency: Seconds before the first token
+        token_latency: Seconds per generated token (word)
+        load_latency: Seconds to load a model that isn't loaded, paid by the
+            first request for it (concurrent ones wait for the same load)
+        default_keep_alive: Seconds a model stays loaded after a request that
+            doesn't set keep_alive, as Ollama's OLLAMA_KEEP_ALIVE
+        prompt_token_latency: Seconds per prompt token (4 characters) to
+            evaluate, except for the prefix shared with a recent prompt
+        prefix_cache_slots: Recent prompts per model kept for prefix reuse
+        tool_calls: Tool calls made per agent task before answering, when the
+            request offers tools
+        web_url: Base URL of a FakeWebHandler server, for scrape tool arguments
+    """
+
+    molecules = []
+    responses = {}
+    latency = 0.05
+    token_latency = 0.0
+    load_latency = 0.0
+    default_keep_alive = 300
+    prompt_token_latency = 0.0
+    prefix_cache_slots = 4
+    tool_calls = 0
+    web_url = 'http://127.0.0.1:8099'
+    _state_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    @classmethod
+    def model_state(cls):
+        """
+        Loaded models and prompt counters of this handler class (one per
+        server started with start_server): loads, prompt_tokens, cached_tokens
+        """
+        with cls._state_lock:
+            if '_models' not in cls.__dict__:
+                cls._models = {'lock': threading.Lock(), 'models': {},
+                               'loads': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+            return cls._models
+
+    def _model(self, name):
+        state = self.model_state()
+        with state['lock']:
+            return state['models'].setdefault(name, {
+                'lock': threading.Lock(), 'expires': 0.0,
+                'prompts': deque(maxlen=self.prefix_cache_slots),
+            })
+
+    def load_model(self, name, keep_alive=None):
+        """
+        Load a model if it isn't loaded and extend its keep_alive
+
+        Returns:
+            Seconds spent loading it (0 if it was loaded)
+        """
+        model = self._model(name)
+        keep = keep_alive_seconds(self.default_keep_alive if keep_alive is None else keep_alive)
+        with model['lock']:
+            loaded = 0.0
+            if time.time() >= model['expires']:
+                time.sleep(self.load_latency)
+                loaded = self.load_latency
+                model['prompts'].clear()
+                with self.model_state()['lock']:
+                    self.model_state()['loads'] += 1
+            model['expires'] = float('inf') if keep is None else time.time() + keep
+            return loaded
+
+    def evaluate_prompt(self, name, prompt):
+        """Seconds to evaluate a prompt, with the prefix shared with a recent prompt cached"""
+        model = self._model(name)
+        with model['lock']:
+            cached = max((len(os.path.commonprefix([prompt, recent])) for recent in model['prompts']), default=0)
+            model['prompts'].append(prompt)
+        tokens, cached_tokens = len(prompt) // 4, cached // 4
+        state = self.model_state()
+        with state['lock']:
+            state['prompt_tokens'] += tokens
+            state['cached_tokens'] += cached_tokens
+        return (tokens - cached_tokens) * self.prompt_token_latency
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model, answer):
+        # OpenAI-style server-sent chunks, a few words at a time
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        words = answer.split(' ')
+        for index in range(0, len(words), 4):
+            piece = ' '.join(words[index:index + 4]) + (' ' if index + 4 < len(words) else '')
+            time.sleep(self.token_latency * len(words[index:index + 4]))
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': {'content': piece},
+                                                  'finish_reason': None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        done = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        self.close_connection = True
+
+    def answer(self, request, prompt):
+        """Free-text answer for a prompt"""
+        found = [m for m in self.molecules if re.search(rf'\b{re.escape(m)}\b', prompt)]
+        for key, canned in self.responses.items():
+            if key in prompt:
+                return canned.replace('{molecules}', ', '.join(found) or 'nothing')
+        return f"Thought: I now can give a great answer\nFinal Answer: Findings for {', '.join(found) or 'nothing'}"
+
+    def tool_call(self, request, prompt):
+        """The next tool call for an agent offered tools, or None once it has made enough"""
+        tools = [tool['function'] for tool in request.get('tools') or []]
+        made = sum(1 for message in request.get('messages', []) if message.get('role') == 'tool')
+        if not tools or made >= self.tool_calls:
+            return None
+
+        tool = tools[made % len(tools)]
+        topic = ' '.join(m for m in self.molecules if re.search(rf'\b{re.escape(m)}\b', prompt)) or 'molecule'
+        arguments = {
+            parameter: f"{self.web_url}/page/{quote(topic)}-{made}" if 'url' in parameter
+            else f"{topic} {tool['name'].replace('_', ' ')}"
+            for parameter in tool.get('parameters', {}).get('required', [])
+        }
+        return {'id': f'call_{made}', 'type': 'function',
+                'function': {'name': tool['name'], 'arguments': json.dumps(arguments)}}
+
+    def do_GET(self):
+        self._send_json({'models': [{'name': 'llama3:latest'}]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        model = request.get('model')
+        if self.path == '/api/generate' and not request.get('prompt'):
+            # Ollama loads (or with keep_alive 0, unloads) a model on an empty generate
+            if request.get('keep_alive') in (0, '0'):
+                self._model(model)['expires'] = 0.0
+                loaded = 0.0
+            else:
+                loaded = self.load_model(model, request.get('keep_alive'))
+            self._send_json({'model': model, 'done': True, 'response': '', 'done_reason': 'load',
+                             'load_duration': int(loaded * 1e9)})
+            return
+
+        prompt = request.get('prompt') or json.dumps(request.get('messages', []))
+        # keep_alive is an Ollama option; the OpenAI-compatible API always resets it to the default
+        loaded = self.load_model(model, None if self.path.startswith('/v1/') else request.get('keep_alive'))
+        prompt_seconds = self.evaluate_prompt(model, prompt)
+        response_format = request.get('response_format') or {}
+        call = self.tool_call(request, prompt)
+
+        if call:
+            answer = ''
+        elif response_format.get('type') == 'json_schema':
+            answer = json.dumps(sample_from_schema(response_format['json_schema']['schema']))
+        else:
+            answer = self.answer(request, prompt)
+        completion_tokens = max(1, len(answer.split()))
+        time.sleep(self.latency + prompt_seconds
+                   + (0 if request.get('stream') else self.token_latency * completion_tokens))
+
+        if self.path.startswith('/v1/') and request.get('stream') and not call:
+            self._send_stream(model, answer)
+        elif self.path.startswith('/v1/'):
+            message = {'role': 'assistant', 'content': answer or None}
+            if call:
+                message['tool_calls'] = [call]
+            self._send_json({
+                'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': message,
+                             'finish_reason': 'tool_calls' if call else 'stop'}],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': completion_tokens,
+                          'total_tokens': len(prompt) // 4 + completion_tokens},
+            })
+        elif self.path == '/api/chat':
+            self._send_json({'model': model, 'done': True, 'load_duration': int(loaded * 1e9),
+                             'message': {'role': 'assistant', 'content': answer}})
+        else:
+            self._send_json({'model': model, 'done': True, 'load_duration': int(loaded * 1e9),
+                             'response': answer})
+
+
+class FakeWebHandler(BaseHTTPRequestHandler):
+    """
+    Fake Serper API (POST /search, /news) and web pages (GET /page/<topic>)
+
+        latency: Seconds per request
+        results: Organic results per search
+        page_words: Words of filler text per page
+    """
+
+    latency = 0.05
+    results = 3
+    page_words = 300
+    lock = threading.Lock()
+    searches = 0
+    pages = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type):
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}').get('q', '')
+        with self.lock:
+            type(self).searches += 1
+        time.sleep(self.latency)
+        base = f"http://{self.headers['Host']}"
+        self._send(json.dumps({
+            'searchParameters': {'q': query, 'type': self.path.strip('/')},
+            'organic': [{'title': f'{query} result {index}', 'link': f'{base}/page/{quote(query)}-{index}',
+                         'snippet': f'Summary of {query}, result {index}.', 'position': index}
+                        for index in range(1, self.results + 1)],
+        }), 'application/json')
+
+    def do_GET(self):
+        topic = html.escape(unquote(urlparse(self.path).path.rsplit('/', 1)[-1]))
+        with self.lock:
+            type(self).pages += 1
+        time.sleep(self.latency)
+        filler = ' '.join(['lorem'] * self.page_words)
+        self._send(f"<html><head><title>{topic}</title></head>"
+                   f"<body><h1>{topic}</h1><p>{filler}</p></body></html>", 'text/html')
+
+
+def start_server(handler, port=0, **attributes):
+    """Serve a handler (subclassed with the given class attributes) on a daemon thread"""
+    if attributes:
+        handler = type(handler.__name__, (handler,), attributes)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--web-port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument('--token-latency', type=float, default=0.02, help="Seconds per generated token")
+    parser.add_argument('--load-latency', type=float, default=0.0, help="Seconds to load a model")
+    parser.add_argument('--keep-alive', type=float, default=300,
+                        help="Seconds a model stays loaded by default (Ollama's OLLAMA_KEEP_ALIVE)")
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0,
+                        help="Seconds per uncached prompt token")
+    parser.add_argument('--tool-calls', type=int, default=2, help="Tool calls per agent task")
+    parser.add_argument('--responses', help="JSON file of prompt substring -> canned answer")
+    parser.add_argument('--molecules', nargs='*', default=[], help="Molecule names echoed in answers")
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+    web = start_server(FakeWebHandler, args.web_port)
+    start_server(FakeOllamaHandler, args.port, latency=args.latency, token_latency=args.token_latency,
+                 load_latency=args.load_latency, default_keep_alive=args.keep_alive,
+                 prompt_token_latency=args.prompt_token_latency,
+                 tool_calls=args.tool_calls, responses=responses, molecules=args.molecules,
+                 web_url=f'http://127.0.0.1:{web.server_address[1]}')
+    print(f"Fake Ollama on http://127.0.0.1:{args.port}, fake web on http://127.0.0.1:{args.web_port}")
+    print(f"export OLLAMA_BASE_URL=http://127.0.0.1:{args.port} "
+          f"SERPER_BASE_URL=http://127.0.0.1:{args.web_port} SERPER_API_KEY=fake")
+    threading.Event().wait()
@@ -0,0 +1,134 @@
+"""
+Import time of main.py, from python -X importtime
+
+Runs `python -X importtime -c "import main"` a few times and reports the
+median total, main.py's slowest imports and whether the heavy agent
+libraries (crewai, crewai_tools, langchain_ollama, openai) were loaded.
+With --baseline, the same is measured on the backend of an earlier git
+revision for a before/after comparison. --warm-up also times main.warm_up(),
+the agent construction a worker does once before its first job.
+
+Run with: python benchmarks/import_time.py [--runs 5] [--baseline REVISION] [--warm-up]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('crewai', 'crewai_tools', 'langchain_ollama', 'openai')
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output into (module, depth, self_us, cumulative_us)
+    rows, in the order python printed them
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(backend_dir, runs):
+    """Median import time of main.py in backend_dir, and the rows of the median run"""
+    results = []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import main'],
+            cwd=backend_dir, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f"import main failed in {backend_dir}:\n{process.stderr[-2000:]}")
+        rows = parse_importtime(process.stderr)
+        total = next(cumulative for name, depth, _, cumulative in rows if name == 'main' and depth == 0)
+        results.append((total, rows))
+    results.sort(key=lambda result: result[0])
+    return results[len(results) // 2]
+
+
+def measure_warm_up(backend_dir):
+    """Seconds main.warm_up() takes after the import, or None if the tree has no warm_up"""
+    script = ("import time, main\n"
+              "started = time.perf_counter()\n"
+              "if hasattr(main, 'warm_up'):\n"
+              "    main.warm_up()\n"
+              "    print(time.perf_counter() - started)\n")
+    process = subprocess.run([sys.executable, '-c', script], cwd=backend_dir,
+                             capture_output=True, text=True, check=True)
+    output = process.stdout.strip().splitlines()
+    return float(output[-1]) if output else None
+
+
+def main_imports(rows):
+    """main's direct imports: the depth-1 rows python printed just before main's own row"""
+    index = next(i for i, (name, depth, _, _) in enumerate(rows) if name == 'main' and depth == 0)
+    children = []
+    for row in reversed(rows[:index]):
+        if row[1] == 0:
+            break
+        if row[1] == 1:
+            children.append(row)
+    return children
+
+
+def report(label, total, rows, top):
+    loaded = {name for name, _, _, _ in rows}
+    print(f"{label}: import main {total / 1e6:.2f} s")
+    print(f"  heavy modules loaded: {', '.join(m for m in HEAVY_MODULES if m in loaded) or 'none'}")
+    print("  slowest imports of main.py:")
+    for name, _, _, cumulative in sorted(main_imports(rows), key=lambda row: row[3], reverse=True)[:top]:
+        print(f"    {cumulative / 1000:9.1f} ms  {name}")
+
+
+def export_revision(revision, work_dir):
+    """Check the backend of a git revision out into work_dir; returns its path"""
+    root = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR,
+                          capture_output=True, text=True, check=True).stdout.strip()
+    prefix = os.path.relpath(BACKEND_DIR, root)
+    archive = subprocess.run(['git', 'archive', revision, prefix], cwd=root,
+                             capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', work_dir], input=archive, check=True)
+    return os.path.join(work_dir, prefix)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list")
+    parser.add_argument('--baseline', help="Git revision to compare against, e.g. HEAD~1")
+    parser.add_argument('--warm-up', action='store_true', help="Also time main.warm_up()")
+    args = parser.parse_args()
+
+    trees = [('current', BACKEND_DIR)]
+    work_dir = tempfile.mkdtemp(prefix='import_time_') if args.baseline else None
+    try:
+        if args.baseline:
+            trees.insert(0, (args.baseline, export_revision(args.baseline, work_dir)))
+
+        totals = {}
+        for label, backend_dir in trees:
+            started = time.perf_counter()
+            total, rows = measure(backend_dir, args.runs)
+            totals[label] = total
+            report(label, total, rows, args.top)
+            if args.warm_up:
+                seconds = measure_warm_up(backend_dir)
+                print(f"  warm_up(): {f'{seconds:.2f} s' if seconds is not None else 'n/a (agents built at import)'}")
+            print(f"  ({args.runs} runs in {time.perf_counter() - started:.1f} s)\n")
+
+        if args.baseline:
+            before, after = totals[args.baseline], totals['current']
+            print(f"import main: {before / 1e6:.2f} s -> {after / 1e6:.2f} s ({before / max(after, 1):.1f}x faster)")
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,210 @@
+"""
+Job logs: capture, rotation, tailing and server memory with chatty agents
+
+Runs jobs on a WorkerPool (without preloading main.py) whose target prints
+--megabytes of output from several threads, while the server side tails the
+log with read_log. Checks that every line arrives intact and in order, that
+rotation keeps the disk use under its cap, that a failing job's traceback
+lands in its log and that GET /api/research/<job_id>/logs pages through a
+log by offset. Reports the server's RSS growth against the old approach,
+subprocess.run(..., capture_output=True), which holds all the output in
+memory.
+
+Run with: python benchmarks/job_log_check.py [--megabytes 50] [--segment-kb 256] [--backups 4]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from job_logs import JobLog, list_segments, read_log  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+THREADS = 4
+LINE_PADDING = 'x' * 180
+
+
+def rss_mb():
+    """Resident memory of this process in MB, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def chatty(megabytes, fail=False):
+    """Worker target: print about `megabytes` of lines from a few threads, like verbose agents"""
+    lines = int(megabytes * 1024 * 1024 / (len(LINE_PADDING) + 30) / THREADS)
+
+    def talk(thread):
+        for index in range(lines):
+            print(f"thread {thread} line {index} {LINE_PADDING}")
+
+    threads = [threading.Thread(target=talk, args=(thread,)) for thread in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("no trailing newline", end='')
+    if fail:
+        raise ValueError("chatty job failed on purpose")
+    return lines * THREADS
+
+
+def tail(directory, stop, seen):
+    """Follow a log as a client of the logs endpoint would, until stop is set and it's drained"""
+    offset, state = 0, {'truncated': False, 'lines': 0, 'order_ok': True}
+    last = {thread: -1 for thread in range(THREADS)}
+    while True:
+        stopping = stop.is_set()
+        page = read_log(directory, offset)
+        if page['truncated']:
+            # Rotation got ahead of the reader; lines before this page are gone
+            state['truncated'] = True
+            last = {}
+        for record in page['lines']:
+            state['lines'] += 1
+            words = record['line'].split(' ')
+            if words[0] == 'thread':
+                thread, index = int(words[1]), int(words[3])
+                if thread in last and index != last[thread] + 1:
+                    state['order_ok'] = False
+                last[thread] = index
+        offset = page['next_offset']
+        if stopping and not page['lines']:
+            break
+        if not page['lines']:
+            time.sleep(0.01)
+    seen.update(state, offset=offset)
+
+
+def subprocess_rss_growth(megabytes):
+    """RSS growth of capturing the same output with subprocess.run(capture_output=True)"""
+    before = rss_mb()
+    script = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+              f"import job_log_check; job_log_check.chatty({megabytes})")
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True).stdout
+    growth = rss_mb() - before
+    del output
+    return growth
+
+
+def check_endpoint(work_dir):
+    """Page through a log over the Flask API"""
+    os.environ.update({'JOB_DB_PATH': os.path.join(work_dir, 'jobs.sqlite3'),
+                       'JOB_LOG_DIR': os.path.join(work_dir, 'api_logs'), 'RESULT_CACHE_TTL': '0'})
+    import server
+    client = server.app.test_client()
+    job, _ = server.create_job('Endpointmab', 'check', 'normal')
+    log = JobLog(os.path.join(server.JOB_LOG_DIR, job['id']), max_bytes=4096, backups=100)
+    for index in range(500):
+        log.write('stdout', f'line {index}')
+    log.close()
+
+    failures, received, offset = [], [], 0
+    while True:
+        page = client.get(f"/api/research/{job['id']}/logs?since={offset}&limit=2000").get_json()
+        if not page['lines']:
+            break
+        received += [record['line'] for record in page['lines']]
+        offset = page['next_offset']
+    if received != [f'line {index}' for index in range(500)]:
+        failures.append(f"endpoint paged {len(received)} of 500 lines")
+    if client.get('/api/research/nope/logs').status_code != 404:
+        failures.append("unknown job did not get a 404")
+    if client.get(f"/api/research/{job['id']}/logs?since=x").status_code != 400:
+        failures.append("a bad offset did not get a 400")
+    for query in ('since=-1', 'limit=0', 'limit=-5'):
+        if client.get(f"/api/research/{job['id']}/logs?{query}").status_code != 400:
+            failures.append(f"{query} did not get a 400")
+    return failures
+
+
+def run(megabytes, segment_kb, backups):
+    work_dir = tempfile.mkdtemp(prefix='job_log_check_')
+    failures = []
+    pool = WorkerPool(size=1, job_timeout=600, preload=['job_log_check'],
+                      log_max_bytes=segment_kb * 1024, log_backups=backups)
+    try:
+        pool.wait_until_ready()
+
+        # A chatty job, tailed while it runs
+        directory = os.path.join(work_dir, 'chatty')
+        stop, seen, peak = threading.Event(), {}, [rss_mb() or 0.0]
+        reader = threading.Thread(target=tail, args=(directory, stop, seen))
+        before = rss_mb()
+        started = time.perf_counter()
+        future = pool.submit('job_log_check:chatty', args=(megabytes,), log_dir=directory)
+        reader.start()
+        while not future.done():
+            peak[0] = max(peak[0], rss_mb() or 0.0)
+            time.sleep(0.05)
+        printed = future.result()
+        seconds = time.perf_counter() - started
+        stop.set()
+        reader.join()
+
+        disk = sum(os.path.getsize(path) for _, path in list_segments(directory))
+        cap = segment_kb * 1024 * (backups + 1)
+        print(f"Job printed {printed} lines ({megabytes} MB) in {seconds:.1f}s; log offset {seen['offset'] / 1e6:.1f} MB, "
+              f"{len(list_segments(directory))} segments, {disk / 1024:.0f} KB on disk (cap {cap / 1024:.0f} KB)")
+        print(f"Tail read {seen['lines']} records, truncated by rotation: {seen['truncated']}")
+        if disk > cap:
+            failures.append(f"log uses {disk} bytes, over its {cap} byte cap")
+        if not seen['order_ok']:
+            failures.append("tail saw lines out of order or missing")
+        if not seen['truncated'] and seen['lines'] != printed + 1:
+            failures.append(f"tail read {seen['lines']} records, expected {printed + 1}")
+        last = read_log(directory, max(0, seen['offset'] - 200))['lines']
+        if not last or last[-1]['line'] != 'no trailing newline':
+            failures.append("the job's unterminated last line was lost")
+
+        # A failing job's traceback goes to its log, not the server's terminal
+        directory = os.path.join(work_dir, 'failing')
+        try:
+            pool.submit('job_log_check:chatty', args=(0.01,), kwargs={'fail': True}, log_dir=directory).result()
+            failures.append("failing job did not fail")
+        except RuntimeError:
+            pass
+        records = read_log(directory, 0, 10 * 1024 * 1024)['lines']
+        if not any(r['stream'] == 'stderr' and 'chatty job failed on purpose' in r['line'] for r in records):
+            failures.append("traceback missing from the failing job's log")
+
+        growth = peak[0] - before
+        print(f"Server RSS growth while the job ran: {growth:.1f} MB")
+        old_growth = subprocess_rss_growth(megabytes)
+        print(f"Server RSS growth with subprocess.run(capture_output=True): {old_growth:.1f} MB")
+        if growth > 20:
+            failures.append(f"server RSS grew {growth:.0f} MB")
+
+        failures += check_endpoint(work_dir)
+    finally:
+        pool.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    print("OK" if not failures else f"{len(failures)} checks failed")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megabytes', type=float, default=50, help="Output the chatty job prints")
+    parser.add_argument('--segment-kb', type=int, default=256, help="JOB_LOG_MAX_BYTES, in KB")
+    parser.add_argument('--backups', type=int, default=4, help="JOB_LOG_BACKUPS")
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.megabytes, args.segment_kb, args.backups) else 1)
@@ -0,0 +1,139 @@
+"""
+Job store lookup latency with a large job history
+
+Fills a fresh SQLite job store with historical jobs (each with a compressed
+report) and measures status lookups for hot (in-memory) and cold jobs, result
+lookups, and per-molecule history queries. Also checks that a status update
+racing a lookup that misses the in-memory cache is never lost from the cache.
+
+Run with: python benchmarks/job_store_latency.py [--jobs 100000] [--lookups 2000] [--race-rounds 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from job_store import JobStore
+
+MOLECULES = ['Metformin', 'Atorvastatin', 'Lisinopril', 'Amlodipine', 'Omeprazole',
+             'Levothyroxine', 'Simvastatin', 'Losartan', 'Gabapentin', 'Sertraline']
+
+REPORT_SECTION = """## {heading}
+- Market size and growth trends for {molecule} across regions
+- Competitive landscape, key players and pricing dynamics
+| Year | Market (USD bn) | CAGR |
+|------|-----------------|------|
+| 2023 | 12.4            | 4.1% |
+"""
+
+
+def make_report(molecule):
+    headings = ['Executive Summary', 'Market Analysis', 'Patent Landscape',
+                'Clinical Pipeline', 'Trade and Supply Chain', 'Recommendations']
+    return '\n'.join(REPORT_SECTION.format(heading=h, molecule=molecule) for h in headings * 8)
+
+
+def timed(samples, fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    samples.append(time.perf_counter() - started)
+
+
+class SlowReadStore(JobStore):
+    """Job store that pauses after reading a row, so an update can land in between"""
+
+    def _row_to_job(self, row):
+        time.sleep(0.002)
+        return super()._row_to_job(row)
+
+
+def check_hot_cache_race(directory, rounds):
+    """
+    Race get() of an uncached job against update() finishing it; returns how
+    many rounds then still served the stale 'running' row from the cache
+    """
+    store = SlowReadStore(os.path.join(directory, 'race.sqlite3'))
+    stale = 0
+    for _ in range(rounds):
+        job_id = str(uuid.uuid4())
+        store.create({'id': job_id, 'molecule_name': 'Metformin', 'status': 'running',
+                      'started_at': time.time(), 'cache': {'hit': False}, 'attached_callers': 1,
+                      'execution_id': job_id, 'client_id': 'bench', 'priority': 'normal'})
+        with store._hot_lock:
+            store._hot.pop(job_id, None)  # as if evicted: the next get misses
+        reader = threading.Thread(target=store.get, args=(job_id,))
+        reader.start()
+        time.sleep(0.001)  # let the reader's SELECT run first
+        store.update(job_id, status='complete')
+        reader.join()
+        stale += store.get(job_id)['status'] != 'complete'
+    return stale
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return f"p50 {pick(0.5):8.1f} us   p95 {pick(0.95):8.1f} us   p99 {pick(0.99):8.1f} us"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--race-rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'jobs.sqlite3')
+    store = JobStore(path, hot_size=1000, max_jobs=args.jobs * 2)
+
+    started = time.perf_counter()
+    job_ids = []
+    now = time.time()
+    for index in range(args.jobs):
+        molecule = random.choice(MOLECULES)
+        job_id = str(uuid.uuid4())
+        started_at = now - (args.jobs - index) * 10
+        store.create({
+            'id': job_id, 'molecule_name': molecule, 'status': 'complete',
+            'result': make_report(molecule), 'error': None, 'started_at': started_at,
+            'finished_at': started_at + 600, 'cache': {'hit': False}, 'attached_callers': 1,
+            'execution_id': job_id, 'client_id': 'bench', 'priority': 'normal',
+        })
+        job_ids.append(job_id)
+    fill_seconds = time.perf_counter() - started
+
+    hot_ids = job_ids[-1000:]
+    cold_ids = job_ids[:-1000]
+    cold_store = JobStore(path, hot_size=0)  # every lookup goes to SQLite
+    hot, cold, result, history = [], [], [], []
+    for _ in range(args.lookups):
+        timed(hot, store.get, random.choice(hot_ids))
+    for _ in range(args.lookups):
+        timed(cold, cold_store.get, random.choice(cold_ids))
+    for _ in range(args.lookups):
+        timed(result, store.get_result, random.choice(job_ids))
+    for _ in range(args.lookups // 10):
+        timed(history, store.find_by_molecule, random.choice(MOLECULES))
+
+    raw_size = len(make_report('Metformin').encode('utf-8'))
+    db_size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    print(f"{args.jobs} historical jobs inserted in {fill_seconds:.1f} s")
+    print(f"  database size {db_size / 1e6:.1f} MB (reports {raw_size / 1024:.1f} KB raw each)")
+    print(f"  status, hot job        {percentiles(hot)}")
+    print(f"  status, cold job       {percentiles(cold)}")
+    print(f"  result (decompressed)  {percentiles(result)}")
+    print(f"  last 20 for molecule   {percentiles(history)}")
+
+    stale = check_hot_cache_race(directory, args.race_rounds)
+    print(f"  update racing a cache miss: {stale} of {args.race_rounds} lookups left stale")
+    sys.exit(1 if stale else 0)
@@ -0,0 +1,426 @@
+"""
+Load benchmark: drive the API server with concurrent jobs against a fake Ollama
+
+Starts the fake Ollama and fake web servers from fake_ollama.py, points the
+worker pool, search and scrape tools at them and runs a load scenario through
+the Flask API. Every job is followed over its event stream. Reports end-to-end
+latency percentiles, throughput, time to the first section and first report,
+per-task durations and time to first token, server/worker memory and the fake
+model's loads and prompt cache hits, and appends the run to a JSON-lines
+history so runs can be compared over time.
+
+--load-latency and --prompt-token-latency make the fake Ollama simulate model
+loading and prompt evaluation with a prefix cache; compare --warm-up (the
+server loads the models at startup, as it does by default) with --no-warm-up
+to see the cold-start cost.
+
+Scenarios:
+    burst       all jobs submitted at once
+    staggered   one job every 1/--rate seconds
+    duplicates  jobs over a third as many molecules, submitted at once
+    batch       one batch request for all the molecules
+
+Run with: python benchmarks/load_benchmark.py [--scenario burst] [--jobs 8] [--workers 2]
+          python benchmarks/load_benchmark.py --load-latency 5 --prompt-token-latency 0.001 --no-warm-up
+          python benchmarks/load_benchmark.py --history
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_ollama import FakeOllamaHandler, FakeWebHandler, start_server  # noqa: E402
+from job_logs import list_segments  # noqa: E402
+
+SCENARIOS = ('burst', 'staggered', 'duplicates', 'batch')
+RESULTS_PATH = os.path.join(BACKEND_DIR, 'data', 'benchmarks', 'load_results.jsonl')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+# ============================================================================
+# MEMORY
+# ============================================================================
+
+def rss_mb(pid='self'):
+    """Resident memory of a process in MB, or None where /proc isn't available"""
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def child_pids():
+    pids = set()
+    try:
+        for task in os.listdir('/proc/self/task'):
+            with open(f'/proc/self/task/{task}/children', encoding='utf-8') as f:
+                pids.update(f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+class MemorySampler:
+    """Peak resident memory of this (server) process and of its worker processes"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.server_peak = 0.0
+        self.workers_peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        self.server_peak = max(self.server_peak, rss_mb() or 0.0)
+        workers = sum(rss_mb(pid) or 0.0 for pid in child_pids())
+        self.workers_peak = max(self.workers_peak, workers)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def follow(client, job_id, submitted, record):
+    """Follow a job's event stream, noting when its first section and report arrive"""
+    record.update({'job_id': job_id, 'submitted': submitted, 'tasks': {}, 'first_tokens': {}, 'status': None})
+    response = client.get(f'/api/research/events/{job_id}')
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if not line.startswith('data: '):
+                continue
+            event = json.loads(line[6:])
+            now = time.perf_counter()
+            if event['type'] == 'task_finished':
+                record['tasks'][event['task']] = event['duration_seconds']
+                if event.get('first_token_seconds') is not None:
+                    record['first_tokens'][event['task']] = event['first_token_seconds']
+                record.setdefault('first_section', now)
+            elif event['type'] in ('job_complete', 'job_error', 'job_cancelled'):
+                record['finished'] = now
+                record['status'] = event['type'][len('job_'):]
+                response.close()
+                return
+    record['status'] = 'lost'
+
+
+def run_load(client, scenario, molecules, rate):
+    """Submit the scenario's jobs and follow each one to the end"""
+    records, followers = [], []
+
+    def track(job_id, submitted):
+        record = {}
+        records.append(record)
+        thread = threading.Thread(target=follow, args=(client, job_id, submitted, record), daemon=True)
+        thread.start()
+        followers.append(thread)
+
+    started = time.perf_counter()
+    if scenario == 'batch':
+        submitted = time.perf_counter()
+        response = client.post('/api/research/batch', json={'molecule_names': molecules})
+        for job in response.get_json()['jobs']:
+            track(job['job_id'], submitted)
+    else:
+        rejected = 0
+        for index, molecule in enumerate(molecules):
+            if scenario == 'staggered':
+                time.sleep(max(0.0, started + index / rate - time.perf_counter()))
+            submitted = time.perf_counter()
+            response = client.post('/api/research/start', json={'molecule_name': molecule})
+            if response.status_code == 429:
+                rejected += 1
+                continue
+            track(response.get_json()['job_id'], submitted)
+        if rejected:
+            print(f"⚠️  {rejected} jobs were rejected with 429 (raise RESEARCH_MAX_PENDING)")
+
+    for thread in followers:
+        thread.join()
+    return started, records
+
+
+def summarize(started, records):
+    """Latency percentiles, throughput, first results, per-task durations and time to first token of a run"""
+    done = [r for r in records if r['status'] == 'complete']
+    summary = {'completed': len(done), 'failed': len(records) - len(done)}
+    if not done:
+        return summary
+
+    latencies = [r['finished'] - r['submitted'] for r in done]
+    last = max(r['finished'] for r in done)
+    first_sections = [r['first_section'] - r['submitted'] for r in done if 'first_section' in r]
+    summary.update({
+        'latency_seconds': {name: round(percentile(latencies, fraction), 3)
+                            for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p95', 0.95),
+                                                   ('p99', 0.99), ('max', 1.0))},
+        'throughput_jobs_per_minute': round(len(done) / (last - started) * 60, 2),
+        'first_report_seconds': round(min(r['finished'] for r in done) - started, 3),
+        'first_section_seconds_p50': round(statistics.median(first_sections), 3) if first_sections else None,
+        'wall_seconds': round(last - started, 3),
+    })
+
+    durations, first_tokens = {}, {}
+    for record in done:
+        for task, seconds in record['tasks'].items():
+            durations.setdefault(task, []).append(seconds)
+        for task, seconds in record['first_tokens'].items():
+            first_tokens.setdefault(task, []).append(seconds)
+    summary['tasks'] = {task: {'mean': round(statistics.mean(values), 3),
+                               'p95': round(percentile(values, 0.95), 3),
+                               'first_token_p50': round(statistics.median(first_tokens[task]), 3)
+                               if task in first_tokens else None}
+                        for task, values in durations.items()}
+    all_first_tokens = [seconds for values in first_tokens.values() for seconds in values]
+    summary['first_token_seconds_p50'] = round(statistics.median(all_first_tokens), 3) if all_first_tokens else None
+    return summary
+
+
+# ============================================================================
+# RESULTS HISTORY
+# ============================================================================
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_result(path, result):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + '\n')
+
+
+def load_results(path, scenario=None):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    return [r for r in results if scenario is None or r['scenario'] == scenario]
+
+
+def print_history(results):
+    """One line per run, oldest first"""
+    print(f"   {'when':<16} {'commit':<9} {'label':<12} {'scenario':<10} {'jobs':>4} {'wkr':>3} "
+          f"{'p50 s':>7} {'p95 s':>7} {'jobs/min':>8} {'first s':>7} {'ttft s':>6} {'server MB':>9} {'fail':>4}")
+    for r in results:
+        latency = r.get('latency_seconds') or {}
+        fmt = lambda value, spec: format(value, spec) if value is not None else '-'
+        print(f"   {r['timestamp'][:16]:<16} {r.get('commit') or '-':<9} {r.get('label') or '-':<12} "
+              f"{r['scenario']:<10} {r['jobs']:>4} {r['workers']:>3} "
+              f"{fmt(latency.get('p50'), '7.2f'):>7} {fmt(latency.get('p95'), '7.2f'):>7} "
+              f"{fmt(r.get('throughput_jobs_per_minute'), '8.1f'):>8} "
+              f"{fmt(r.get('first_report_seconds'), '7.2f'):>7} "
+              f"{fmt(r.get('first_token_seconds_p50'), '6.2f'):>6} "
+              f"{fmt(r['memory_mb']['server_peak'], '9.0f'):>9} {r['failed']:>4}")
+
+
+def print_summary(result):
+    print(f"\n{result['scenario']}: {result['jobs']} jobs on {result['workers']} workers, "
+          f"{result['completed']} complete, {result['failed']} failed")
+    if result.get('latency_seconds'):
+        latency = result['latency_seconds']
+        print(f"   latency      p50 {latency['p50']:.2f}s  p90 {latency['p90']:.2f}s  "
+              f"p95 {latency['p95']:.2f}s  p99 {latency['p99']:.2f}s  max {latency['max']:.2f}s")
+        print(f"   throughput   {result['throughput_jobs_per_minute']:.1f} jobs/min "
+              f"over {result['wall_seconds']:.1f}s")
+        first_section = result['first_section_seconds_p50']
+        print(f"   first report {result['first_report_seconds']:.2f}s after the start; first section "
+              f"p50 {first_section if first_section is not None else '-'}s after submission")
+        print(f"   {'task':<20} {'mean s':>7} {'p95 s':>7} {'ttft p50 s':>10}")
+        for task, stats in result['tasks'].items():
+            first_token = stats.get('first_token_p50')
+            print(f"   {task:<20} {stats['mean']:>7.2f} {stats['p95']:>7.2f} "
+                  f"{f'{first_token:.2f}' if first_token is not None else '-':>10}")
+    model = result['model']
+    warm_up = model['warm_up_seconds']
+    print(f"   model        {model['loads']} loads, {model['cached_prompt_fraction']:.0%} of prompt tokens "
+          f"cached, warm-up {f'{warm_up:.1f}s before the first job' if warm_up is not None else 'off'}")
+    if result.get('log_kb_per_job') is not None:
+        print(f"   job logs     {result['log_kb_per_job']:.0f} KB of worker output per execution")
+    memory = result['memory_mb']
+    print(f"   memory       server peak {memory['server_peak']:.0f} MB, "
+          f"workers peak {memory['workers_peak']:.0f} MB")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def log_bytes(directory):
+    """Bytes a job has written to its log, including rotated-away segments"""
+    segments = list_segments(directory)
+    return segments[-1][0] + os.path.getsize(segments[-1][1]) if segments else 0
+
+
+def configure(args, work_dir, ollama_url, web_url):
+    """Point the server and its workers (which inherit the environment) at the fakes"""
+    os.environ.update({
+        'OLLAMA_BASE_URL': ollama_url,
+        'SERPER_BASE_URL': web_url,
+        'SERPER_API_KEY': 'fake',
+        # The fake web listens on localhost, which the tools' SSRF guard would refuse
+        'CREWAI_TOOLS_ALLOW_UNSAFE_PATHS': 'true',
+        'RESEARCH_WORKERS': str(args.workers),
+        'RESEARCH_MAX_CONCURRENT': str(args.workers),
+        'RESEARCH_MAX_PENDING': str(max(args.jobs, 20)),
+        'RESEARCH_MODE': args.mode,
+        'STRUCTURED_OUTPUTS': 'true' if args.structured else 'false',
+        'OLLAMA_WARM_UP': 'true' if args.warm_up else 'false',
+        # Every job must really run, not be answered from an earlier run's caches
+        'RESULT_CACHE_TTL': '0',
+        'LLM_CACHE_ENABLED': 'false',
+        'SECTION_STORE_ENABLED': 'false',
+        'AGENT_METRICS_PATH': '',
+        'HTTP_CACHE_PATH': os.path.join(work_dir, 'http.sqlite3'),
+        'JOB_DB_PATH': os.path.join(work_dir, 'jobs.sqlite3'),
+        'JOB_LOG_DIR': os.path.join(work_dir, 'logs'),
+        'RESEARCH_REPORTS_DIR': os.path.join(work_dir, 'reports'),
+    })
+
+
+def run(args):
+    if args.scenario == 'duplicates':
+        molecules = [f'Compound{index % max(1, args.jobs // 3):03d}' for index in range(args.jobs)]
+    else:
+        molecules = [f'Compound{index:03d}' for index in range(args.jobs)]
+    responses = {}
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+
+    web = start_server(FakeWebHandler, latency=args.web_latency)
+    web_url = f'http://127.0.0.1:{web.server_address[1]}'
+    ollama = start_server(FakeOllamaHandler, molecules=sorted(set(molecules)), responses=responses,
+                          latency=args.latency, token_latency=args.token_latency,
+                          load_latency=args.load_latency, prompt_token_latency=args.prompt_token_latency,
+                          tool_calls=args.tool_calls, web_url=web_url)
+    work_dir = tempfile.mkdtemp(prefix='load_benchmark_')
+    configure(args, work_dir, f'http://127.0.0.1:{ollama.server_address[1]}', web_url)
+
+    import server
+    client = server.app.test_client()
+    server.get_worker_pool().wait_until_ready()
+    warm_up_seconds = None
+    if args.warm_up:
+        # As at server startup, but wait for the models to load before sending jobs
+        warm_up_started = time.perf_counter()
+        server.start_model_warm_up().join()
+        server.model_warmer.ready.wait()
+        warm_up_seconds = round(time.perf_counter() - warm_up_started, 3)
+
+    memory = MemorySampler()
+    memory.start()
+    try:
+        started, records = run_load(client, args.scenario, molecules, args.rate)
+        log_kb = [log_bytes(os.path.join(server.JOB_LOG_DIR, name)) / 1024
+                  for name in os.listdir(server.JOB_LOG_DIR)] if os.path.isdir(server.JOB_LOG_DIR) else []
+    finally:
+        memory.stop()
+        if server.model_warmer is not None:
+            server.model_warmer.stop()
+        server.get_worker_pool().shutdown()
+        web.shutdown()
+        ollama.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    model_state = ollama.RequestHandlerClass.model_state()
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'label': args.label,
+        'scenario': args.scenario,
+        'jobs': args.jobs,
+        'workers': args.workers,
+        'mode': args.mode,
+        'structured': args.structured,
+        'latency': args.latency,
+        'token_latency': args.token_latency,
+        'tool_calls': args.tool_calls,
+        'web_latency': args.web_latency,
+        'load_latency': args.load_latency,
+        'prompt_token_latency': args.prompt_token_latency,
+        'warm_up': args.warm_up,
+        **summarize(started, records),
+        'log_kb_per_job': round(statistics.mean(log_kb), 1) if log_kb else None,
+        'model': {'loads': model_state['loads'], 'warm_up_seconds': warm_up_seconds,
+                  'cached_prompt_fraction': round(model_state['cached_tokens']
+                                                  / max(1, model_state['prompt_tokens']), 3)},
+        'memory_mb': {'server_peak': round(memory.server_peak, 1),
+                      'workers_peak': round(memory.workers_peak, 1)},
+    }
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', choices=SCENARIOS, default='burst')
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=0.5, help="Jobs per second (staggered)")
+    parser.add_argument('--mode', choices=['sequential', 'parallel'], default='parallel')
+    parser.add_argument('--structured', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--latency', type=float, default=0.1, help="Fake model seconds before the first token")
+    parser.add_argument('--token-latency', type=float, default=0.005, help="Fake model seconds per token")
+    parser.add_argument('--load-latency', type=float, default=0.0, help="Fake model seconds to load a model")
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0,
+                        help="Fake model seconds per prompt token not in its prefix cache")
+    parser.add_argument('--warm-up', action=argparse.BooleanOptionalAction, default=True,
+                        help="Load the models before sending jobs (OLLAMA_WARM_UP)")
+    parser.add_argument('--tool-calls', type=int, default=2, help="Tool calls per agent task")
+    parser.add_argument('--web-latency', type=float, default=0.05, help="Fake web seconds per request")
+    parser.add_argument('--responses', help="JSON file of prompt substring -> canned answer")
+    parser.add_argument('--label', help="Tag stored with the run, e.g. the change being measured")
+    parser.add_argument('--results', default=RESULTS_PATH, help="JSON-lines run history")
+    parser.add_argument('--history', action='store_true', help="Print the stored runs and exit")
+    args = parser.parse_args()
+
+    if args.history:
+        print_history(load_results(args.results))
+        sys.exit(0)
+
+    os.chdir(BACKEND_DIR)
+    result = run(args)
+    save_result(args.results, result)
+    print_summary(result)
+    print(f"\nRecent {args.scenario} runs ({args.results}):")
+    print_history(load_results(args.results, args.scenario)[-5:])
+    sys.exit(0 if result['failed'] == 0 else 1)
@@ -0,0 +1,206 @@
+"""
+Check Ollama endpoint routing against several local stub servers
+
+Starts a few stub Ollama servers and sends concurrent completions through
+routed crewAI LLM objects. Verifies that calls spread over every endpoint,
+that no endpoint ever sees more than its cap at once, that round-robin takes
+turns, that pinned LLMs only use their endpoints, that calls fail over when an
+endpoint goes away or stops answering, that a health check brings a
+recovered endpoint back, and that with a shared slot directory the caps hold
+across processes and a killed process's slots are freed.
+
+Run with: python benchmarks/ollama_router_check.py [--calls 24] [--cap 2]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crewai import LLM  # noqa: E402
+
+from ollama_router import Endpoint, OllamaRouter, SlotLocks, route_completions  # noqa: E402
+from fake_ollama import FakeOllamaHandler  # noqa: E402
+
+MODEL = 'ollama/llama3:latest'
+MESSAGES = [{'role': 'user', 'content': 'Summarize the findings.'}]
+
+
+class CountingStubHandler(FakeOllamaHandler):
+    """Stub Ollama server that records how many completions it has in flight"""
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests_seen += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            super().do_POST()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def start_stub(port=0, latency=0.1):
+    handler = type('Stub', (CountingStubHandler,), {
+        'latency': latency, 'lock': threading.Lock(),
+        'requests_seen': 0, 'in_flight': 0, 'max_in_flight': 0,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop_stub(server):
+    server.shutdown()
+    server.server_close()
+
+
+def routed_llm(router, names=None, timeout=None):
+    llm = LLM(model=MODEL, base_url='http://127.0.0.1:1', temperature=0.0)
+    return route_completions(
+        llm, router,
+        lambda url: LLM(model=MODEL, base_url=url, temperature=0.0, timeout=timeout, max_retries=0),
+        names
+    )
+
+
+def calls_in_process(url, cap, slot_dir, count):
+    """Process target: send `count` concurrent routed calls to one capped endpoint"""
+    router = OllamaRouter([Endpoint('shared', url, cap)], slot_dir=slot_dir)
+    llm = routed_llm(router)
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        list(executor.map(lambda _: llm.call(MESSAGES), range(count)))
+
+
+def hold_slots(url, cap, slot_dir, held):
+    """Process target: take every slot of an endpoint and keep them until killed"""
+    slots = SlotLocks(slot_dir)
+    locks = [slots.try_acquire(Endpoint('shared', url, cap)) for _ in range(cap)]
+    held.set()
+    time.sleep(600)
+    return locks
+
+
+def run(calls, cap):
+    stubs = {name: start_stub() for name in ('a', 'b', 'c')}
+    urls = {name: f'http://127.0.0.1:{server.server_address[1]}' for name, server in stubs.items()}
+    failures = []
+
+    def check(condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    def seen(name):
+        return stubs[name].RequestHandlerClass.requests_seen
+
+    def call_all(llm, count, workers):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda _: llm.call(MESSAGES), range(count)))
+
+    print("Least-loaded routing with per-endpoint caps")
+    router = OllamaRouter([Endpoint(name, url, cap) for name, url in urls.items()])
+    started = time.perf_counter()
+    results = call_all(routed_llm(router), calls, workers=calls)
+    elapsed = time.perf_counter() - started
+    check(all('Findings' in str(result) for result in results), f"{calls} concurrent calls answered in {elapsed:.1f}s")
+    peaks = {name: server.RequestHandlerClass.max_in_flight for name, server in stubs.items()}
+    check(all(peak <= cap for peak in peaks.values()), f"no endpoint above its cap of {cap} (peaks {peaks})")
+    check(all(seen(name) > 0 for name in stubs),
+          f"every endpoint served calls ({', '.join(f'{name}={seen(name)}' for name in stubs)})")
+
+    print("Round-robin takes turns")
+    before = {name: seen(name) for name in stubs}
+    rr_router = OllamaRouter([Endpoint(name, url, cap) for name, url in urls.items()], policy='round_robin')
+    llm = routed_llm(rr_router)
+    for _ in range(9):
+        llm.call(MESSAGES)
+    counts = {name: seen(name) - before[name] for name in stubs}
+    check(set(counts.values()) == {3}, f"9 sequential calls split {counts}")
+
+    print("Pinned LLMs only use their endpoints")
+    before = {name: seen(name) for name in stubs}
+    call_all(routed_llm(router, names=['c']), 6, workers=6)
+    counts = {name: seen(name) - before[name] for name in stubs}
+    check(counts == {'a': 0, 'b': 0, 'c': 6}, f"calls pinned to c went {counts}")
+
+    print("Failover when an endpoint goes away")
+    port_b = stubs['b'].server_address[1]
+    stop_stub(stubs['b'])
+    results = call_all(routed_llm(router), calls, workers=calls)
+    stats = router.stats()
+    check(all('Findings' in str(result) for result in results), f"{calls} calls answered with b down")
+    check(not stats['b']['healthy'] and stats['b']['failures'] >= 1,
+          f"b marked down after {stats['b']['failures']} failed call(s)")
+
+    print("Health check brings a recovered endpoint back")
+    stubs['b'] = start_stub(port=port_b)
+    router.check_health()
+    check(router.stats()['b']['healthy'], "b healthy again")
+    call_all(routed_llm(router), calls, workers=calls)
+    check(seen('b') > 0, f"b serves calls again ({seen('b')})")
+
+    print("Failover when an endpoint stops answering")
+    slow = start_stub(latency=5)
+    slow_router = OllamaRouter([Endpoint('slow', f'http://127.0.0.1:{slow.server_address[1]}', cap),
+                                Endpoint('a', urls['a'], cap)], policy='round_robin')
+    started = time.perf_counter()
+    results = [routed_llm(slow_router, timeout=1).call(MESSAGES) for _ in range(2)]
+    check(all('Findings' in str(result) for result in results) and not slow_router.stats()['slow']['healthy'],
+          f"calls moved off the hung endpoint ({time.perf_counter() - started:.1f}s)")
+    stop_stub(slow)
+
+    print("Caps hold across processes sharing a slot directory")
+    shared = start_stub(latency=0.2)
+    url = f'http://127.0.0.1:{shared.server_address[1]}'
+    slot_dir = tempfile.mkdtemp(prefix='ollama_slots_')
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=calls_in_process, args=(url, cap, slot_dir, calls // 2))
+                 for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    handler = shared.RequestHandlerClass
+    check(all(process.exitcode == 0 for process in processes) and handler.requests_seen == 3 * (calls // 2),
+          f"3 processes sent {handler.requests_seen} calls")
+    check(handler.max_in_flight <= cap, f"at most {cap} in flight across them (peak {handler.max_in_flight})")
+
+    print("A killed process frees its slots")
+    endpoint, held = Endpoint('shared', url, cap), context.Event()
+    holder = context.Process(target=hold_slots, args=(url, cap, slot_dir, held))
+    holder.start()
+    held.wait(120)
+    busy = SlotLocks(slot_dir).in_use(endpoint)
+    holder.kill()
+    holder.join()
+    check(busy == cap and SlotLocks(slot_dir).in_use(endpoint) == 0,
+          f"{busy} of {cap} slots held, {SlotLocks(slot_dir).in_use(endpoint)} after the kill")
+    stop_stub(shared)
+    shutil.rmtree(slot_dir, ignore_errors=True)
+
+    for server in stubs.values():
+        stop_stub(server)
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=24)
+    parser.add_argument('--cap', type=int, default=2)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.calls, args.cap) else 1)
@@ -0,0 +1,71 @@
+"""
+Startup latency: one subprocess per job vs. the warm worker pool
+
+The subprocess model pays for the crewai/langchain imports, LLM client setup and
+agent construction in main.py on every job. The pool pays it once per worker.
+This measures that fixed per-job cost without running any LLM calls.
+
+Run with: python benchmarks/startup_latency.py [--jobs 5] [--workers 2]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from worker_pool import WorkerPool
+
+
+def bench_subprocess(jobs):
+    """Per-job cost of starting python, importing main.py and building its agents"""
+    samples = []
+    for _ in range(jobs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-c', 'import main; main.warm_up()'],
+            cwd=BACKEND_DIR, check=True, capture_output=True
+        )
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_pool(jobs, workers):
+    """One-off pool warm-up plus the per-job dispatch cost once warm"""
+    started = time.perf_counter()
+    pool = WorkerPool(size=workers)
+    pool.wait_until_ready()
+    warmup = time.perf_counter() - started
+
+    samples = []
+    for _ in range(jobs):
+        started = time.perf_counter()
+        pool.submit('os:getpid').result()
+        samples.append(time.perf_counter() - started)
+    pool.shutdown()
+    return warmup, samples
+
+
+def describe(samples):
+    return (f"mean {statistics.mean(samples) * 1000:9.1f} ms   "
+            f"min {min(samples) * 1000:9.1f} ms   max {max(samples) * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    os.chdir(BACKEND_DIR)
+    subprocess_samples = bench_subprocess(args.jobs)
+    warmup, pool_samples = bench_pool(args.jobs, args.workers)
+
+    print(f"Per-job startup over {args.jobs} jobs")
+    print(f"  subprocess per job   {describe(subprocess_samples)}")
+    print(f"  warm worker pool     {describe(pool_samples)}")
+    print(f"  pool warm-up ({args.workers} workers, paid once): {warmup:.2f} s")
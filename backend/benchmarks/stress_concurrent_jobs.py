@@ -0,0 +1,127 @@
+"""
+Stress check: many overlapping research jobs must each get their own report
+
+Starts a fake Ollama server that answers every completion with the molecule
+named in the prompt, points the worker pool at it, submits overlapping jobs
+through the Flask API and checks that every result (and every per-job report
+file) mentions its own molecule and no other. Also cancels a job attached to
+another's execution and checks it keeps that execution's logs.
+
+Run with: python benchmarks/stress_concurrent_jobs.py [--jobs 12] [--workers 4]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_ollama import FakeOllamaHandler, start_server  # noqa: E402
+
+
+def check_detached_cancel(client, molecule):
+    """Cancel a job attached to another's execution; the owner must still finish"""
+    owner = client.post('/api/research/start', json={'molecule_name': molecule}).get_json()['job_id']
+    attached = client.post('/api/research/start', json={'molecule_name': molecule}).get_json()['job_id']
+    if client.delete(f'/api/research/{attached}').status_code != 200:
+        return ["the attached job finished before it could be cancelled"]
+
+    while client.get(f'/api/research/status/{owner}').get_json()['status'] not in ('complete', 'error'):
+        time.sleep(0.2)
+    failures = []
+    status = client.get(f'/api/research/status/{owner}').get_json()
+    if status['status'] != 'complete':
+        failures.append(f"owner of the cancelled job ended {status['status']}")
+    owner_log = client.get(f'/api/research/{owner}/logs').get_json()
+    attached_log = client.get(f'/api/research/{attached}/logs').get_json()
+    if attached_log['status'] != 'cancelled' or attached_log['lines'] != owner_log['lines']:
+        failures.append("cancelled job lost the logs of the execution it joined")
+    stream = client.get(f'/api/research/events/{attached}').get_data(as_text=True)
+    if 'event: job_cancelled' not in stream or 'event: job_complete' in stream:
+        failures.append(f"cancelled job streamed {stream!r}")
+    return failures
+
+
+def run(jobs, workers):
+    # Jobs, reports, logs and caches go to a scratch directory, not the server's own
+    with tempfile.TemporaryDirectory(prefix='stress_jobs_') as work_dir:
+        return run_jobs(jobs, workers, work_dir)
+
+
+def run_jobs(jobs, workers, work_dir):
+    molecules = [f'Compound{index:03d}' for index in range(jobs)]
+    stub = start_server(FakeOllamaHandler, molecules=molecules)
+
+    # Workers inherit the environment when the pool starts
+    os.environ['OLLAMA_BASE_URL'] = f'http://127.0.0.1:{stub.server_address[1]}'
+    os.environ['RESEARCH_WORKERS'] = str(workers)
+    # Every job must really run, not be answered from an earlier run's caches
+    os.environ['RESULT_CACHE_TTL'] = '0'
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+    os.environ['SECTION_STORE_ENABLED'] = 'false'
+    # The stub answers in free text, not schema JSON
+    os.environ['STRUCTURED_OUTPUTS'] = 'false'
+    os.environ.update({
+        'JOB_DB_PATH': os.path.join(work_dir, 'jobs.sqlite3'),
+        'RESEARCH_REPORTS_DIR': os.path.join(work_dir, 'reports'),
+        'JOB_LOG_DIR': os.path.join(work_dir, 'logs'),
+        'HTTP_CACHE_PATH': os.path.join(work_dir, 'http.sqlite3'),
+        'INTERNAL_DOCS_INDEX_PATH': os.path.join(work_dir, 'internal_docs'),
+        'AGENT_METRICS_PATH': '',
+    })
+
+    import server
+    client = server.app.test_client()
+
+    started = time.perf_counter()
+    job_ids = {}
+    for molecule in molecules:
+        response = client.post('/api/research/start', json={'molecule_name': molecule})
+        job_ids[response.get_json()['job_id']] = molecule
+
+    pending = dict(job_ids)
+    statuses = {}
+    while pending:
+        for job_id in list(pending):
+            status = client.get(f'/api/research/status/{job_id}').get_json()
+            if status['status'] in ('complete', 'error'):
+                statuses[job_id] = status
+                del pending[job_id]
+        time.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    for job_id, molecule in job_ids.items():
+        status = statuses[job_id]
+        others = [m for m in molecules if m != molecule]
+        result = status.get('result') or ''
+        with open(os.path.join(server.REPORTS_DIR, f'{job_id}.txt'), encoding='utf-8') as f:
+            artifact = f.read()
+        if status['status'] != 'complete':
+            failures.append(f"{molecule}: {status['status']} {status.get('error')}")
+        elif molecule not in result or any(re.search(rf'\b{m}\b', result) for m in others):
+            failures.append(f"{molecule}: got {result!r}")
+        elif artifact != result:
+            failures.append(f"{molecule}: report file differs from API result")
+    failures += [f"cancel: {failure}" for failure in check_detached_cancel(client, molecules[0])]
+
+    server.get_worker_pool().shutdown()
+    stub.shutdown()
+    print(f"{jobs} overlapping jobs on {workers} workers finished in {elapsed:.1f} s")
+    for failure in failures:
+        print(f"  MISMATCH {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.jobs, args.workers) else 1)
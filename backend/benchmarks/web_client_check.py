@@ -0,0 +1,151 @@
+"""
+Check the pooled web client against a local HTTP stub
+
+Verifies that repeated fetches are served from the disk cache, that stale
+entries are revalidated with ETag/Last-Modified (a 304 reuses the cached body),
+that concurrent duplicate fetches inside a job hit the network once, that the
+per-host limit holds, and that the scrape tool works through the client.
+
+Run with: python benchmarks/web_client_check.py [--requests 40] [--max-per-host 3]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The stub listens on localhost, which the tools' SSRF guard would refuse
+os.environ['CREWAI_TOOLS_ALLOW_UNSAFE_PATHS'] = 'true'
+logging.getLogger('crewai_tools.security').setLevel(logging.ERROR)
+
+from web_client import WebClient, PooledScrapeWebsiteTool  # noqa: E402
+
+
+class StubPageHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> with an ETag and Last-Modified, and counts what it sees"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    lock = threading.Lock()
+    requests_seen = 0
+    not_modified = 0
+    in_flight = 0
+    max_in_flight = 0
+    connections = set()
+    latency = 0.05
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cls = StubPageHandler
+        with cls.lock:
+            cls.requests_seen += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.connections.add(self.client_address)
+        try:
+            time.sleep(self.latency)
+            etag = f'"{self.path}-v1"'
+            if self.headers.get('If-None-Match') == etag:
+                with cls.lock:
+                    cls.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = f"<html><body><h1>Stub</h1><p>Content of {self.path}</p></body></html>".encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', 'Mon, 05 Oct 2026 10:00:00 GMT')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def reset_counts():
+    StubPageHandler.requests_seen = 0
+    StubPageHandler.not_modified = 0
+    StubPageHandler.max_in_flight = 0
+    StubPageHandler.connections = set()
+
+
+def run(request_count, max_per_host):
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), StubPageHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{stub.server_address[1]}'
+    failures = []
+
+    def check(condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = WebClient(os.path.join(directory, 'http.sqlite3'), ttl_seconds=60,
+                           max_per_host=max_per_host)
+        urls = [f'{base}/page/{index}' for index in range(request_count)]
+
+        print("Cold fetches, then the same URLs again")
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            started = time.perf_counter()
+            list(executor.map(client.get, urls))
+            cold = time.perf_counter() - started
+            check(StubPageHandler.max_in_flight <= max_per_host,
+                  f"at most {max_per_host} requests in flight (saw {StubPageHandler.max_in_flight})")
+            check(len(StubPageHandler.connections) <= max_per_host,
+                  f"{request_count} requests reused {len(StubPageHandler.connections)} connections")
+
+            reset_counts()
+            started = time.perf_counter()
+            responses = list(executor.map(client.get, urls))
+            warm = time.perf_counter() - started
+        check(StubPageHandler.requests_seen == 0 and all(r.from_cache for r in responses),
+              f"second pass served from cache ({cold * 1000:.0f} ms cold, {warm * 1000:.0f} ms cached)")
+
+        print("Stale entries are revalidated")
+        reset_counts()
+        client.ttl_seconds = 0.001
+        time.sleep(0.01)
+        response = client.get(urls[0])
+        check(StubPageHandler.not_modified == 1 and response.from_cache and b'/page/0' in response.content,
+              "304 Not Modified reuses the cached body")
+        client.ttl_seconds = 60
+
+        print("Duplicate fetches inside a job")
+        reset_counts()
+        fresh_url = f'{base}/page/dedupe'
+        with client.job_scope(), ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(client.get, [fresh_url] * 8))
+        check(StubPageHandler.requests_seen == 1, f"8 concurrent fetches made {StubPageHandler.requests_seen} request(s)")
+
+        print("Scrape tool through the client")
+        text = PooledScrapeWebsiteTool(client=client).run(website_url=f'{base}/page/tool')
+        check('Content of /page/tool' in text, "tool returns the page text")
+        print(f"  counters: {client.stats()}")
+
+    stub.shutdown()
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--max-per-host', type=int, default=3)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.requests, args.max_per_host) else 1)
@@ -0,0 +1,508 @@
+"""
+Local index of internal documents for the internal knowledge agent
+Strategy decks, meeting minutes and field reports under a directory are split
+into passages and indexed for BM25 search, so the agent is handed the few
+passages relevant to a molecule instead of whole documents. Ingestion is
+incremental: only new or changed files are read. Each ingestion writes an
+immutable segment of NumPy postings arrays that every worker memory-maps;
+passage texts and the list of live segments are kept in SQLite.
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Type
+
+import numpy as np
+from bs4 import BeautifulSoup
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+
+try:
+    import pypdf
+except ImportError:  # PDFs are skipped without pypdf
+    pypdf = None
+
+
+TEXT_EXTENSIONS = ('.txt', '.md', '.markdown', '.csv', '.json', '.html', '.htm')
+
+# Passages are windows of this many words, overlapping so a sentence cut at a
+# boundary is still found whole in one of them
+PASSAGE_WORDS = 200
+PASSAGE_OVERLAP = 40
+
+# Segments are merged into one once there are more than this
+MAX_SEGMENTS = 8
+
+# Longest a waiting update (or a search) waits on another process's update
+SQLITE_TIMEOUT_SECONDS = 30
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+will with we our not but which their they been also can may than into about
+""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    document TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS passages_document ON passages (document);
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS deleted (
+    passage_id INTEGER PRIMARY KEY
+);
+"""
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def term_hash(term):
+    """Stable 63-bit hash of a term; segments store hashes instead of strings"""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little') >> 1
+
+
+def supported(path):
+    extension = os.path.splitext(path)[1].lower()
+    return extension in TEXT_EXTENSIONS or (extension == '.pdf' and pypdf is not None)
+
+
+def read_document(path):
+    """Plain text of a document"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        return '\n'.join(page.extract_text() or '' for page in pypdf.PdfReader(path).pages)
+    with open(path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    if extension in ('.html', '.htm'):
+        text = BeautifulSoup(text, 'html.parser').get_text(' ')
+    return text
+
+
+def split_passages(text, words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP):
+    tokens = text.split()
+    step = words - overlap
+    return [' '.join(tokens[start:start + words])
+            for start in range(0, max(1, len(tokens) - overlap), step)] if tokens else []
+
+
+# ============================================================================
+# SEGMENTS
+# ============================================================================
+
+class Segment:
+    """
+    Immutable postings of a batch of passages, memory-mapped from .npy files
+
+    terms: sorted term hashes; offsets: where each term's postings start;
+    rows/frequencies: per posting, the passage row and term count;
+    passage_ids/lengths: per passage row, its id and length in tokens
+    """
+
+    ARRAYS = ('terms', 'offsets', 'rows', 'frequencies', 'passage_ids', 'lengths')
+
+    def __init__(self, path):
+        self.path = path
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    @classmethod
+    def write(cls, path, terms, rows, frequencies, passage_ids, lengths):
+        """
+        Write a segment from one entry per (term hash, passage row) posting
+
+        Returns:
+            The new Segment
+        """
+        order = np.lexsort((rows, terms))
+        terms = terms[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+        arrays = {
+            'terms': unique_terms.astype(np.int64),
+            'offsets': np.append(starts, len(terms)).astype(np.int64),
+            'rows': rows[order].astype(np.int32),
+            'frequencies': frequencies[order].astype(np.float32),
+            'passage_ids': np.asarray(passage_ids, dtype=np.int64),
+            'lengths': np.asarray(lengths, dtype=np.float32),
+        }
+        # Written under a temporary name so a crash never leaves a half-written segment
+        temp_path = f'{path}.tmp'
+        os.makedirs(temp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, f'{name}.npy'), array)
+        os.replace(temp_path, path)
+        return cls(path)
+
+    def postings(self, term):
+        """(passage rows, term frequencies) of a term hash"""
+        index = np.searchsorted(self.terms, term)
+        if index == len(self.terms) or self.terms[index] != term:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.rows[start:end], self.frequencies[start:end]
+
+    def all_postings(self):
+        """(term hashes, passage ids, frequencies), one entry per posting"""
+        terms = np.repeat(self.terms, np.diff(self.offsets))
+        return terms, self.passage_ids[self.rows], np.asarray(self.frequencies)
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class DocumentIndex:
+    """
+    BM25 passage index over a directory of documents
+
+    Args:
+        path: Directory the index (SQLite file and segments) is kept in
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._state = None
+        self._segments = {}  # name -> Segment, kept open between reloads
+
+        os.makedirs(os.path.join(path, 'segments'), exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.path, 'index.sqlite3'),
+                                         timeout=SQLITE_TIMEOUT_SECONDS, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _segment_path(self, name):
+        return os.path.join(self.path, 'segments', name)
+
+    # ------------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------------
+
+    def update(self, docs_dir, wait=True):
+        """
+        Index new and changed documents under docs_dir and drop removed ones.
+        Only one process updates at a time; searches carry on meanwhile.
+
+        Args:
+            wait: Wait (up to the connection timeout) for another process's
+                update to finish; otherwise raise straight away
+
+        Returns:
+            Dict with the number of documents added/changed, removed and
+            passages indexed
+
+        Raises:
+            sqlite3.OperationalError: If another process is updating the index
+        """
+        connection = self._connection()
+        if not wait:
+            connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+        finally:
+            if not wait:
+                connection.execute(f'PRAGMA busy_timeout = {SQLITE_TIMEOUT_SECONDS * 1000}')
+        try:
+            files = {}
+            for root, _, names in os.walk(docs_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if supported(path):
+                        stat = os.stat(path)
+                        files[os.path.relpath(path, docs_dir)] = (stat.st_mtime_ns, stat.st_size)
+            # Segments left behind by an update that crashed before committing
+            live_segments = {name for (name,) in connection.execute("SELECT name FROM segments")}
+            for name in os.listdir(os.path.join(self.path, 'segments')):
+                if name not in live_segments:
+                    shutil.rmtree(self._segment_path(name), ignore_errors=True)
+
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                     connection.execute("SELECT path, mtime_ns, size FROM documents")}
+            changed = [path for path, signature in files.items() if known.get(path) != signature]
+            removed = [path for path in known if path not in files]
+
+            for path in changed + removed:
+                if path in known:
+                    connection.execute(
+                        "INSERT OR IGNORE INTO deleted SELECT id FROM passages WHERE document = ?", (path,))
+                    connection.execute("DELETE FROM passages WHERE document = ?", (path,))
+                    connection.execute("DELETE FROM documents WHERE path = ?", (path,))
+
+            postings = ([], [], [])
+            passage_ids, lengths = [], []
+            for path in changed:
+                try:
+                    text = read_document(os.path.join(docs_dir, path))
+                except Exception as e:
+                    print(f"⚠️  Skipping internal document {path}: {e}")
+                    text = ''
+                for position, passage in enumerate(split_passages(text)):
+                    cursor = connection.execute(
+                        "INSERT INTO passages (document, position, text) VALUES (?, ?, ?)",
+                        (path, position, passage))
+                    tokens = tokenize(passage)
+                    counts = {}
+                    for token in tokens:
+                        counts[token] = counts.get(token, 0) + 1
+                    row = len(passage_ids)
+                    for token, count in counts.items():
+                        postings[0].append(term_hash(token))
+                        postings[1].append(row)
+                        postings[2].append(count)
+                    passage_ids.append(cursor.lastrowid)
+                    lengths.append(len(tokens))
+                connection.execute("INSERT INTO documents (path, mtime_ns, size) VALUES (?, ?, ?)",
+                                   (path, *files[path]))
+
+            if passage_ids:
+                name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+                Segment.write(self._segment_path(name), np.array(postings[0], dtype=np.int64),
+                              np.array(postings[1], dtype=np.int64), np.array(postings[2]),
+                              passage_ids, lengths)
+                connection.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+            retired = self._merge(connection) if passage_ids or removed else []
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        # Workers that still have them mapped keep reading them until they reload
+        for name in retired:
+            shutil.rmtree(self._segment_path(name), ignore_errors=True)
+        self._state = None
+        return {'changed': len(changed), 'removed': len(removed), 'passages': len(passage_ids)}
+
+    def _merge(self, connection):
+        """
+        Merge every segment into one, dropping deleted passages, once there are
+        more than MAX_SEGMENTS (or a third of the postings are deleted)
+
+        Returns:
+            Names of the segments that were merged away
+        """
+        names = [name for (name,) in connection.execute("SELECT name FROM segments ORDER BY name")]
+        deleted = np.array([id for (id,) in connection.execute("SELECT passage_id FROM deleted")],
+                           dtype=np.int64)
+        segments = [Segment(self._segment_path(name)) for name in names]
+        total = sum(len(segment.passage_ids) for segment in segments)
+        if len(names) <= MAX_SEGMENTS and len(deleted) * 3 < max(total, 1):
+            return []
+        if not segments:
+            connection.execute("DELETE FROM deleted")
+            return []
+
+        terms, ids, frequencies = (np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                                   for parts in zip(*(segment.all_postings() for segment in segments)))
+        passage_ids = np.concatenate([segment.passage_ids for segment in segments])
+        lengths = np.concatenate([segment.lengths for segment in segments])
+        live = ~np.isin(passage_ids, deleted)
+        passage_ids, lengths = passage_ids[live], lengths[live]
+
+        keep = ~np.isin(ids, deleted)
+        rows = np.searchsorted(np.sort(passage_ids), ids[keep])
+        order = np.argsort(passage_ids)
+        connection.execute("DELETE FROM segments")
+        connection.execute("DELETE FROM deleted")
+        if len(passage_ids):
+            name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+            Segment.write(self._segment_path(name), terms[keep], rows, frequencies[keep],
+                          passage_ids[order], lengths[order])
+            connection.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+        return names
+
+    # ------------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------------
+
+    def _load(self):
+        """Segments, live masks and corpus statistics, reloaded when another process updates"""
+        connection = self._connection()
+        version = connection.execute('PRAGMA data_version').fetchone()[0]
+        with self._lock:
+            if self._state is not None and self._state['version'] == version:
+                return self._state
+
+            while True:
+                connection.execute('BEGIN')
+                names = [name for (name,) in connection.execute("SELECT name FROM segments ORDER BY name")]
+                deleted = np.array([id for (id,) in connection.execute("SELECT passage_id FROM deleted")],
+                                   dtype=np.int64)
+                connection.execute('COMMIT')
+                try:
+                    self._segments = {name: self._segments.get(name) or Segment(self._segment_path(name))
+                                      for name in names}
+                    break
+                except FileNotFoundError:
+                    continue  # merged away by another process since the read; read again
+
+            segments = []
+            passages, tokens = 0, 0.0
+            for segment in self._segments.values():
+                live = ~np.isin(segment.passage_ids, deleted)
+                segments.append((segment, live))
+                passages += int(live.sum())
+                tokens += float(segment.lengths[live].sum())
+            self._state = {'version': version, 'segments': segments, 'passages': passages,
+                           'average_length': tokens / passages if passages else 0.0}
+            return self._state
+
+    def search(self, query, k=5):
+        """
+        Top-k passages for a query by BM25
+
+        Returns:
+            List of dicts with document, position, score and text, best first
+        """
+        state = self._load()
+        segments = state['segments']
+        terms = {term_hash(token) for token in tokenize(query)}
+        if not terms or not state['passages']:
+            return []
+
+        # Each term's postings per segment; document frequency counts live passages only
+        matches = [[] for _ in segments]
+        idf = {}
+        for term in terms:
+            frequency = 0
+            for index, (segment, live) in enumerate(segments):
+                found = segment.postings(term)
+                if found is not None:
+                    matches[index].append((term, *found))
+                    frequency += int(live[found[0]].sum())
+            idf[term] = math.log(1 + (state['passages'] - frequency + 0.5) / (frequency + 0.5))
+
+        candidates = []
+        for (segment, live), entries in zip(segments, matches):
+            if not entries:
+                continue
+            rows = np.concatenate([rows for _, rows, _ in entries])
+            weights = np.concatenate([
+                idf[term] * frequencies * (BM25_K1 + 1) / (frequencies + BM25_K1 * (
+                    1 - BM25_B + BM25_B * segment.lengths[rows] / state['average_length']))
+                for term, rows, frequencies in entries
+            ])
+            scores = np.bincount(rows, weights=weights, minlength=len(segment.passage_ids))
+            scores[~live] = 0
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            candidates.extend((float(scores[row]), int(segment.passage_ids[row]))
+                              for row in top if scores[row] > 0)
+
+        best = sorted(candidates, reverse=True)[:k]
+        if not best:
+            return []
+        placeholders = ','.join('?' * len(best))
+        texts = {id: (document, position, text) for id, document, position, text in self._connection().execute(
+            f"SELECT id, document, position, text FROM passages WHERE id IN ({placeholders})",
+            [id for _, id in best])}
+        return [{'document': texts[id][0], 'position': texts[id][1], 'score': round(score, 3),
+                 'text': texts[id][2]} for score, id in best if id in texts]
+
+    def stats(self):
+        """Documents, live passages and segments in the index"""
+        state = self._load()
+        documents = self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {'documents': documents, 'passages': state['passages'], 'segments': len(state['segments'])}
+
+
+# ============================================================================
+# TOOL
+# ============================================================================
+
+class InternalDocumentSearchInput(BaseModel):
+    query: str = Field(..., description="The molecule name plus what to look for, "
+                                        "e.g. 'metformin oncology strategy'")
+
+
+class InternalDocumentSearchTool(BaseTool):
+    """Searches the internal document index, picking up new and changed files every refresh_seconds"""
+
+    name: str = "Search internal documents"
+    description: str = ("Searches the company's internal strategy decks, meeting minutes and field "
+                        "reports. Returns the most relevant passages with the document they come from.")
+    args_schema: Type[BaseModel] = InternalDocumentSearchInput
+    index: Any = Field(default=None, exclude=True)
+    docs_dir: str = ''
+    top_k: int = 5
+    refresh_seconds: int = 300
+    refreshed_at: float = Field(default=0.0, exclude=True)
+    refresh_lock: Any = Field(default_factory=threading.Lock, exclude=True)
+
+    def refresh(self, wait=False):
+        """
+        Pick up new and changed files once refresh_seconds have passed. Without
+        wait, as in a tool call, the refresh is skipped while another thread is
+        refreshing or another process is updating the index; the first full
+        ingestion belongs before the first job (see main.warm_up).
+        """
+        if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+            return
+        if not self.refresh_lock.acquire(blocking=wait):
+            return
+        try:
+            if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+                return  # refreshed by the thread that held the lock
+            try:
+                self.index.update(self.docs_dir, wait=wait)
+            except sqlite3.OperationalError as e:
+                # Another worker is still ingesting; search what is indexed so far
+                print(f"⚠️  Internal document index not updated: {e}")
+            self.refreshed_at = time.monotonic()
+        finally:
+            self.refresh_lock.release()
+
+    def _run(self, query: str) -> str:
+        self.refresh()
+        results = self.index.search(query, self.top_k)
+        if not results:
+            return f"No internal documents match '{query}'."
+        return '\n\n'.join(f"[{index}] {result['document']} (passage {result['position'] + 1}, "
+                           f"score {result['score']})\n{result['text']}"
+                           for index, result in enumerate(results, 1))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Index internal documents ahead of research runs")
+    parser.add_argument('docs_dir', help="Directory of internal documents")
+    parser.add_argument('--index', required=True, help="Index directory (INTERNAL_DOCS_INDEX_PATH)")
+    parser.add_argument('--query', help="Search the index after updating it")
+    args = parser.parse_args()
+
+    index = DocumentIndex(args.index)
+    started = time.perf_counter()
+    counts = index.update(args.docs_dir)
+    print(f"Indexed {counts['changed']} new or changed documents ({counts['passages']} passages), "
+          f"removed {counts['removed']} in {time.perf_counter() - started:.1f}s: {index.stats()}")
+    if args.query:
+        for result in index.search(args.query):
+            print(f"\n{result['score']:>7}  {result['document']}#{result['position'] + 1}\n{result['text'][:300]}")
@@ -0,0 +1,230 @@
+"""
+Per-job log files for the research API
+A worker's output while it runs a job (the agents' verbose crewAI output,
+prints and tracebacks) is written as JSON lines to a directory of its own
+instead of the server's terminal. The directory holds a few size-capped
+segment files; the oldest is deleted when a new one starts, so a chatty job
+costs bounded disk and no server memory. Offsets count bytes from the start
+of the job's log and stay valid across rotation, so clients can tail a log
+with read_log(directory, since=offset).
+"""
+
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+SEGMENT_SUFFIX = '.jsonl'
+
+# Longest line kept whole; longer output without a newline is split
+MAX_LINE_CHARS = 16384
+
+
+def _segment_name(offset):
+    # Segments are named after the log offset of their first byte
+    return f'{offset:016d}{SEGMENT_SUFFIX}'
+
+
+def list_segments(directory):
+    """(start offset, path) of a log's segment files, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(directory, name))
+        for name in names if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+    )
+
+
+class JobLog:
+    """
+    Appends JSON-lines records to a job's log directory, rotating segments
+
+    Args:
+        directory: The job's log directory (created if needed); an existing
+            log, e.g. of a job resumed after a restart, is continued
+        max_bytes: Size at which the current segment is closed and a new one
+            started
+        backups: Closed segments kept besides the current one
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024, backups=4):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        segments = list_segments(directory)
+        if segments:
+            start, path = segments[-1]
+            self.offset = start + os.path.getsize(path)
+            self._file = open(path, 'ab')
+            self._size = self.offset - start
+        else:
+            self.offset = 0
+            self._file = None
+            self._rotate()
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+        self._file = open(os.path.join(self.directory, _segment_name(self.offset)), 'ab')
+        self._size = 0
+        for _, path in list_segments(self.directory)[:-(self.backups + 1)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def write(self, stream, line):
+        """Append one record; flushed straight away so readers see it"""
+        data = (json.dumps({'time': round(time.time(), 3), 'stream': stream, 'line': line}) + '\n').encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                return
+            if self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.offset += len(data)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    @contextmanager
+    def capture(self):
+        """Send this process's stdout and stderr to the log until the block exits"""
+        streams = {'stdout': LogStream(self, 'stdout'), 'stderr': LogStream(self, 'stderr')}
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = streams['stdout'], streams['stderr']
+        try:
+            yield self
+        finally:
+            sys.stdout, sys.stderr = saved
+            for stream in streams.values():
+                stream.flush()
+
+
+class LogStream(io.TextIOBase):
+    """
+    Text stream that writes each line to a JobLog as its own record. Partial
+    lines are kept per thread, so lines printed by concurrent tasks don't run
+    into each other (print writes the text and the newline separately).
+    """
+
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+        self._partial = {}  # thread id -> text written since its last newline
+        self._lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        thread = threading.get_ident()
+        with self._lock:
+            lines = (self._partial.pop(thread, '') + text).split('\n')
+            partial = lines.pop()
+            if len(partial) > MAX_LINE_CHARS:
+                lines.append(partial)
+            elif partial:
+                self._partial[thread] = partial
+        for line in lines:
+            self.log.write(self.name, line)
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            partials, self._partial = list(self._partial.values()), {}
+        for partial in partials:
+            self.log.write(self.name, partial)
+
+
+def read_log(directory, since=0, max_bytes=65536):
+    """
+    Read a job's log records from an offset
+
+    Args:
+        directory: The job's log directory
+        since: Offset to read from, normally the next_offset of the previous read
+        max_bytes: Rough limit on the bytes read; at least one record is
+            returned if there is one
+
+    Returns:
+        Dict with the records (`lines`), next_offset to pass as `since` next
+        time, start_offset (the oldest offset still on disk) and truncated
+        (True if records after `since` had already been rotated away)
+    """
+    records = []
+    offset = max(0, since)
+    truncated = False
+    for _ in range(3):
+        segments = list_segments(directory)
+        start_offset = segments[0][0] if segments else 0
+        truncated = truncated or offset < start_offset
+        offset = first = max(offset, start_offset)
+        try:
+            for index, (start, path) in enumerate(segments):
+                end = segments[index + 1][0] if index + 1 < len(segments) else None
+                if end is not None and offset >= end:
+                    continue
+                with open(path, 'rb') as f:
+                    if offset > start:
+                        # Only start at a line boundary
+                        f.seek(offset - start - 1)
+                        if f.read(1) != b'\n':
+                            offset += len(f.readline())
+                    while offset - first < max_bytes or not records:
+                        line = f.readline()
+                        if not line.endswith(b'\n'):
+                            break  # end of the segment, or a record still being written
+                        offset += len(line)
+                        records.append(json.loads(line))
+                if end is None or offset < end:
+                    break
+            break
+        except FileNotFoundError:
+            # The next segment was rotated away while reading. Return what was
+            # read, so the gap is reported by the next read; with nothing read
+            # yet, start again from the oldest segment left.
+            if records:
+                break
+    return {'lines': records, 'next_offset': offset, 'start_offset': start_offset, 'truncated': truncated}
+
+
+def prune_logs(root, max_age_seconds):
+    """
+    Delete the job log directories under root not written to for max_age_seconds
+
+    Returns:
+        Number of job logs deleted
+    """
+    cutoff = time.time() - max_age_seconds
+    pruned = 0
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        directory = os.path.join(root, name)
+        if not os.path.isdir(directory):
+            continue
+        segments = list_segments(directory)
+        if any(os.path.getmtime(path) >= cutoff for _, path in segments):
+            continue
+        for _, path in segments:
+            os.remove(path)
+        try:
+            os.rmdir(directory)
+        except OSError:
+            continue  # something else lives there; leave it
+        pruned += 1
+    return pruned
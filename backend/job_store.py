@@ -0,0 +1,281 @@
+"""
+Durable job store for the research API
+Jobs live in a local SQLite database (WAL mode) so they survive restarts.
+Report bodies are stored zlib-compressed, finished jobs are purged by a
+retention policy, and only a bounded working set of job rows (without report
+bodies) is kept in memory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from result_cache import normalize_molecule_name
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    molecule_name TEXT NOT NULL,
+    molecule_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    execution_id TEXT NOT NULL,
+    attached_callers INTEGER NOT NULL DEFAULT 1,
+    client_id TEXT,
+    priority TEXT,
+    cache TEXT,
+    result BLOB,
+    batch_id TEXT,
+    refresh TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_molecule ON jobs (molecule_key, started_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_started ON jobs (started_at);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    client_id TEXT,
+    priority TEXT,
+    size INTEGER NOT NULL
+);
+"""
+
+# Every column except the compressed report body
+FIELDS = (
+    'id', 'molecule_name', 'status', 'error', 'started_at', 'finished_at',
+    'execution_id', 'attached_callers', 'client_id', 'priority', 'cache', 'batch_id', 'refresh'
+)
+
+# Columns holding JSON: the cache info and the sections a refresh job reruns
+JSON_FIELDS = ('cache', 'refresh')
+
+ACTIVE_STATUSES = ('pending', 'running')
+FINISHED_STATUSES = ('complete', 'error', 'cancelled')
+
+
+def compress_result(text):
+    return None if text is None else zlib.compress(text.encode('utf-8'), 6)
+
+
+def decompress_result(blob):
+    return None if blob is None else zlib.decompress(blob).decode('utf-8')
+
+
+class JobStore:
+    """
+    SQLite-backed store of research jobs
+
+    Args:
+        path: Database file
+        hot_size: Job rows (without report bodies) kept in memory
+        retention_days: Finished jobs older than this are purged
+        max_jobs: Oldest finished jobs beyond this count are purged
+        purge_interval: Seconds between retention passes
+    """
+
+    def __init__(self, path, hot_size=1000, retention_days=30, max_jobs=100000,
+                 purge_interval=3600):
+        self.path = path
+        self.hot_size = hot_size
+        self.retention_days = retention_days
+        self.max_jobs = max_jobs
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._hot = OrderedDict()
+        self._hot_lock = threading.Lock()
+        self._writes = 0  # bumped by every update or delete, under _hot_lock
+        self._last_purge = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        columns = [row['name'] for row in connection.execute("PRAGMA table_info(jobs)")]
+        # Databases created before batches and section refreshes existed
+        for column in ('batch_id', 'refresh'):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id)")
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _remember(self, job):
+        with self._hot_lock:
+            self._remember_locked(job)
+
+    def _remember_locked(self, job):
+        self._hot[job['id']] = job
+        self._hot.move_to_end(job['id'])
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _select(self, job_id):
+        row = self._connection().execute(
+            f"SELECT {', '.join(FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def _row_to_job(self, row):
+        job = {field: row[field] for field in FIELDS}
+        job['cache'] = json.loads(job['cache']) if job['cache'] else {'hit': False}
+        job['refresh'] = json.loads(job['refresh']) if job['refresh'] else None
+        return job
+
+    def create(self, job):
+        """Insert a new job; `job` holds FIELDS plus an optional result"""
+        job = dict(job)
+        result = job.pop('result', None)
+        job.setdefault('finished_at', None)
+        self._connection().execute(
+            f"INSERT INTO jobs ({', '.join(FIELDS)}, molecule_key, result) "
+            f"VALUES ({', '.join('?' * (len(FIELDS) + 2))})",
+            [json.dumps(job.get(field)) if field in JSON_FIELDS else job.get(field) for field in FIELDS]
+            + [normalize_molecule_name(job['molecule_name']), compress_result(result)]
+        )
+        self._remember({field: job.get(field) for field in FIELDS})
+        self._maybe_purge()
+
+    def get(self, job_id):
+        """Job row without its report body, or None"""
+        with self._hot_lock:
+            job = self._hot.get(job_id)
+            if job is not None:
+                self._hot.move_to_end(job_id)
+                return dict(job)
+            writes = self._writes
+
+        job = self._select(job_id)
+        if job is None:
+            return None
+        with self._hot_lock:
+            cached = self._hot.get(job_id)
+            if cached is not None:
+                # Cached by a concurrent get meanwhile; update() keeps that one current
+                return dict(cached)
+            if self._writes != writes:
+                # An update since the SELECT skipped the cache (the id wasn't in
+                # it yet) and may be missing from the row; read it again where no
+                # update can slip in between
+                job = self._select(job_id)
+                if job is None:
+                    return None
+            self._remember_locked(job)
+        return dict(job)
+
+    def get_result(self, job_id):
+        """Decompressed report body of a job, or None"""
+        row = self._connection().execute(
+            "SELECT result FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return decompress_result(row['result']) if row else None
+
+    def update(self, job_ids, **fields):
+        """Update one job id or a list of them; `result` is stored compressed"""
+        if isinstance(job_ids, str):
+            job_ids = [job_ids]
+        if fields.get('status') in FINISHED_STATUSES and 'finished_at' not in fields:
+            fields['finished_at'] = time.time()
+
+        columns = dict(fields)
+        if 'result' in columns:
+            columns['result'] = compress_result(columns['result'])
+        for field in JSON_FIELDS:
+            if field in columns:
+                columns[field] = json.dumps(columns[field])
+
+        assignments = ', '.join(f'{column} = ?' for column in columns)
+        self._connection().executemany(
+            f"UPDATE jobs SET {assignments} WHERE id = ?",
+            [list(columns.values()) + [job_id] for job_id in job_ids]
+        )
+
+        fields.pop('result', None)
+        with self._hot_lock:
+            self._writes += 1
+            for job_id in job_ids:
+                if job_id in self._hot:
+                    self._hot[job_id].update(fields)
+
+    def delete(self, job_id):
+        self._connection().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        with self._hot_lock:
+            self._writes += 1
+            self._hot.pop(job_id, None)
+
+    def find_by_molecule(self, molecule_name, limit=20):
+        """Most recent jobs for a molecule, newest first, without report bodies"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(FIELDS)} FROM jobs WHERE molecule_key = ? "
+            "ORDER BY started_at DESC LIMIT ?",
+            (normalize_molecule_name(molecule_name), limit)
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def active_jobs(self):
+        """Jobs that were pending or running, oldest first"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(FIELDS)} FROM jobs WHERE status IN (?, ?) ORDER BY started_at",
+            ACTIVE_STATUSES
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def find_by_batch(self, batch_id):
+        """Jobs of a batch in submission order, without report bodies"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(FIELDS)} FROM jobs WHERE batch_id = ? ORDER BY started_at, rowid",
+            (batch_id,)
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def create_batch(self, batch):
+        """Insert a batch record: id, created_at, client_id, priority and size"""
+        self._connection().execute(
+            "INSERT INTO batches (id, created_at, client_id, priority, size) VALUES (?, ?, ?, ?, ?)",
+            (batch['id'], batch['created_at'], batch['client_id'], batch['priority'], batch['size'])
+        )
+
+    def get_batch(self, batch_id):
+        row = self._connection().execute(
+            "SELECT id, created_at, client_id, priority, size FROM batches WHERE id = ?", (batch_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge >= self.purge_interval:
+            self.purge()
+
+    def purge(self):
+        """Apply the retention policy to finished jobs"""
+        self._last_purge = time.time()
+        connection = self._connection()
+        cutoff = time.time() - self.retention_days * 86400
+        connection.execute(
+            "DELETE FROM jobs WHERE status NOT IN (?, ?) AND started_at < ?",
+            ACTIVE_STATUSES + (cutoff,)
+        )
+        connection.execute(
+            "DELETE FROM jobs WHERE status NOT IN (?, ?) AND id NOT IN "
+            "(SELECT id FROM jobs ORDER BY started_at DESC LIMIT ?)",
+            ACTIVE_STATUSES + (self.max_jobs,)
+        )
+        connection.execute(
+            "DELETE FROM batches WHERE id NOT IN (SELECT batch_id FROM jobs WHERE batch_id IS NOT NULL)"
+        )
+        with self._hot_lock:
+            self._writes += 1
+            self._hot.clear()
@@ -0,0 +1,189 @@
+"""
+Completion cache for the shared crewAI LLM objects
+At temperature 0 identical prompts give identical completions, so retries and
+reruns can reuse them instead of recomputing on Ollama. Completions are kept in
+an in-memory LRU tier backed by a size-bounded SQLite tier on disk that every
+worker process shares.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from llm_wrappers import wrap_llm_call
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+"""
+
+# Call parameters that change what the model returns
+KEY_PARAMS = ('model', 'base_url', 'temperature', 'top_p', 'max_tokens', 'seed',
+              'frequency_penalty', 'presence_penalty', 'stop')
+
+
+class CompletionCache:
+    """
+    Two-tier completion cache
+
+    Args:
+        path: SQLite file for the disk tier
+        memory_entries: Completions kept in the in-memory LRU tier
+        max_bytes: Size the disk tier is trimmed back to
+    """
+
+    def __init__(self, path, memory_entries=512, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_bytes = None
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def make_key(llm, messages, tools=None, response_model=None):
+        """Hash of the model, its parameters and the full message list"""
+        content = {
+            'params': {name: getattr(llm, name, None) for name in KEY_PARAMS},
+            'messages': messages,
+            'tools': tools,
+            'response_model': getattr(response_model, '__name__', None),
+        }
+        encoded = json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def get(self, key):
+        """Cached completion text, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return self._memory[key]
+
+        connection = self._connection()
+        row = connection.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+
+        connection.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        value = zlib.decompress(row[0]).decode('utf-8')
+        self._remember(key, value)
+        self._count('disk_hits')
+        return value
+
+    def put(self, key, value):
+        """Store a completion in both tiers"""
+        blob = zlib.compress(value.encode('utf-8'))
+        self._connection().execute(
+            "INSERT OR REPLACE INTO completions (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time())
+        )
+        self._remember(key, value)
+        self._count('stores')
+        self._evict(len(blob))
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, added_bytes):
+        # Track the disk tier's size locally and only recount it when trimming
+        connection = self._connection()
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM completions"
+                ).fetchone()[0]
+            else:
+                self._disk_bytes += added_bytes
+            if self._disk_bytes <= self.max_bytes:
+                return
+
+            # Other workers write to the same file, so trim against the real total
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            rows = connection.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes * 0.9:
+                    break
+                connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+                total -= size
+            self._disk_bytes = total
+
+    def stats(self):
+        """Hit/miss counters plus the number of completions held in memory"""
+        with self._lock:
+            lookups = sum(self.counters[name] for name in ('memory_hits', 'disk_hits', 'misses'))
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            return {
+                **self.counters,
+                'memory_entries': len(self._memory),
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def cache_completions(llm, cache):
+    """
+    Route an LLM object's call() through the completion cache
+
+    Only deterministic (temperature 0) completions are cached; tool calls pass
+    straight through. Structured responses are stored as their JSON.
+    """
+    if getattr(llm, 'temperature', None) != 0:
+        return llm
+
+    def wrap(call):
+        def cached_call(messages, *args, **kwargs):
+            tools = kwargs.get('tools', args[0] if args else None)
+            response_model = kwargs.get('response_model')
+            key = cache.make_key(llm, messages, tools, response_model)
+            cached = cache.get(key)
+            if cached is not None:
+                if response_model is not None:
+                    return response_model.model_validate_json(cached)
+                return cached
+            result = call(messages, *args, **kwargs)
+            if response_model is None and isinstance(result, str):
+                cache.put(key, result)
+            elif response_model is not None and isinstance(result, BaseModel):
+                cache.put(key, result.model_dump_json())
+            return result
+
+        return cached_call
+
+    return wrap_llm_call(llm, wrap)
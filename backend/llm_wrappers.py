@@ -0,0 +1,18 @@
+"""
+Wrapping of crewAI LLM objects' call()
+The completion cache, the endpoint router, latency budgets, task deadlines and
+first-token timing each put a wrapper around an LLM's call(); they all install
+it here.
+"""
+
+
+def wrap_llm_call(llm, wrapper_factory):
+    """
+    Replace an LLM object's call() with wrapper_factory(original call)
+
+    Returns:
+        The same LLM object
+    """
+    # crewAI LLMs are pydantic models; set the wrapper on the instance directly
+    object.__setattr__(llm, 'call', wrapper_factory(llm.call))
+    return llm
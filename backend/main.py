@@ -1,154 +1,587 @@
 """
 Pharmaceutical Multi-Agent Research System using CrewAI Framework
 Integrates with Ollama LLM for agent intelligence
+
+crewai, crewai_tools and the agents, tools and LLMs built on them are only
+loaded when a job first needs them, so importing this module is cheap.
 """
 
-from crewai import Agent, Task, Crew, Process,LLM
-from crewai_tools import SerperDevTool, FileReadTool, ScrapeWebsiteTool
-from langchain_ollama import OllamaLLM
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import json
 import os
-import sys
+import threading
+import time
+from contextlib import nullcontext
 from datetime import datetime
 
+from pydantic import BaseModel
+
+from llm_cache import CompletionCache, cache_completions
+from model_tiers import AgentMetrics, budget_completions, llm_params, load_model_config
+from model_warmup import ModelWarmer, is_ollama_model
+from ollama_router import OllamaRouter, parse_endpoints, route_completions
+from report_sections import (SECTION_SCHEMAS, MissingSection, assemble_report, partial_report_notice,
+                             section_context, section_data, sections_report, sections_to_json)
+from section_store import SectionStore
+from task_deadlines import TaskDeadlineExceeded, TaskDeadlines, deadline_completions
+from telemetry import Telemetry, first_token_completions, stream_chunk_event
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# Execution mode for the six research tasks: "sequential" runs them one after
+# another inside a single crew, "parallel" fans them out before the report stage
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "sequential")
+RESEARCH_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "6"))
+
+# Stream the report generator's tokens to event listeners as they are produced
+# (needs a crewai release with stream chunk events)
+STREAM_REPORT_TOKENS = os.getenv("STREAM_REPORT_TOKENS", "true").lower() in ("1", "true", "yes")
+
+
+# Research tasks return schema-validated sections; report sections 2-7 are
+# rendered from them by templates and only the synthesis sections need the LLM
+STRUCTURED_OUTPUTS = os.getenv("STRUCTURED_OUTPUTS", "true").lower() in ("1", "true", "yes")
+
+# Optional compaction stage: condense each research section to roughly
+# COMPACT_SECTION_TOKENS before the report generator sees it. Trades some detail
+# for a much shorter final prompt.
+COMPACT_CONTEXT = os.getenv("COMPACT_CONTEXT", "false").lower() in ("1", "true", "yes")
+COMPACT_SECTION_TOKENS = int(os.getenv("COMPACT_SECTION_TOKENS", "600"))
+
+# Completion cache shared by every agent. Only temperature-0 calls are cached,
+# so identical prompts on retries and reruns skip the round trip to Ollama.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(SCRIPT_DIR, "cache", "llm.sqlite3"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+# Research sections are stored per molecule and reused by later jobs until their
+# own TTL (seconds, SECTION_TTL_<NAME> to override) runs out, so a refresh only
+# reruns the sections that expired
+SECTION_STORE_ENABLED = os.getenv("SECTION_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+SECTION_STORE_PATH = os.getenv("SECTION_STORE_PATH", os.path.join(SCRIPT_DIR, "cache", "sections.sqlite3"))
+SECTION_TTLS = {
+    name: int(os.getenv(f"SECTION_TTL_{name.upper()}", str(days * 86400)))
+    for name, days in {
+        'market': 30,
+        'trade': 30,
+        'patent': 7,
+        'clinical_trials': 7,
+        'internal_knowledge': 30,
+        'web_intelligence': 7,
+    }.items()
+}
+
+
+# Each task must finish within its deadline (seconds, TASK_DEADLINE_<NAME> to
+# override, 0 for none). A research task that misses it is abandoned and the
+# report is written from the sections that finished; a report that misses it is
+# replaced by the sections rendered without synthesis.
+TASK_DEADLINE_SECONDS = int(os.getenv("TASK_DEADLINE_SECONDS", "600"))
+TASK_DEADLINES = {
+    name: int(os.getenv(f"TASK_DEADLINE_{name.upper()}", str(TASK_DEADLINE_SECONDS)))
+    for name in SECTION_TTLS
+}
+TASK_DEADLINES['report'] = int(os.getenv("TASK_DEADLINE_REPORT", "600"))
+# Context compaction's calls all share one deadline; a section not condensed by
+# then is handed to the report generator as written
+TASK_DEADLINES['compaction'] = int(os.getenv("TASK_DEADLINE_COMPACTION", str(TASK_DEADLINE_SECONDS)))
+
+
+# Shared HTTP layer for the scrape/search tools: keep-alive pool, per-host
+# limit and an on-disk response cache (HTTP_CACHE_TTL=0 disables the cache)
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(SCRIPT_DIR, "cache", "http.sqlite3"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "86400"))
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "256"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+
+# Serper-compatible search API the search tool calls (benchmarks point it at a
+# local fake)
+SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+
+# Internal strategy decks, meeting minutes and field reports the internal
+# knowledge agent searches. The index is updated incrementally from the
+# directory at most every INTERNAL_DOCS_REFRESH_SECONDS; without the directory
+# the agent has no tools.
+INTERNAL_DOCS_DIR = os.getenv("INTERNAL_DOCS_DIR", os.path.join(SCRIPT_DIR, "data", "internal_docs"))
+INTERNAL_DOCS_INDEX_PATH = os.getenv("INTERNAL_DOCS_INDEX_PATH", os.path.join(SCRIPT_DIR, "cache", "internal_docs"))
+INTERNAL_DOCS_TOP_K = int(os.getenv("INTERNAL_DOCS_TOP_K", "5"))
+INTERNAL_DOCS_REFRESH_SECONDS = int(os.getenv("INTERNAL_DOCS_REFRESH_SECONDS", "300"))
+
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Model and LLM parameters per agent, with optional latency budgets and faster
+# fallback models (see model_tiers.py). OLLAMA_MODEL, if set, replaces the
+# config's default model. Agents are named after their task plus "master".
+MODEL_CONFIG_PATH = os.getenv("MODEL_CONFIG_PATH", os.path.join(SCRIPT_DIR, "models.json"))
+AGENT_NAMES = ('market', 'trade', 'patent', 'clinical_trials', 'internal_knowledge',
+               'web_intelligence', 'report', 'master')
+DEFAULT_MODEL_SPEC, AGENT_MODEL_SPECS = load_model_config(
+    MODEL_CONFIG_PATH, AGENT_NAMES, default_model=os.getenv("OLLAMA_MODEL")
+)
+OLLAMA_MODEL = DEFAULT_MODEL_SPEC['model']
+for agent, spec in AGENT_MODEL_SPECS.items():
+    # A budget past the task's deadline never gets to hand calls to the fallback
+    if TASK_DEADLINES.get(agent) and (spec.get('latency_budget_seconds') or 0) >= TASK_DEADLINES[agent]:
+        print(f"⚠️  {agent} latency budget ({spec['latency_budget_seconds']}s) is not below its "
+              f"task deadline ({TASK_DEADLINES[agent]}s); its fallback will not be used in time")
+
+# Every LLM call's agent, model, latency and token counts are appended here as
+# JSON lines for tuning the tiers; empty disables the log
+AGENT_METRICS_PATH = os.getenv("AGENT_METRICS_PATH", os.path.join(SCRIPT_DIR, "data", "agent_metrics.jsonl"))
+
+# Record each run's span timeline (crew kickoffs, tasks, LLM and tool calls) as
+# JSON next to its output file
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
 
-llm = LLM(
-    model="ollama/llama3:latest",          
-    base_url="http://localhost:11434",
-    temperature=0.0                 
+# Optional pool of Ollama servers, e.g. "gpu1=http://10.0.0.5:11434@4,gpu2=http://10.0.0.6:11434".
+# Calls are spread over them (least_loaded or round_robin), each endpoint capped at
+# its @N (default OLLAMA_ENDPOINT_MAX_CONCURRENT) calls at once. When unset every
+# agent talks to OLLAMA_BASE_URL directly.
+OLLAMA_ENDPOINTS = parse_endpoints(
+    os.getenv("OLLAMA_ENDPOINTS", ""),
+    default_max_concurrent=int(os.getenv("OLLAMA_ENDPOINT_MAX_CONCURRENT", "4"))
 )
+OLLAMA_ROUTING = os.getenv("OLLAMA_ROUTING", "least_loaded")
+OLLAMA_HEALTH_INTERVAL = int(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+# Lock files that share the caps (and the load least_loaded sees) between the
+# API's worker processes and any other run on this machine; empty counts each
+# process's calls on its own, so N workers may send N times the cap
+OLLAMA_SLOT_DIR = os.getenv("OLLAMA_SLOT_DIR", os.path.join(SCRIPT_DIR, "cache", "ollama_slots"))
+# Seconds a routed call may take before its endpoint counts as unresponsive
+OLLAMA_REQUEST_TIMEOUT = int(os.getenv("OLLAMA_REQUEST_TIMEOUT", "600"))
+
+# Pin agents to endpoints, e.g. "report=gpu1,patent=gpu2+gpu3"
+OLLAMA_AGENT_ENDPOINTS = {
+    agent.strip(): names.split('+')
+    for agent, _, names in (
+        entry.partition('=') for entry in os.getenv("OLLAMA_AGENT_ENDPOINTS", "").split(',') if entry.strip()
+    )
+}
+
+# Load the agents' models on their endpoints when the server starts (or while a
+# CLI run builds its agents) and keep them loaded for OLLAMA_KEEP_ALIVE ("30m",
+# or -1 to pin them), re-sent every OLLAMA_KEEP_ALIVE_REFRESH seconds
+OLLAMA_WARM_UP = os.getenv("OLLAMA_WARM_UP", "true").lower() in ("1", "true", "yes")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_KEEP_ALIVE_REFRESH = int(os.getenv("OLLAMA_KEEP_ALIVE_REFRESH", "120"))
+
+for agent, names in OLLAMA_AGENT_ENDPOINTS.items():
+    unknown = [name for name in names if name not in {endpoint.name for endpoint in OLLAMA_ENDPOINTS}]
+    if unknown:
+        raise ValueError(f"OLLAMA_AGENT_ENDPOINTS pins {agent} to unknown endpoint(s): {', '.join(unknown)}")
+
+
+# Deadlines of the tasks running in this process, enforced on every LLM call
+task_deadlines = TaskDeadlines()
+
+# Metrics and span timeline of the job running in this process
+telemetry = Telemetry()
+
+_agent_metrics_lock = threading.Lock()
+
+
+def record_agent_call(record):
+    """Report one LLM call to the running job and append it to the agent metrics log"""
+    telemetry.job.llm_call(record)
+    if not AGENT_METRICS_PATH:
+        return
+    line = json.dumps(record) + "\n"
+    with _agent_metrics_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(AGENT_METRICS_PATH)), exist_ok=True)
+        with open(AGENT_METRICS_PATH, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+agent_metrics = AgentMetrics(
+    budgets={agent: spec.get('latency_budget_seconds') for agent, spec in AGENT_MODEL_SPECS.items()},
+    on_call=record_agent_call
+)
+
+
+
+# ============================================================================
+# LAZY CONSTRUCTION
+# ============================================================================
+
+# LLMs, tools, agents and the crewai event hooks are built on first use and
+# shared from then on. Worker processes build everything a job needs up front
+# with warm_up().
+_shared = {}
+_shared_lock = threading.RLock()
+
+
+def shared(key, build):
+    """
+    The object stored under `key`, built by calling `build` the first time it
+    is asked for (once, even when several threads ask at the same time)
+    """
+    if key not in _shared:
+        with _shared_lock:
+            if key not in _shared:
+                _shared[key] = build()
+    return _shared[key]
+
+
+def get_completion_cache():
+    """The SQLite completion cache, opened on first use; None when LLM_CACHE_ENABLED is off"""
+    return shared('completion_cache', lambda: CompletionCache(
+        LLM_CACHE_PATH,
+        memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+        max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024
+    ) if LLM_CACHE_ENABLED else None)
+
+
+def create_ollama_router():
+    router = OllamaRouter(OLLAMA_ENDPOINTS, policy=OLLAMA_ROUTING, health_interval=OLLAMA_HEALTH_INTERVAL,
+                          slot_dir=OLLAMA_SLOT_DIR or None)
+    router.start_health_checks()
+    return router
+
+
+def get_ollama_router():
+    """The endpoint router, with its health checks started on first use; None without OLLAMA_ENDPOINTS"""
+    return shared('ollama_router', lambda: create_ollama_router() if OLLAMA_ENDPOINTS else None)
+
+
+def create_section_store():
+    store = SectionStore(SECTION_STORE_PATH, ttls=SECTION_TTLS)
+    store.purge()
+    return store
+
+
+def get_section_store():
+    """The section store, opened and purged of expired sections on first use; None when disabled"""
+    return shared('section_store', lambda: create_section_store() if SECTION_STORE_ENABLED else None)
+
+
+def event_bus():
+    """crewai's event bus with this module's handlers registered, or None on crewai releases without one"""
+    return shared('event_bus', register_event_handlers)
+
+
+def report_streaming():
+    """Whether the report generator streams its tokens to the running job's listener"""
+    return STREAM_REPORT_TOKENS and event_bus() is not None and stream_chunk_event() is not None
+
+
+def register_event_handlers():
+    """
+    Attribute LLM call events to agents by role, report tool calls to the
+    running job and forward the report generator's streamed tokens
+    """
+    try:
+        from crewai.events import crewai_event_bus
+    except ImportError:  # crewai releases without the event bus
+        return None
+    
+    telemetry.register(crewai_event_bus)
+    agent_metrics.register(crewai_event_bus, {
+        profile['role']: name for name, profile in AGENT_PROFILES.items()
+    })
+    
+    # Older crewai releases don't emit stream chunk events; everything else
+    # above still works without them
+    if STREAM_REPORT_TOKENS and stream_chunk_event() is not None:
+        crewai_event_bus.on(stream_chunk_event())(forward_report_tokens)
+    return crewai_event_bus
+
+
+def create_llm(endpoints=None, failover_on_timeout=True, **params):
+    """
+    LLM routed over the endpoint pool when one is configured, fronted by the
+    completion cache and bound by the deadline of the task calling it
+    
+    Args:
+        endpoints: Endpoint names the LLM is pinned to (defaults to all of them)
+        failover_on_timeout: Whether a timed out call marks its endpoint down
+        params: LLM parameters, including the model and optionally a base_url
+            other than OLLAMA_BASE_URL
+    """
+    from crewai import LLM
+    
+    event_bus()
+    front = LLM(**{'base_url': OLLAMA_BASE_URL, **params})
+    ollama_router = get_ollama_router()
+    if ollama_router:
+        route_completions(
+            front, ollama_router,
+            lambda url: LLM(**{'timeout': OLLAMA_REQUEST_TIMEOUT, **params, 'base_url': url}),
+            endpoints, failover_on_timeout
+        )
+    completion_cache = get_completion_cache()
+    if completion_cache:
+        # A cached report completion is returned whole, without report_token events
+        cache_completions(front, completion_cache)
+    return first_token_completions(deadline_completions(front, task_deadlines), telemetry.first_tokens)
+
+
+def default_llm():
+    """The LLM shared by every agent on the default model, and by compaction"""
+    return shared('llm', lambda: create_llm(**llm_params(DEFAULT_MODEL_SPEC)))
+
+
+def agent_llm(agent, stream=False):
+    """
+    The LLM an agent runs on: the shared default_llm() unless the agent has
+    its own model, parameters, endpoints or budget, or streams its output
+    """
+    spec = AGENT_MODEL_SPECS[agent]
+    params = llm_params(spec)
+    if stream:
+        params['stream'] = True
+    endpoints = OLLAMA_AGENT_ENDPOINTS.get(agent) if OLLAMA_ENDPOINTS else None
+    budget = spec.get('latency_budget_seconds')
+    
+    if budget and spec.get('fallback'):
+        # The budget is enforced as the primary model's request timeout
+        primary = create_llm(endpoints, failover_on_timeout=False, **{**params, 'timeout': budget, 'max_retries': 0})
+        fallback = create_llm(endpoints, **{**llm_params(spec['fallback']), **({'stream': True} if stream else {})})
+        return budget_completions(primary, fallback, agent, budget, agent_metrics)
+    if params == llm_params(DEFAULT_MODEL_SPEC) and not endpoints:
+        return default_llm()
+    return create_llm(endpoints, **params)
+
+
+def get_web_client():
+    """HTTP layer shared by the scrape and search tools"""
+    def build():
+        from web_client import WebClient
+        return WebClient(
+            HTTP_CACHE_PATH,
+            ttl_seconds=HTTP_CACHE_TTL,
+            max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024,
+            max_per_host=HTTP_MAX_PER_HOST
+        )
+    return shared('web_client', build)
+
+
+# ============================================================================
+# TOOLS
+# ============================================================================
+
+def create_search_tool():
+    """Web search (needs SERPER_API_KEY, e.g. export SERPER_API_KEY="your_key")"""
+    if not os.getenv("SERPER_API_KEY"):
+        return None
+    from web_client import PooledSerperDevTool
+    return PooledSerperDevTool(client=get_web_client(), base_url=SERPER_BASE_URL)
+
+
+def create_scrape_tool():
+    """Website scraper"""
+    from web_client import PooledScrapeWebsiteTool
+    return PooledScrapeWebsiteTool(client=get_web_client())
+
+
+def create_internal_docs_tool():
+    """Search over INTERNAL_DOCS_DIR, if the directory exists"""
+    if not os.path.isdir(INTERNAL_DOCS_DIR):
+        return None
+    from document_index import DocumentIndex, InternalDocumentSearchTool
+    tool = InternalDocumentSearchTool(
+        index=DocumentIndex(INTERNAL_DOCS_INDEX_PATH),
+        docs_dir=INTERNAL_DOCS_DIR,
+        top_k=INTERNAL_DOCS_TOP_K,
+        refresh_seconds=INTERNAL_DOCS_REFRESH_SECONDS
+    )
+    # Ingest here rather than in the agent's first tool call, where it would
+    # run in a user's job outside any task deadline; workers build their tools
+    # in warm_up(), before they take jobs
+    tool.refresh(wait=True)
+    return tool
 
 
-# Initialize tools (only those that don't require API keys for basic demo)
-# For production, add: export SERPER_API_KEY="your_key"
-search_tool = SerperDevTool() if os.getenv("SERPER_API_KEY") else None
-# file_tool = FileReadTool()
-scrape_tool = ScrapeWebsiteTool()
+# Tool name -> factory returning the tool, or None when it isn't available
+TOOLS = {
+    'search': create_search_tool,
+    'scrape': create_scrape_tool,
+    'internal_docs': create_internal_docs_tool,
+}
+
+
+def get_tool(name):
+    """The shared tool `name` (see TOOLS), or None when it isn't available"""
+    return shared(('tool', name), TOOLS[name])
 
 
 # ============================================================================
 # WORKER AGENTS DEFINITION
 # ============================================================================
 
-# 1. IQVIA Insights Agent
-iqvia_agent = Agent(
-    role='IQVIA Market Intelligence Analyst',
-    goal='Analyze pharmaceutical market data, sales trends, volume shifts, and therapy area dynamics',
-    backstory="""You are an expert market analyst specializing in pharmaceutical 
+# Agent name (see AGENT_NAMES) -> role, goal, backstory and the tools it uses.
+# The Agent objects are built by get_agent() when a task first needs them.
+AGENT_PROFILES = {
+    # 1. IQVIA Insights Agent
+    'market': {
+        'role': 'IQVIA Market Intelligence Analyst',
+        'goal': 'Analyze pharmaceutical market data, sales trends, volume shifts, and therapy area dynamics',
+        'backstory': """You are an expert market analyst specializing in pharmaceutical 
     market intelligence. You have deep expertise in analyzing IQVIA datasets, 
     understanding market size, CAGR trends, and competitive therapy-level dynamics. 
     You provide data-driven insights on sales performance and market opportunities.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[search_tool] if search_tool else []
-)
-
-# 2. EXIM Trends Agent
-exim_agent = Agent(
-    role='Export-Import Trade Analyst',
-    goal='Extract and analyze export-import data for APIs and formulations across countries',
-    backstory="""You are a trade analyst specializing in pharmaceutical supply chains. 
+        'tools': ('search',),
+    },
+    
+    # 2. EXIM Trends Agent
+    'trade': {
+        'role': 'Export-Import Trade Analyst',
+        'goal': 'Extract and analyze export-import data for APIs and formulations across countries',
+        'backstory': """You are a trade analyst specializing in pharmaceutical supply chains. 
     You excel at tracking international trade flows, identifying sourcing patterns, 
     and analyzing import dependencies. You provide insights on trade volumes, 
     country-wise sourcing, and supply chain dynamics.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[search_tool] if search_tool else []
-)
-
-# 3. Patent Landscape Agent
-patent_agent = Agent(
-    role='Intellectual Property Research Specialist',
-    goal='Search and analyze patent databases for active patents, expiry timelines, and freedom-to-operate analysis',
-    backstory="""You are an IP research expert with deep knowledge of patent databases 
+        'tools': ('search',),
+    },
+    
+    # 3. Patent Landscape Agent
+    'patent': {
+        'role': 'Intellectual Property Research Specialist',
+        'goal': 'Search and analyze patent databases for active patents, expiry timelines, and freedom-to-operate analysis',
+        'backstory': """You are an IP research expert with deep knowledge of patent databases 
     including USPTO, EPO, and WIPO. You analyze patent landscapes, identify competitive 
     filings, assess patent expiry timelines, and provide FTO (Freedom to Operate) insights. 
     You help identify white spaces for innovation.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[search_tool, scrape_tool] if search_tool else [scrape_tool]
-)
-
-# 4. Clinical Trials Agent
-clinical_trials_agent = Agent(
-    role='Clinical Trials Research Analyst',
-    goal='Fetch and analyze clinical trial pipeline data from ClinicalTrials.gov and WHO ICTRP',
-    backstory="""You are a clinical research analyst specializing in trial pipeline analysis. 
+        'tools': ('search', 'scrape'),
+    },
+    
+    # 4. Clinical Trials Agent
+    'clinical_trials': {
+        'role': 'Clinical Trials Research Analyst',
+        'goal': 'Fetch and analyze clinical trial pipeline data from ClinicalTrials.gov and WHO ICTRP',
+        'backstory': """You are a clinical research analyst specializing in trial pipeline analysis. 
     You track ongoing and completed clinical trials, analyze sponsor profiles, study phase 
     distributions, and identify emerging therapeutic approaches. You provide comprehensive 
     insights into the clinical development landscape.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[search_tool, scrape_tool] if search_tool else [scrape_tool]
-)
-
-# 5. Internal Knowledge Agent
-internal_knowledge_agent = Agent(
-    role='Internal Knowledge Manager',
-    goal='Retrieve and summarize internal documents including strategy decks, meeting minutes, and field insights',
-    backstory="""You are an internal knowledge expert who maintains and analyzes the 
+        'tools': ('search', 'scrape'),
+    },
+    
+    # 5. Internal Knowledge Agent
+    'internal_knowledge': {
+        'role': 'Internal Knowledge Manager',
+        'goal': 'Retrieve and summarize internal documents including strategy decks, meeting minutes, and field insights',
+        'backstory': """You are an internal knowledge expert who maintains and analyzes the 
     company's institutional knowledge. You excel at retrieving relevant internal documents, 
     extracting key insights, and creating comparative analyses from internal data sources. 
     You bridge the gap between historical knowledge and current research needs.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[]   #[file_tool]
-)
-
-# 6. Web Intelligence Agent
-web_intelligence_agent = Agent(
-    role='Web Intelligence Researcher',
-    goal='Perform real-time web searches for clinical guidelines, scientific publications, news, and patient forums',
-    backstory="""You are a web research specialist with expertise in finding and synthesizing 
+        'tools': ('internal_docs',),
+    },
+    
+    # 6. Web Intelligence Agent
+    'web_intelligence': {
+        'role': 'Web Intelligence Researcher',
+        'goal': 'Perform real-time web searches for clinical guidelines, scientific publications, news, and patient forums',
+        'backstory': """You are a web research specialist with expertise in finding and synthesizing 
     information from diverse online sources. You excel at identifying credible sources, 
     extracting relevant guidelines, summarizing scientific publications, and tracking 
     real-world evidence from patient communities and medical news.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm,
-    tools=[search_tool, scrape_tool] if search_tool else [scrape_tool]
-)
-
-# 7. Report Generator Agent
-report_generator_agent = Agent(
-    role='Research Report Compiler',
-    goal='Synthesize all research findings into polished, comprehensive reports with visualizations',
-    backstory="""You are a scientific writer and data visualization expert. You excel at 
+        'tools': ('search', 'scrape'),
+    },
+    
+    # 7. Report Generator Agent
+    'report': {
+        'role': 'Research Report Compiler',
+        'goal': 'Synthesize all research findings into polished, comprehensive reports with visualizations',
+        'backstory': """You are a scientific writer and data visualization expert. You excel at 
     taking complex research findings from multiple sources and creating clear, comprehensive 
     reports. You organize information logically, create insightful tables and charts, and 
     present findings in formats suitable for executive decision-making.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 8. Master Agent (Orchestrator)
-master_agent = Agent(
-    role='Research Orchestrator and Strategy Lead',
-    goal='Interpret user queries, delegate tasks to specialized agents, and synthesize comprehensive insights',
-    backstory="""You are the chief research strategist who understands the complete 
+        'tools': (),
+    },
+    
+    # 8. Master Agent (Orchestrator)
+    'master': {
+        'role': 'Research Orchestrator and Strategy Lead',
+        'goal': 'Interpret user queries, delegate tasks to specialized agents, and synthesize comprehensive insights',
+        'backstory': """You are the chief research strategist who understands the complete 
     pharmaceutical innovation lifecycle. You break down complex research questions into 
     specific tasks, delegate to domain experts, and synthesize their findings into 
     actionable intelligence. You ensure all aspects of a research question are thoroughly 
     investigated.""",
-    verbose=True,
-    allow_delegation=True,
-    llm=llm
-)
+        'tools': (),
+        'allow_delegation': True,
+    },
+}
+
+
+def create_agent(name):
+    """Build the agent `name` with its LLM and the tools that are available"""
+    from crewai import Agent
+    
+    profile = AGENT_PROFILES[name]
+    # The report generator streams so the report can be shown while it is
+    # written; the returned text is the same as a non-streamed call
+    stream = name == 'report' and report_streaming()
+    return Agent(
+        role=profile['role'],
+        goal=profile['goal'],
+        backstory=profile['backstory'],
+        verbose=True,
+        allow_delegation=profile.get('allow_delegation', False),
+        llm=agent_llm(name, stream=stream),
+        tools=[tool for tool in map(get_tool, profile['tools']) if tool]
+    )
+
+
+def get_agent(name):
+    """The shared agent `name`, built on first use"""
+    return shared(('agent', name), lambda: create_agent(name))
+
+
+def model_warm_up_targets():
+    """
+    ModelWarmer arguments for the Ollama models the research and report agents
+    run on (including fallbacks), on every endpoint they can be sent to; None
+    when OLLAMA_WARM_UP is off
+    """
+    if not OLLAMA_WARM_UP:
+        return None
+    
+    targets = []
+    for agent in [*RESEARCH_TASKS, 'report']:
+        spec = AGENT_MODEL_SPECS[agent]
+        for model_spec in filter(None, [spec, spec.get('fallback')]):
+            if not is_ollama_model(model_spec['model']):
+                continue
+            if OLLAMA_ENDPOINTS:
+                names = OLLAMA_AGENT_ENDPOINTS.get(agent)
+                urls = [endpoint.url for endpoint in OLLAMA_ENDPOINTS if not names or endpoint.name in names]
+            else:
+                urls = [model_spec.get('base_url', OLLAMA_BASE_URL)]
+            targets += [(url, model_spec['model']) for url in urls if (url, model_spec['model']) not in targets]
+    return {'targets': targets, 'keep_alive': OLLAMA_KEEP_ALIVE, 'refresh_seconds': OLLAMA_KEEP_ALIVE_REFRESH}
+
+
+def warm_up():
+    """
+    Import crewai and build the research and report agents with their LLMs
+    and tools, so a worker's first job doesn't pay for it. This includes the
+    first ingestion of INTERNAL_DOCS_DIR, done when its tool is built.
+    """
+    for name in [*RESEARCH_TASKS, 'report']:
+        get_agent(name)
+    default_llm()
 
 
 # ============================================================================
 # TASK CREATION FUNCTIONS
 # ============================================================================
 
-def create_market_analysis_task(molecule_name):
-    """Create task for IQVIA market analysis"""
-    return Task(
-        description=f"""Analyze the market landscape for {molecule_name}:
+# The molecule goes on the last line of each description: everything before it
+# is the same for every job, so Ollama can reuse its cache of the prompt prefix
+# (the agent's system prompt and the task instructions) instead of
+# re-evaluating it for each molecule.
+
+def market_analysis_task(molecule_name):
+    """Prompt of the IQVIA market analysis task"""
+    return dict(
+        agent='market',
+        description=f"""Analyze the market landscape for the molecule named below:
         1. Current market size and growth trends (CAGR)
         2. Major therapy areas and indications
         3. Competitive landscape and key players
@@ -157,15 +590,17 @@ def create_market_analysis_task(molecule_name):
         
         Provide specific data points, market sizes in USD, and growth percentages.
         If you don't have access to real-time data, provide a structured analysis 
-        framework and known information about this molecule.""",
-        agent=iqvia_agent,
+        framework and known information about this molecule.
+        
+        Molecule: {molecule_name}""",
         expected_output="Detailed market analysis with tables showing market size, CAGR, and competitive positioning"
     )
 
-def create_trade_analysis_task(molecule_name):
-    """Create task for EXIM trade analysis"""
-    return Task(
-        description=f"""Analyze export-import dynamics for {molecule_name} and its API:
+def trade_analysis_task(molecule_name):
+    """Prompt of the EXIM trade analysis task"""
+    return dict(
+        agent='trade',
+        description=f"""Analyze export-import dynamics for the molecule named below and its API:
         1. Major exporting and importing countries
         2. Trade volumes and value trends (last 3 years)
         3. Key manufacturing hubs and sourcing patterns
@@ -173,15 +608,17 @@ def create_trade_analysis_task(molecule_name):
         5. Regulatory considerations for cross-border trade
         
         Focus on API and finished formulation trade data. Provide insights based on 
-        known pharmaceutical trade patterns and this molecule's characteristics.""",
-        agent=exim_agent,
+        known pharmaceutical trade patterns and this molecule's characteristics.
+        
+        Molecule: {molecule_name}""",
         expected_output="Trade analysis report with country-wise import/export data and sourcing insights"
     )
 
-def create_patent_analysis_task(molecule_name):
-    """Create task for patent landscape analysis"""
-    return Task(
-        description=f"""Conduct comprehensive patent analysis for {molecule_name}:
+def patent_analysis_task(molecule_name):
+    """Prompt of the patent landscape analysis task"""
+    return dict(
+        agent='patent',
+        description=f"""Conduct comprehensive patent analysis for the molecule named below:
         1. Active patents (composition, formulation, use patents)
         2. Patent expiry timelines (provide specific dates if known)
         3. Key patent holders and their filing strategies
@@ -189,15 +626,17 @@ def create_patent_analysis_task(molecule_name):
         5. Patent landscape showing competitive intensity
         
         You can scrape https://patents.google.com or use your knowledge of patent 
-        databases to provide insights. Focus on USPTO and major patent offices.""",
-        agent=patent_agent,
+        databases to provide insights. Focus on USPTO and major patent offices.
+        
+        Molecule: {molecule_name}""",
         expected_output="Patent landscape report with expiry dates, FTO analysis, and competitive filing patterns"
     )
 
-def create_clinical_trials_task(molecule_name):
-    """Create task for clinical trials research"""
-    return Task(
-        description=f"""Research clinical trial landscape for {molecule_name}:
+def clinical_trials_task(molecule_name):
+    """Prompt of the clinical trials research task"""
+    return dict(
+        agent='clinical_trials',
+        description=f"""Research clinical trial landscape for the molecule named below:
         1. Active clinical trials across all phases
         2. Completed trials with outcomes
         3. New indications being investigated
@@ -206,31 +645,37 @@ def create_clinical_trials_task(molecule_name):
         6. Emerging therapeutic uses beyond approved indications
         
         You can scrape ClinicalTrials.gov (https://clinicaltrials.gov) or provide 
-        analysis based on known clinical development patterns for this molecule.""",
-        agent=clinical_trials_agent,
+        analysis based on known clinical development patterns for this molecule.
+        
+        Molecule: {molecule_name}""",
         expected_output="Clinical trials analysis with trial counts by phase, sponsors, and novel indications"
     )
 
-def create_internal_knowledge_task(molecule_name):
-    """Create task for internal knowledge retrieval"""
-    return Task(
-        description=f"""Retrieve and synthesize internal company knowledge about {molecule_name}:
+def internal_knowledge_task(molecule_name):
+    """Prompt of the internal knowledge retrieval task"""
+    return dict(
+        agent='internal_knowledge',
+        description=f"""Retrieve and synthesize internal company knowledge about the molecule named below:
         1. Previous research and strategy documents
         2. Field insights from medical teams
         3. Historical development attempts or considerations
         4. Internal market assessments
         5. Competitive intelligence reports
         
+        Search the internal documents for the molecule together with each of these
+        topics and base the summary on the passages returned, citing their documents.
         If no internal documents are available, provide a framework for what internal 
-        knowledge should be collected about this molecule.""",
-        agent=internal_knowledge_agent,
+        knowledge should be collected about this molecule.
+        
+        Molecule: {molecule_name}""",
         expected_output="Summary of internal knowledge with key strategic insights and historical context"
     )
 
-def create_web_intelligence_task(molecule_name):
-    """Create task for web intelligence gathering"""
-    return Task(
-        description=f"""Gather comprehensive web intelligence on {molecule_name}:
+def web_intelligence_task(molecule_name):
+    """Prompt of the web intelligence gathering task"""
+    return dict(
+        agent='web_intelligence',
+        description=f"""Gather comprehensive web intelligence on the molecule named below:
         1. Clinical practice guidelines mentioning the molecule
         2. Recent scientific publications and breakthrough research
         3. Medical news and developments
@@ -239,14 +684,16 @@ def create_web_intelligence_task(molecule_name):
         6. Potential new therapeutic applications based on mechanism of action
         
         Focus on credible medical sources, peer-reviewed journals, and official 
-        clinical guidelines. Provide URLs when possible.""",
-        agent=web_intelligence_agent,
+        clinical guidelines. Provide URLs when possible.
+        
+        Molecule: {molecule_name}""",
         expected_output="Web intelligence report with sources, key publications, and unmet needs analysis"
     )
 
-def create_report_generation_task():
-    """Create task for final report compilation"""
-    return Task(
+def report_generation_task():
+    """Prompt of the final report compilation task"""
+    return dict(
+        agent='report',
         description="""Compile all research findings into a comprehensive innovation opportunity report:
         
         Structure the report as follows:
@@ -305,73 +752,806 @@ def create_report_generation_task():
         
         Format with clear headers, bullet points, and tables where appropriate.
         Make it executive-ready and actionable.""",
-        agent=report_generator_agent,
         expected_output="Comprehensive innovation research report with executive summary, detailed analysis, and prioritized recommendations"
     )
 
 
+def synthesis_task():
+    """
+    Prompt of the report task used with structured sections: only the sections
+    that need judgement are written by the LLM, the rest come from templates
+    """
+    return dict(
+        agent='report',
+        description="""The research findings are provided as JSON, one section per research area.
+        Synthesize them into the judgement sections of an innovation opportunity report.
+        
+        Write exactly these four sections, with these headers, in this order:
+        
+        ## 1. EXECUTIVE SUMMARY
+           - Key findings in 3-5 bullet points
+           - Top innovation opportunities
+           - Critical recommendations
+        
+        ## 8. INNOVATION OPPORTUNITIES (PRIORITIZED)
+           - New indications
+           - Alternative formulations
+           - Different patient populations
+           - Each with: rationale, feasibility, market potential
+        
+        ## 9. RISK ASSESSMENT
+           - Technical risks
+           - Regulatory risks
+           - Commercial risks
+        
+        ## 10. RECOMMENDATIONS AND NEXT STEPS
+            - Top 3 opportunities to pursue
+            - Suggested timeline
+            - Required resources
+        
+        Sections 2-7 (overview, market, patents, clinical pipeline, trade, unmet needs)
+        are generated separately from the same data; do not write them.
+        Base every statement on the findings and cite their figures where relevant.""",
+        expected_output="Executive summary, prioritized opportunities, risk assessment and recommendations in markdown"
+    )
+
+
+# Independent research tasks, keyed by section name (and named after the agent
+# that runs them). None of them needs another's output; only the report
+# generation task consumes all of them.
+RESEARCH_TASKS = {
+    'market': market_analysis_task,
+    'trade': trade_analysis_task,
+    'patent': patent_analysis_task,
+    'clinical_trials': clinical_trials_task,
+    'internal_knowledge': internal_knowledge_task,
+    'web_intelligence': web_intelligence_task,
+}
+
+
+def create_task(prompt, output_pydantic=None):
+    """Create a crewai Task from a task prompt, building its agent on first use"""
+    from crewai import Task
+    
+    return Task(
+        description=prompt['description'],
+        expected_output=prompt['expected_output'],
+        agent=get_agent(prompt['agent']),
+        output_pydantic=output_pydantic
+    )
+
+
+def create_report_generation_task():
+    """Create task for final report compilation"""
+    return create_task(report_generation_task())
+
+
+def create_synthesis_task():
+    """Create the report task used with structured sections"""
+    return create_task(synthesis_task())
+
+
+def create_research_tasks(molecule_name, structured=None, names=None):
+    """
+    Create the independent research tasks (all, or only `names`) in report
+    order; only their agents are built
+    """
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    return {
+        name: create_task(prompt(molecule_name), SECTION_SCHEMAS[name] if structured else None)
+        for name, prompt in RESEARCH_TASKS.items() if names is None or name in names
+    }
+
+
+def prompt_config(prompt):
+    """The task's and its agent's prompts, as hashed into fingerprints"""
+    profile = AGENT_PROFILES[prompt['agent']]
+    return [prompt['description'], prompt['expected_output'],
+            profile['role'], profile['goal'], profile['backstory']]
+
+
+def research_fingerprint(mode=None, compact_tokens=None, structured=None):
+    """
+    Hash of everything besides the molecule that shapes a report: task and agent
+    prompts, model config, execution mode, compaction budget and output format.
+    Result caches key on it so that a prompt or model change invalidates old
+    entries.
+    """
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    prompts = [prompt('{molecule_name}') for prompt in RESEARCH_TASKS.values()] + [
+        synthesis_task() if structured else report_generation_task()
+    ]
+    config = {
+        'tasks': [prompt_config(prompt) for prompt in prompts],
+        'models': {agent: llm_params(spec) for agent, spec in
+                   [('default', DEFAULT_MODEL_SPEC), *AGENT_MODEL_SPECS.items()]},
+        'mode': mode or RESEARCH_MODE,
+        'compaction': default_compact_tokens() if compact_tokens is None else compact_tokens,
+        'compaction_prompt': COMPACTION_PROMPT,
+        'schemas': {
+            name: schema.model_json_schema() for name, schema in SECTION_SCHEMAS.items()
+        } if structured else None,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def section_fingerprints(structured=None):
+    """
+    Per-section hash of the task and agent prompts, model config and schema that
+    produce a section. Stored sections are only reused while it still matches.
+    """
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    fingerprints = {}
+    for name, prompt in RESEARCH_TASKS.items():
+        config = prompt_config(prompt('{molecule_name}')) + [
+            llm_params(AGENT_MODEL_SPECS[name]),
+            SECTION_SCHEMAS[name].model_json_schema() if structured else None
+        ]
+        fingerprints[name] = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+    return fingerprints
+
+
+def load_stored_sections(molecule_name, structured, refresh=()):
+    """
+    Stored sections of a molecule that can be reused instead of rerunning their
+    task: still within their TTL, produced by the current prompts and not named
+    in `refresh`
+    
+    Returns:
+        Tuple of (dict of section name -> section, dict of section name -> age in seconds)
+    """
+    section_store = get_section_store()
+    if section_store is None:
+        return {}, {}
+    
+    stored = section_store.load_fresh(molecule_name, section_fingerprints(structured))
+    sections, ages = {}, {}
+    for name in RESEARCH_TASKS:
+        entry = stored.get(name)
+        if entry is None or name in refresh or entry['structured'] != structured:
+            continue
+        sections[name] = (SECTION_SCHEMAS[name].model_validate_json(entry['payload'])
+                          if entry['structured'] else entry['payload'])
+        ages[name] = entry['age_seconds']
+    return sections, ages
+
+
+def store_sections(molecule_name, sections, structured):
+    """
+    Store freshly researched sections; outputs that failed their schema and
+    sections that missed their deadline are not kept
+    """
+    section_store = get_section_store()
+    if section_store is None or not sections:
+        return
+    
+    fingerprints = section_fingerprints(structured)
+    for name, data in sections.items():
+        if isinstance(data, BaseModel):
+            section_store.save(molecule_name, name, fingerprints[name], data.model_dump_json(), True)
+        elif not structured and not isinstance(data, MissingSection):
+            section_store.save(molecule_name, name, fingerprints[name], data, False)
+
+
 # ============================================================================
 # CREW ORCHESTRATION
 # ============================================================================
 
-def create_pharma_research_crew(molecule_name, research_focus=None):
+def create_pharma_research_crew(molecule_name, research_focus=None, task_callback=None,
+                                include_report=True, structured=None, sections=None):
     """
     Create and configure the pharmaceutical research crew
     
     Args:
         molecule_name: Name of the molecule to research
         research_focus: Optional specific focus areas
+        task_callback: Optional callable invoked with each TaskOutput as tasks finish
+        include_report: Whether the crew ends with the report generation task
+        structured: Whether research tasks return structured sections (defaults
+            to STRUCTURED_OUTPUTS)
+        sections: Research tasks to include (defaults to all of them)
     """
+    from crewai import Crew, Process
     
-    # Create all research tasks
-    tasks = [
-        create_market_analysis_task(molecule_name),
-        create_trade_analysis_task(molecule_name),
-        create_patent_analysis_task(molecule_name),
-        create_clinical_trials_task(molecule_name),
-        create_internal_knowledge_task(molecule_name),
-        create_web_intelligence_task(molecule_name),
-        create_report_generation_task()
-    ]
+    # Create the research tasks
+    tasks = list(create_research_tasks(molecule_name, structured, sections).values())
+    if include_report:
+        tasks.append(create_report_generation_task())
     
     # Create the crew with sequential process
     crew = Crew(
-        agents=[
-            iqvia_agent,
-            exim_agent,
-            patent_agent,
-            clinical_trials_agent,
-            internal_knowledge_agent,
-            web_intelligence_agent,
-            report_generator_agent
-        ],
+        agents=[task.agent for task in tasks],
         tasks=tasks,
         process=Process.sequential,  # Tasks execute in order
-        verbose=True
+        verbose=True,
+        task_callback=task_callback
     )
     
     return crew
 
 
+class TaskTracker:
+    """
+    Lifecycle hooks around crew tasks: records per-task wall time and time to
+    first token, and emits task_started / task_finished / task_failed events
+    to an optional listener
+    """
+    
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.timings = {}
+        self._started = {}
+        self._tasks = {}  # task name -> crewAI task, for its time to first token
+        self._lock = threading.Lock()
+    
+    def emit(self, event_type, **fields):
+        if self.on_event:
+            self.on_event({'type': event_type, 'timestamp': time.time(), **fields})
+    
+    def started(self, name, task=None):
+        with self._lock:
+            self._started[name] = time.perf_counter()
+            if task is not None:
+                self._tasks[name] = task
+                telemetry.first_tokens.start(task)
+        telemetry.job.task_started(name, task)
+        self.emit('task_started', task=name)
+    
+    def _ended(self, name, outcome):
+        """Report a task's end to the running job; returns its first token fields for the event"""
+        with self._lock:
+            task = self._tasks.pop(name, None)
+        first_token = telemetry.first_tokens.stop(task) if task is not None else None
+        telemetry.job.task_ended(name, outcome, first_token)
+        return {'first_token_seconds': round(first_token, 3)} if first_token is not None else {}
+    
+    def finished(self, name):
+        with self._lock:
+            self.timings[name] = time.perf_counter() - self._started.pop(name)
+        first_token = self._ended(name, 'ok')
+        self.emit('task_finished', task=name, duration_seconds=round(self.timings[name], 3), **first_token)
+    
+    def failed(self, name, error):
+        with self._lock:
+            duration = time.perf_counter() - self._started.pop(name)
+        first_token = self._ended(name, 'error')
+        self.emit('task_failed', task=name, duration_seconds=round(duration, 3), error=str(error), **first_token)
+    
+    def timed_out(self, name, deadline_seconds):
+        with self._lock:
+            self.timings[name] = time.perf_counter() - self._started.pop(name)
+        first_token = self._ended(name, 'timed_out')
+        print(f"\n⏰ {name} missed its {deadline_seconds:.0f}s deadline after {self.timings[name]:.0f}s")
+        self.emit('task_timed_out', task=name, duration_seconds=round(self.timings[name], 3),
+                  deadline_seconds=round(deadline_seconds, 3), **first_token)
+    
+    def ordered_timings(self, names):
+        return {name: self.timings[name] for name in names if name in self.timings}
+
+
+class ReportTokenStream:
+    """
+    Forwards the report generator's streamed tokens as report_token events.
+    The agent's "Thought: ... Final Answer:" preamble is held back so clients
+    only see report text; a new LLM call (e.g. a retry) emits report_restart.
+    """
+    
+    MARKER = "Final Answer:"
+    
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.call_id = None
+        self.buffer = ""  # preamble until forwarding starts, then forwarded text
+        self.forwarding = False
+    
+    def feed(self, call_id, chunk):
+        if call_id != self.call_id:
+            if self.call_id is not None:
+                self.tracker.emit('report_restart')
+            self.call_id = call_id
+            self.buffer = ""
+            self.forwarding = False
+        
+        if self.forwarding:
+            self._forward(chunk)
+            return
+        
+        self.buffer += chunk
+        index = self.buffer.find(self.MARKER)
+        if index >= 0:
+            text = self.buffer[index + len(self.MARKER):]
+        elif len(self.buffer.lstrip()) >= len("Thought") and not self.buffer.lstrip().startswith("Thought"):
+            text = self.buffer  # the model answered without the preamble
+        else:
+            return
+        
+        self.forwarding = True
+        self.buffer = ""
+        self._forward(text)
+    
+    def _forward(self, text):
+        # Leading whitespace is dropped, as it is from the final answer
+        if not self.buffer:
+            text = text.lstrip()
+        if text:
+            self.buffer += text
+            self.tracker.emit('report_token', text=text)
+
+
+# Report task id -> ReportTokenStream for tasks whose tokens are being streamed
+_report_token_streams = {}
+
+
+def forward_report_tokens(source, event):
+    """Stream chunk event handler (see register_event_handlers)"""
+    # Chunk events are delivered synchronously, in order, on the calling thread
+    stream = _report_token_streams.get(event.task_id)
+    if stream:
+        stream.feed(event.call_id, event.chunk)
+
+
+def stream_report_tokens(task, tracker):
+    """Start forwarding a report task's streamed tokens to the tracker's listener"""
+    if tracker.on_event and report_streaming():
+        _report_token_streams[str(task.id)] = ReportTokenStream(tracker)
+
+
+def stop_report_tokens(task):
+    _report_token_streams.pop(str(task.id), None)
+
+
+# Same layout the sequential crew uses when aggregating prior task outputs
+CONTEXT_SEPARATOR = "\n\n----------\n\n"
+
+COMPACTION_PROMPT = """Condense the following {section} research findings for {molecule_name} \
+to at most about {words} words. Keep every figure, date, patent or trial identifier, \
+company name and source; drop repetition, hedging and narrative. Reply with the \
+condensed findings only.
+
+{findings}"""
+
+
+def default_compact_tokens():
+    """Per-section token budget from the environment, or None if compaction is off"""
+    return COMPACT_SECTION_TOKENS if COMPACT_CONTEXT else None
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def compact_section(section, molecule_name, findings, budget, seconds=None, deadline=None):
+    """
+    Condense one section's findings to roughly `budget` tokens; past the
+    deadline (a time.monotonic() value allowing `seconds`) they are kept as is
+    """
+    if estimate_tokens(findings) <= budget:
+        return findings
+    prompt = COMPACTION_PROMPT.format(
+        section=section.replace('_', ' '),
+        molecule_name=molecule_name,
+        words=int(budget * 0.75),
+        findings=findings
+    )
+    try:
+        with task_deadlines.applied('compaction', seconds, deadline) if deadline is not None else nullcontext():
+            summary = str(default_llm().call([{"role": "user", "content": prompt}])).strip()
+    except TaskDeadlineExceeded:
+        print(f"⏰ Compaction of {section} missed its {seconds:.0f}s deadline; using it as written")
+        return findings
+    # Never hand the report generator more than it would have seen anyway
+    return summary if summary and estimate_tokens(summary) < estimate_tokens(findings) else findings
+
+
+def compact_sections(sections, molecule_name, budget, max_concurrency=RESEARCH_MAX_CONCURRENCY, seconds=None):
+    """
+    Map-style compaction: summarize every section concurrently
+    
+    Args:
+        sections: Dict of section name -> research output text
+        budget: Target tokens per section; sections already within it are kept as is
+        seconds: Optional time all the summaries must be done in
+    
+    Returns:
+        Tuple of (dict of compacted text, dict of per-section input/output token
+        counts, estimated with estimate_tokens)
+    """
+    names = list(sections)
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        compacted = list(executor.map(
+            lambda name: compact_section(name, molecule_name, sections[name], budget, seconds, deadline), names
+        ))
+    
+    stats = {
+        name: {'input_tokens': estimate_tokens(sections[name]), 'output_tokens': estimate_tokens(text)}
+        for name, text in zip(names, compacted)
+    }
+    return dict(zip(names, compacted)), stats
+
+
+def print_compaction_stats(stats, budget):
+    """Print per-section token counts before and after compaction"""
+    print(f"\n🗜️  Context compaction (budget {budget} tokens per section; counts estimated at ~4 characters per token):")
+    for name, counts in stats.items():
+        print(f"   {name:<20} {counts['input_tokens']:6d} -> {counts['output_tokens']:6d} tokens")
+    total_in = sum(counts['input_tokens'] for counts in stats.values())
+    total_out = sum(counts['output_tokens'] for counts in stats.values())
+    print(f"   {'total':<20} {total_in:6d} -> {total_out:6d} tokens")
+
+
+def task_time_limit(name, deadline=None):
+    """
+    Seconds a task starting now may run (None for no limit): its own deadline,
+    cut short so that research tasks leave the report its time before the job's
+    deadline (a time.monotonic() value)
+    """
+    limit = TASK_DEADLINES.get(name) or None
+    if deadline is None:
+        return limit
+    left = deadline - time.monotonic()
+    if name != 'report':
+        left -= TASK_DEADLINES['report']
+    left = max(0.0, left)
+    return left if limit is None else min(limit, left)
+
+
+def execute_task(tracker, name, task, context=None, seconds=None):
+    """
+    Run one task on its own, reporting its lifecycle to the tracker
+    
+    Args:
+        seconds: Optional deadline; past it the task raises TaskDeadlineExceeded
+    """
+    tracker.started(name, task)
+    task_deadlines.start(task, name, seconds)
+    try:
+        output = task.execute_sync(context=context)
+    except TaskDeadlineExceeded:
+        tracker.timed_out(name, seconds)
+        raise
+    except Exception as e:
+        tracker.failed(name, e)
+        raise
+    finally:
+        task_deadlines.stop(task)
+    tracker.finished(name)
+    return output
+
+
+def collect_sections(outputs, reuse, missed):
+    """
+    Every research section in report order: reused, freshly researched, or a
+    MissingSection for tasks that missed their deadline
+    """
+    sections = {}
+    for name in RESEARCH_TASKS:
+        if name in reuse:
+            sections[name] = reuse[name]
+        elif name in outputs:
+            sections[name] = section_data(outputs[name])
+        else:
+            sections[name] = MissingSection(name, missed.get(name, 'did not run'))
+    return sections
+
+
+def run_report_stage(molecule_name, sections, tracker, compact_tokens=None,
+                     max_concurrency=RESEARCH_MAX_CONCURRENCY, structured=False, deadline=None):
+    """
+    Run the report task over the research sections, compacting them first if a
+    per-section token budget is given
+    
+    Args:
+        sections: Dict of research task name -> structured section, raw text or
+            MissingSection
+        structured: Write only the synthesis sections with the LLM and render
+            the rest of the report from the structured sections
+        deadline: Optional time.monotonic() the job must finish by
+    
+    Returns:
+        The report task output, or the report text if it was assembled,
+        written without synthesis or is missing sections
+    """
+    missing = {name: data.reason for name, data in sections.items() if isinstance(data, MissingSection)}
+    if missing:
+        print(f"\n⚠️  Writing a partial report without: {', '.join(missing)}")
+        tracker.emit('sections_missing', sections=missing)
+    
+    context = {name: section_context(data) for name, data in sections.items()}
+    if compact_tokens:
+        tracker.started('compaction')
+        try:
+            context, stats = compact_sections(context, molecule_name, compact_tokens, max_concurrency,
+                                              seconds=task_time_limit('compaction', deadline))
+        except Exception as e:
+            tracker.failed('compaction', e)
+            raise
+        tracker.finished('compaction')
+        tracker.emit('context_compacted', budget_tokens=compact_tokens, tokens_estimated=True, sections=stats)
+        print_compaction_stats(stats, compact_tokens)
+    
+    if structured:
+        report_task = create_synthesis_task()
+        context = {name: f"{name.upper()}: {text}" for name, text in context.items()}
+    else:
+        report_task = create_report_generation_task()
+    
+    stream_report_tokens(report_task, tracker)
+    try:
+        output = execute_task(tracker, 'report', report_task, CONTEXT_SEPARATOR.join(context.values()),
+                              seconds=task_time_limit('report', deadline))
+    except TaskDeadlineExceeded:
+        output = None
+        missing['report'] = 'missed its deadline'
+    finally:
+        stop_report_tokens(report_task)
+    
+    if output is not None and not structured and not missing:
+        return output
+    
+    if output is None:
+        # Fall back to the research sections as written
+        note = MissingSection('report', missing['report'])
+        report = (assemble_report(molecule_name, note, sections) if structured
+                  else sections_report(molecule_name, note, sections))
+    elif structured:
+        report = assemble_report(molecule_name, output.raw, sections)
+    else:
+        report = output.raw
+    report = partial_report_notice(missing) + report
+    if missing:
+        tracker.emit('report_partial', missing=missing)
+    if output is None or structured:
+        # The streamed tokens were at most the synthesis; hand clients the full report
+        tracker.emit('report_restart')
+        tracker.emit('report_token', text=report)
+    return report
+
+
+def stage_names(compact_tokens=None):
+    """Task names in the order they run"""
+    return list(RESEARCH_TASKS) + (['compaction'] if compact_tokens else []) + ['report']
+
+
+def run_sequential_research(molecule_name, on_event=None, compact_tokens=None, structured=None,
+                            reuse=None, deadline=None):
+    """
+    Run the research tasks one after another in a single crew, followed by
+    the report task (inside the crew, or separately after it when compacting,
+    assembling a structured report, reusing stored sections or under deadlines)
+    
+    Args:
+        reuse: Optional dict of section name -> stored section; those tasks are skipped
+        deadline: Optional time.monotonic() the job must finish by
+    
+    Returns:
+        Tuple of (report, per-task wall time in seconds, research sections)
+    """
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    reuse = reuse or {}
+    to_run = [name for name in RESEARCH_TASKS if name not in reuse]
+    report_in_crew = not (compact_tokens or structured or reuse or deadline
+                          or any(TASK_DEADLINES.values()))
+    tracker = TaskTracker(on_event)
+    outputs, missed = {}, {}
+    remaining = to_run + (['report'] if report_in_crew else [])
+    tasks = {}
+    
+    def start(name):
+        tracker.started(name, tasks[name])
+        task_deadlines.start(tasks[name], name, task_time_limit(name, deadline))
+    
+    # Tasks run back to back: each crew task callback marks one task finished
+    # and the next one started
+    def task_callback(output):
+        name = remaining.pop(0)
+        task_deadlines.stop(tasks[name])
+        outputs[name] = output
+        tracker.finished(name)
+        if remaining:
+            start(remaining[0])
+    
+    # A task that misses its deadline ends the crew; the tasks after it run in
+    # a new crew (without the finished sections as context)
+    while remaining:
+        crew = create_pharma_research_crew(molecule_name, task_callback=task_callback,
+                                           include_report=report_in_crew, structured=structured,
+                                           sections=[name for name in remaining if name != 'report'])
+        tasks = dict(zip(remaining, crew.tasks))
+        report_task = tasks.get('report')
+        if report_task:
+            stream_report_tokens(report_task, tracker)
+        
+        start(remaining[0])
+        try:
+            with telemetry.job.crew_kickoff(list(remaining)):
+                result = crew.kickoff()
+        except TaskDeadlineExceeded:
+            name = remaining.pop(0)
+            missed[name] = 'missed its deadline'
+            tracker.timed_out(name, task_deadlines.get(tasks[name])[1])
+        except Exception as e:
+            if remaining:
+                tracker.failed(remaining[0], e)
+            raise
+        finally:
+            for task in tasks.values():
+                task_deadlines.stop(task)
+            if report_task:
+                stop_report_tokens(report_task)
+            # Agents are shared module objects and crewAI runs a crew's task_callback
+            # for any task an agent still attached to it executes later
+            for agent in crew.agents:
+                agent.crew = None
+    
+    sections = collect_sections(outputs, reuse, missed)
+    if not report_in_crew:
+        result = run_report_stage(molecule_name, sections, tracker, compact_tokens,
+                                  structured=structured, deadline=deadline)
+    
+    return result, tracker.ordered_timings(stage_names(compact_tokens)), sections
+
+
+def run_parallel_research(molecule_name, max_concurrency=RESEARCH_MAX_CONCURRENCY, on_event=None,
+                          compact_tokens=None, structured=None, reuse=None, deadline=None):
+    """
+    Fan the six research tasks out concurrently, then run the report task
+    with every research output as context
+    
+    Args:
+        molecule_name: Name of the molecule to research
+        max_concurrency: Maximum number of research tasks running at once
+        on_event: Optional callable receiving task lifecycle events
+        compact_tokens: Optional per-section token budget for context compaction
+        structured: Use structured sections and a templated report (defaults to
+            STRUCTURED_OUTPUTS)
+        reuse: Optional dict of section name -> stored section; those tasks are skipped
+        deadline: Optional time.monotonic() the job must finish by
+    
+    Returns:
+        Tuple of (report, per-task wall time in seconds, research sections)
+    """
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    reuse = reuse or {}
+    research_tasks = create_research_tasks(
+        molecule_name, structured, [name for name in RESEARCH_TASKS if name not in reuse]
+    )
+    tracker = TaskTracker(on_event)
+    
+    def run(name):
+        # Each task's deadline starts when it does, not when it was queued
+        try:
+            return execute_task(tracker, name, research_tasks[name],
+                                seconds=task_time_limit(name, deadline))
+        except TaskDeadlineExceeded:
+            return None
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        outputs = dict(zip(research_tasks, executor.map(run, research_tasks)))
+    
+    sections = collect_sections(
+        {name: output for name, output in outputs.items() if output is not None}, reuse,
+        {name: 'missed its deadline' for name, output in outputs.items() if output is None}
+    )
+    result = run_report_stage(molecule_name, sections, tracker, compact_tokens, max_concurrency,
+                              structured, deadline)
+    return result, tracker.ordered_timings(stage_names(compact_tokens)), sections
+
+
+def print_task_timings(timings, total_seconds, first_tokens=None):
+    """Print per-task wall time (and time to first token) so modes can be compared"""
+    first_tokens = first_tokens or {}
+    print("\n⏱️  Task timings (wall time, time to first token):")
+    for name, seconds in timings.items():
+        first_token = f"   {first_tokens[name]:8.2f}s" if name in first_tokens else ""
+        print(f"   {name:<20} {seconds:8.1f}s{first_token}")
+    print(f"   {'total':<20} {total_seconds:8.1f}s")
+
+
+def print_cache_stats(llm_stats, web_stats):
+    """Print completion cache and web client counters (cumulative for this process)"""
+    if llm_stats:
+        print(f"\n🗄️  LLM cache: {llm_stats['memory_hits']} memory hits, {llm_stats['disk_hits']} disk hits, "
+              f"{llm_stats['misses']} misses ({llm_stats['hit_rate']:.0%} hit rate)")
+    print(f"🌐 Web: {web_stats['fetches']} fetches, {web_stats['cache_hits']} cache hits, "
+          f"{web_stats['revalidated']} revalidated, {web_stats['deduplicated']} deduplicated")
+
+
+def report_cache_lookups(job_telemetry, llm_before, web_before):
+    """Report the job's LLM and web cache hits and misses from counter snapshots"""
+    if llm_before:
+        llm_after = get_completion_cache().stats()
+        job_telemetry.cache_lookups(
+            'llm',
+            hits=sum(llm_after[name] - llm_before[name] for name in ('memory_hits', 'disk_hits')),
+            misses=llm_after['misses'] - llm_before['misses']
+        )
+    web_after = get_web_client().stats()
+    job_telemetry.cache_lookups(
+        'web',
+        hits=sum(web_after[name] - web_before[name] for name in ('cache_hits', 'deduplicated')),
+        misses=web_after['fetches'] - web_before['fetches']
+    )
+
+
+def print_agent_metrics(stats):
+    """Print per-agent LLM latency and token counters (cumulative for this process)"""
+    if not stats:
+        return
+    print("\n🤖 LLM calls per agent:")
+    print(f"   {'agent':<20} {'model':<28} {'calls':>5} {'avg s':>7} {'p95 s':>7} "
+          f"{'prompt tok':>10} {'compl tok':>10} {'fallback':>8} {'over budget':>11}")
+    for row in stats:
+        avg = f"{row['avg_seconds']:.1f}" if row['avg_seconds'] is not None else '-'
+        p95 = f"{row['p95_seconds']:.1f}" if row['p95_seconds'] is not None else '-'
+        print(f"   {row['agent']:<20} {str(row['model']):<28} {row['calls']:>5} {avg:>7} {p95:>7} "
+              f"{row['prompt_tokens']:>10} {row['completion_tokens']:>10} {row['fallbacks']:>8} "
+              f"{row['over_budget']:>11}")
+
+
+def print_endpoint_stats(endpoint_stats):
+    """Print per-endpoint call counters of the Ollama pool (cumulative for this process)"""
+    print("🖥️  Ollama endpoints: " + ", ".join(
+        f"{name} {stats['calls']} calls, {stats['failures']} failed"
+        + ("" if stats['healthy'] else " (down)")
+        for name, stats in endpoint_stats.items()
+    ))
+
+
 # ============================================================================
 # MAIN EXECUTION FUNCTION
 # ============================================================================
 
-def run_pharmaceutical_research(molecule_name, save_report=True):
+def run_pharmaceutical_research(molecule_name, save_report=True, mode=None,
+                                max_concurrency=None, output_file=None, raise_errors=False,
+                                on_event=None, compact_tokens=None, structured=None, refresh=None,
+                                deadline_seconds=None, trace=None):
     """
     Execute the complete pharmaceutical research workflow
     
     Args:
         molecule_name: Name of the molecule to research
-        save_report: Whether to save the report to file
+        save_report: Whether to save a timestamped copy of the report
+        mode: "sequential" or "parallel" (defaults to RESEARCH_MODE)
+        max_concurrency: Parallel mode task limit (defaults to RESEARCH_MAX_CONCURRENCY)
+        output_file: Optional path the report (or error) is written to. Concurrent
+            callers must each pass their own path.
+        raise_errors: Re-raise research errors instead of returning None
+        on_event: Optional callable receiving task lifecycle events as dicts
+        compact_tokens: Per-section token budget for context compaction; 0 turns
+            compaction off (defaults to COMPACT_SECTION_TOKENS if COMPACT_CONTEXT)
+        structured: Structured research sections and a templated report
+            (defaults to STRUCTURED_OUTPUTS). The sections are also written as
+            JSON next to output_file.
+        refresh: Sections to research again even if their stored results are
+            still fresh; the other sections are reused from the section store
+            until their TTL runs out
+        deadline_seconds: Optional time the whole run must fit in. Research tasks
+            are cut short so the report still gets its TASK_DEADLINE_REPORT.
+        trace: Record the run's span timeline as JSON next to output_file
+            (defaults to TRACING_ENABLED)
     
     Returns:
         Research results and report
     """
     
+    mode = mode or RESEARCH_MODE
+    max_concurrency = max_concurrency or RESEARCH_MAX_CONCURRENCY
+    compact_tokens = default_compact_tokens() if compact_tokens is None else compact_tokens
+    structured = STRUCTURED_OUTPUTS if structured is None else structured
+    trace = TRACING_ENABLED if trace is None else trace
+    
     print(f"\n{'='*80}")
-    print(f"PHARMACEUTICAL INNOVATION RESEARCH SYSTEM")
+    print("PHARMACEUTICAL INNOVATION RESEARCH SYSTEM")
     print(f"Molecule: {molecule_name}")
+    print(f"Mode: {mode}" + (f" (max concurrency {max_concurrency})" if mode == 'parallel' else ""))
+    if compact_tokens:
+        print(f"Context compaction: {compact_tokens} tokens per section")
+    if refresh:
+        print(f"Refreshing: {', '.join(refresh)}")
+    if deadline_seconds:
+        print(f"Deadline: {deadline_seconds}s")
     print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*80}\n")
     
@@ -381,49 +1561,136 @@ def run_pharmaceutical_research(molecule_name, save_report=True):
         print("   Set it with: export SERPER_API_KEY='your_key'")
         print("   Get your key from: https://serper.dev\n")
     
-    # Create the research crew
-    crew = create_pharma_research_crew(molecule_name)
-    
     # Execute the research
     print("🚀 Initiating multi-agent research workflow...\n")
     
-    try:
-        result = crew.kickoff()
-        
-        # Always save to output.txt for API consumption
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        output_file = os.path.join(script_dir, 'output.txt')
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(str(result))
-        print(f"\n📄 Output saved to: {output_file}")
+    completion_cache = get_completion_cache()
+    llm_cache_before = completion_cache.stats() if completion_cache else None
+    web_before = get_web_client().stats()
+    with telemetry.job_scope(on_event, trace, molecule=molecule_name, mode=mode) as job_telemetry:
+        try:
+            started = time.perf_counter()
+            deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+            reuse, ages = load_stored_sections(molecule_name, structured, refresh or ())
+            if reuse:
+                print("♻️  Reusing stored sections: " + ", ".join(
+                    f"{name} ({ages[name] / 3600:.1f}h old)" for name in reuse
+                ) + "\n")
+                if on_event:
+                    on_event({'type': 'sections_reused', 'timestamp': time.time(),
+                              'sections': {name: round(age) for name, age in ages.items()}})
+            
+            # Pages fetched by one task are reused by the others in this run
+            with get_web_client().job_scope():
+                if mode == 'parallel':
+                    result, timings, sections = run_parallel_research(
+                        molecule_name, max_concurrency, on_event, compact_tokens, structured, reuse,
+                        deadline
+                    )
+                else:
+                    result, timings, sections = run_sequential_research(
+                        molecule_name, on_event, compact_tokens, structured, reuse, deadline
+                    )
+            store_sections(molecule_name, {name: data for name, data in sections.items()
+                                           if name not in reuse}, structured)
+            print_task_timings(timings, time.perf_counter() - started, job_telemetry.first_token_seconds)
+            print_cache_stats(completion_cache.stats() if completion_cache else None, get_web_client().stats())
+            if get_ollama_router():
+                print_endpoint_stats(get_ollama_router().stats())
+            if _shared.get('event_bus') is not None:
+                _shared['event_bus'].flush()  # call events are handled on a thread pool
+            print_agent_metrics(agent_metrics.stats())
+            
+            if output_file:
+                write_text(output_file, str(result))
+                print(f"\n📄 Output saved to: {output_file}")
+                if structured:
+                    sections_file = sections_path(output_file)
+                    write_text(sections_file, sections_to_json(sections))
+                    print(f"📄 Structured sections saved to: {sections_file}")
+            
+            # Also save timestamped report if requested
+            if save_report:
+                report_filename = os.path.join(
+                    SCRIPT_DIR,
+                    f"pharma_research_{molecule_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                )
+                write_text(report_filename, str(result))
+                print(f"📄 Report saved to: {report_filename}")
+            
+            print(f"\n{'='*80}")
+            print("✅ RESEARCH COMPLETE")
+            print(f"{'='*80}\n")
+            
+            return result
         
-        # Also save timestamped report if requested
-        if save_report:
-            report_filename = os.path.join(
-                script_dir,
-                f"pharma_research_{molecule_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            )
-            with open(report_filename, 'w', encoding='utf-8') as f:
-                f.write(str(result))
-            print(f"📄 Report saved to: {report_filename}")
+        except Exception as e:
+            print(f"\n❌ Error during research: {str(e)}")
+            
+            if output_file:
+                write_text(output_file, f"# Research Error\n\nAn error occurred during research: {str(e)}")
+            
+            if raise_errors:
+                raise
+            return None
         
-        print(f"\n{'='*80}")
-        print("✅ RESEARCH COMPLETE")
-        print(f"{'='*80}\n")
-        
-        return result
+        # Observations and the trace are reported for failed runs too
+        finally:
+            if _shared.get('event_bus') is not None:
+                _shared['event_bus'].flush()  # call events are handled on a thread pool
+            report_cache_lookups(job_telemetry, llm_cache_before, web_before)
+            if job_telemetry.tracer and output_file:
+                job_telemetry.close()
+                write_text(trace_path(output_file), job_telemetry.tracer.to_json())
+
+
+def sections_path(output_file):
+    """Where the structured sections of a report written to output_file go"""
+    return os.path.splitext(output_file)[0] + '.json'
+
+
+def trace_path(output_file):
+    """Where the span timeline of a run writing to output_file goes"""
+    return os.path.splitext(output_file)[0] + '.trace.json'
+
+
+def write_text(path, text):
+    """Write text atomically so readers never see a partially written file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def run_research_job(molecule_name, output_file=None, on_event=None, **options):
+    """
+    Entry point for API worker processes: run the research workflow, raising
+    if the research failed
     
-    except Exception as e:
-        print(f"\n❌ Error during research: {str(e)}")
-        
-        # Write error to output.txt
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        output_file = os.path.join(script_dir, 'output.txt')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"# Research Error\n\nAn error occurred during research: {str(e)}")
-        
-        return None
+    Args:
+        molecule_name: Name of the molecule to research
+        output_file: Per-job artifact path; never shared between jobs
+        on_event: Optional callable receiving task lifecycle events
+    
+    Returns:
+        Dict with the report text and `missing`: the reason for each section
+        (or the report synthesis) left out of a partial report, empty when the
+        report is complete
+    """
+    missing = {}
+    
+    def record(event):
+        if event['type'] == 'report_partial':
+            missing.update(event['missing'])
+        if on_event:
+            on_event(event)
+    
+    result = run_pharmaceutical_research(
+        molecule_name, save_report=False, output_file=output_file,
+        raise_errors=True, on_event=record, **options
+    )
+    return {'report': str(result), 'missing': missing}
 
 
 # ============================================================================
@@ -431,18 +1698,48 @@ def run_pharmaceutical_research(molecule_name, save_report=True):
 # ============================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pharmaceutical multi-agent research")
+    parser.add_argument('molecule', nargs='?', help="Molecule to research")
+    parser.add_argument('--mode', choices=['sequential', 'parallel'], default=RESEARCH_MODE,
+                        help="Run the research tasks sequentially or concurrently")
+    parser.add_argument('--max-concurrency', type=int, default=RESEARCH_MAX_CONCURRENCY,
+                        help="Maximum research tasks running at once in parallel mode")
+    parser.add_argument('--output', default=os.path.join(SCRIPT_DIR, 'output.txt'),
+                        help="File the final report is written to")
+    parser.add_argument('--compact-tokens', type=int, default=default_compact_tokens() or 0,
+                        help="Condense each research section to this many tokens before "
+                             "the report task (0 disables compaction)")
+    parser.add_argument('--structured', action=argparse.BooleanOptionalAction,
+                        default=STRUCTURED_OUTPUTS,
+                        help="Structured research sections with a templated report")
+    parser.add_argument('--refresh', nargs='+', choices=list(RESEARCH_TASKS) + ['all'], default=[],
+                        metavar='SECTION',
+                        help="Research these sections again even if stored results are still "
+                             "fresh ('all' for every section)")
+    parser.add_argument('--deadline', type=int, default=None, metavar='SECONDS',
+                        help="Finish the run within this many seconds, writing the report from "
+                             "the sections that finished in time")
+    parser.add_argument('--trace', action=argparse.BooleanOptionalAction, default=TRACING_ENABLED,
+                        help="Write the run's span timeline as JSON next to the output file")
+    args = parser.parse_args()
+    
     # Get molecule name from command line or environment
-    if len(sys.argv) > 1:
-        molecule = sys.argv[1]
-    elif os.getenv('MOLECULE_NAME'):
-        molecule = os.getenv('MOLECULE_NAME')
-    else:
-        molecule = "Metformin"
+    molecule = args.molecule or os.getenv('MOLECULE_NAME') or "Metformin"
     
     print("Starting pharmaceutical research for:", molecule)
     print("This will take several minutes as agents work through their tasks...\n")
     
-    result = run_pharmaceutical_research(molecule)
+    # Load the models while crewai is imported and the agents are built
+    warm_up_targets = model_warm_up_targets()
+    if warm_up_targets:
+        ModelWarmer(**{**warm_up_targets, 'refresh_seconds': 0}).start()
+    
+    result = run_pharmaceutical_research(
+        molecule, mode=args.mode, max_concurrency=args.max_concurrency,
+        output_file=args.output, compact_tokens=args.compact_tokens, structured=args.structured,
+        refresh=list(RESEARCH_TASKS) if 'all' in args.refresh else args.refresh,
+        deadline_seconds=args.deadline, trace=args.trace
+    )
     
     if result:
         print("\n" + "="*80)
@@ -0,0 +1,215 @@
+"""
+Per-agent model tiers, latency budgets and call metrics
+Light summarization agents don't need the model the report generator does.
+Each agent's model and LLM parameters come from a JSON config file; an agent
+may also have a latency budget, and once one of its tasks runs past it the
+task's remaining LLM calls go to a smaller, faster fallback model. Latency and
+token counts of every LLM call are recorded per agent and model so the tiers
+can be tuned.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from llm_wrappers import wrap_llm_call
+from ollama_router import is_timeout
+
+
+# Keys of an agent's config that aren't LLM parameters
+TIER_KEYS = ('latency_budget_seconds', 'fallback')
+
+
+def load_model_config(path, agents, default_model=None):
+    """
+    Read the model config file
+
+    The file has a "default" LLM spec (model plus LLM parameters) and an "agents"
+    map of per-agent overrides, each optionally with latency_budget_seconds and a
+    "fallback" spec that overrides the agent's own.
+
+    Args:
+        agents: Agent names the config may mention
+        default_model: Overrides the default model (OLLAMA_MODEL), if given
+
+    Returns:
+        Tuple of (default spec, dict of agent name -> merged spec for every agent)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    default = dict(config.get('default', {}))
+    if default_model:
+        default['model'] = default_model
+    if not default.get('model'):
+        raise ValueError(f"{path} must set a default model")
+
+    overrides = config.get('agents', {})
+    unknown = sorted(set(overrides) - set(agents))
+    if unknown:
+        raise ValueError(f"{path} configures unknown agent(s): {', '.join(unknown)}")
+
+    specs = {}
+    for agent in agents:
+        spec = {**default, **overrides.get(agent, {})}
+        if spec.get('fallback'):
+            spec['fallback'] = {**{k: v for k, v in spec.items() if k not in TIER_KEYS},
+                                **spec['fallback']}
+        specs[agent] = spec
+    return default, specs
+
+
+def llm_params(spec):
+    """LLM constructor arguments of a spec, without the tiering keys"""
+    return {key: value for key, value in spec.items() if key not in TIER_KEYS}
+
+
+class AgentMetrics:
+    """
+    Latency and token counters per (agent, model), fed by crewAI's LLM call events
+
+    Args:
+        budgets: Dict of agent name -> latency budget in seconds, for over_budget
+        window: Recent call latencies kept per agent and model for percentiles
+        on_call: Optional callable receiving a dict per finished LLM call
+    """
+
+    def __init__(self, budgets=None, window=200, on_call=None):
+        self.budgets = dict(budgets or {})
+        self.window = window
+        self.on_call = on_call
+        self.roles = {}
+        self._lock = threading.Lock()
+        self._started = OrderedDict()  # call id -> start time of calls in flight
+        self._counters = {}
+
+    def register(self, event_bus, roles):
+        """
+        Subscribe to an event bus's LLM call events
+
+        Args:
+            roles: Dict of agent role -> agent name; calls made outside an agent
+                are counted as "other"
+        """
+        from crewai.events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent
+
+        self.roles.update(roles)
+
+        @event_bus.on(LLMCallStartedEvent)
+        def _started(source, event):
+            with self._lock:
+                self._started[event.call_id] = event.timestamp
+                while len(self._started) > 10000:  # calls whose end was never seen
+                    self._started.popitem(last=False)
+
+        @event_bus.on(LLMCallCompletedEvent)
+        def _completed(source, event):
+            self._finish(event, usage=event.usage or {})
+
+        @event_bus.on(LLMCallFailedEvent)
+        def _failed(source, event):
+            self._finish(event, error=event.error)
+
+    def _entry(self, agent, model):
+        key = (agent, model)
+        if key not in self._counters:
+            self._counters[key] = {
+                'calls': 0, 'failures': 0, 'fallbacks': 0, 'over_budget': 0,
+                'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'latencies': deque(maxlen=self.window),
+            }
+        return self._counters[key]
+
+    def _finish(self, event, usage=None, error=None):
+        agent = self.roles.get(getattr(event, 'agent_role', None), 'other')
+        with self._lock:
+            started = self._started.pop(event.call_id, None)
+            seconds = (event.timestamp - started).total_seconds() if started else None
+            entry = self._entry(agent, event.model)
+            entry['calls'] += 1
+            if error is not None:
+                entry['failures'] += 1
+            if seconds is not None:
+                entry['seconds'] += seconds
+                entry['latencies'].append(seconds)
+                budget = self.budgets.get(agent)
+                if budget and seconds > budget:
+                    entry['over_budget'] += 1
+            usage = usage or {}
+            entry['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            entry['completion_tokens'] += usage.get('completion_tokens') or 0
+
+        if self.on_call:
+            self.on_call({
+                'timestamp': event.timestamp.timestamp(), 'agent': agent, 'model': event.model,
+                'task_id': getattr(event, 'task_id', None),
+                'seconds': None if seconds is None else round(seconds, 3),
+                'prompt_tokens': usage.get('prompt_tokens'),
+                'completion_tokens': usage.get('completion_tokens'),
+                'error': error,
+            })
+
+    def record_fallback(self, agent, model):
+        """Count a call that went to an agent's fallback model"""
+        with self._lock:
+            self._entry(agent, model)['fallbacks'] += 1
+
+    def stats(self):
+        """Counters per agent and model, with average and p95 latency"""
+        with self._lock:
+            result = []
+            for (agent, model), entry in sorted(self._counters.items(), key=lambda item: str(item[0])):
+                latencies = sorted(entry['latencies'])
+                timed = len(latencies)
+                result.append({
+                    'agent': agent, 'model': model,
+                    **{key: value for key, value in entry.items() if key != 'latencies'},
+                    'avg_seconds': entry['seconds'] / timed if timed else None,
+                    'p95_seconds': latencies[min(timed - 1, int(timed * 0.95))] if timed else None,
+                })
+            return result
+
+
+def budget_completions(primary, fallback, agent, budget, metrics=None):
+    """
+    Enforce an agent's latency budget on its LLM
+
+    Each call goes to the primary LLM, which should be built with timeout=budget;
+    a call that times out is retried on the fallback LLM. Once a task has been
+    calling the LLM for longer than the budget, its remaining calls go straight
+    to the fallback.
+
+    Returns:
+        The primary LLM, with call() routed through the budget
+    """
+    task_started = OrderedDict()  # task id -> time of its first call, recent tasks only
+    lock = threading.Lock()
+
+    def use_fallback(messages, args, kwargs, reason):
+        print(f"⏱️  {agent}: {reason}; using {fallback.model}")
+        if metrics:
+            metrics.record_fallback(agent, fallback.model)
+        return fallback.call(messages, *args, **kwargs)
+
+    def wrap(call):
+        def budgeted_call(messages, *args, **kwargs):
+            task = kwargs.get('from_task')
+            now = time.monotonic()
+            if task is not None:
+                with lock:
+                    started = task_started.setdefault(str(task.id), now)
+                    while len(task_started) > 1000:
+                        task_started.popitem(last=False)
+                if now - started > budget:
+                    return use_fallback(messages, args, kwargs, f"task past its {budget}s budget")
+            try:
+                return call(messages, *args, **kwargs)
+            except Exception as e:
+                if not is_timeout(e):
+                    raise
+                return use_fallback(messages, args, kwargs, f"{primary.model} call exceeded {budget}s")
+
+        return budgeted_call
+
+    return wrap_llm_call(primary, wrap)
@@ -0,0 +1,143 @@
+"""
+Ollama model warm-up and keep-alive
+The first LLM call of a job used to wait for Ollama to load its model, and
+Ollama unloads a model a few minutes (its OLLAMA_KEEP_ALIVE, 5 by default)
+after the last request, so a quiet spell meant paying the load again.
+ModelWarmer loads the configured models on their endpoints when the server
+starts and re-sends the load request with a longer keep_alive on an interval.
+That also matters because the OpenAI-compatible API the agents call resets a
+model's expiry to Ollama's default on every request.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def ollama_model_name(model):
+    """Ollama's name for an LLM model string: ollama/llama3 -> llama3"""
+    provider, _, name = model.partition('/')
+    return name if name and provider in ('ollama', 'ollama_chat') else model
+
+
+def is_ollama_model(model):
+    return model.startswith(('ollama/', 'ollama_chat/'))
+
+
+def parse_keep_alive(value):
+    """
+    keep_alive as Ollama expects it: seconds as a number (-1 keeps the model
+    loaded until Ollama stops, 0 unloads it) or a duration such as "30m"
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class ModelWarmer:
+    """
+    Loads models on Ollama endpoints and keeps them loaded
+
+    Models on the same endpoint are loaded one after another, so the first
+    ones are ready soonest; endpoints are loaded in parallel. Only list models
+    that fit in the endpoint's memory together, or they will keep evicting
+    each other.
+
+    Args:
+        targets: (endpoint url, model) pairs, models as in the LLM config
+            (e.g. "ollama/llama3:latest")
+        keep_alive: How long Ollama keeps a model loaded after each load
+            request (see parse_keep_alive)
+        refresh_seconds: Interval between load requests after the first
+            round; 0 loads once
+        timeout: Seconds a single load may take
+    """
+
+    def __init__(self, targets, keep_alive='30m', refresh_seconds=120, timeout=600):
+        self.endpoints = {}
+        for url, model in targets:
+            models = self.endpoints.setdefault(url.rstrip('/'), [])
+            if ollama_model_name(model) not in models:
+                models.append(ollama_model_name(model))
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self.ready = threading.Event()  # set once the first round of loads is done
+        self._loads = {}  # (url, model) -> outcome of its latest load request
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, url, model):
+        """
+        Ask an endpoint to load a model (an empty generate request)
+
+        Returns:
+            Dict with the request's seconds, Ollama's own load_seconds (0 when
+            the model was already loaded) and an error message or None
+        """
+        started = time.perf_counter()
+        try:
+            response = requests.post(f'{url}/api/generate', json={'model': model, 'keep_alive': self.keep_alive},
+                                     timeout=self.timeout)
+            response.raise_for_status()
+            outcome = {'load_seconds': round(response.json().get('load_duration', 0) / 1e9, 3), 'error': None}
+        except (requests.RequestException, ValueError) as e:
+            outcome = {'load_seconds': None, 'error': str(e)}
+        outcome['seconds'] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self._loads[(url, model)] = {**outcome, 'at': time.time()}
+        return outcome
+
+    def _load_endpoint(self, url):
+        return {(url, model): self.load(url, model) for model in self.endpoints[url]}
+
+    def warm(self):
+        """
+        Load every model on its endpoints
+
+        Returns:
+            Dict of (url, model) -> outcome (see load)
+        """
+        outcomes = {}
+        if self.endpoints:
+            with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+                for endpoint_outcomes in executor.map(self._load_endpoint, list(self.endpoints)):
+                    outcomes.update(endpoint_outcomes)
+        self.ready.set()
+        return outcomes
+
+    def start(self):
+        """Warm up on a background thread, then keep refreshing until stop()"""
+        self._thread = threading.Thread(target=self._run, name='model-warmer', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        for (url, model), outcome in self.warm().items():
+            if outcome['error']:
+                print(f"⚠️  Could not load {model} on {url}: {outcome['error']}")
+            else:
+                print(f"🔥 {model} loaded on {url} in {outcome['seconds']:.1f}s (keep_alive {self.keep_alive})")
+        while self.refresh_seconds and not self._stop.wait(self.refresh_seconds):
+            self.warm()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Keep-alive policy and the latest load of each model, for the health endpoint"""
+        with self._lock:
+            loads = dict(self._loads)
+        return {
+            'ready': self.ready.is_set(),
+            'keep_alive': self.keep_alive,
+            'refresh_seconds': self.refresh_seconds,
+            'models': [
+                {'endpoint': url, 'model': model, **loads.get((url, model), {})}
+                for url, models in self.endpoints.items() for model in models
+            ],
+        }
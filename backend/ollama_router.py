@@ -0,0 +1,349 @@
+"""
+Routing of LLM calls across a pool of Ollama servers
+Every agent used to queue on one Ollama server. The router spreads calls over
+several endpoints, least-loaded or round-robin, keeps each endpoint under its
+own concurrency cap, health-checks them in the background and fails a call over
+to another endpoint when the one it was sent to stops responding. Agents can be
+pinned to a subset of the endpoints. Given a slot directory, the caps hold
+across every process on the machine (e.g. all of the API's workers), not per
+process.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import requests
+
+from llm_wrappers import wrap_llm_call
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; caps then apply per process
+    fcntl = None
+
+
+# Errors meaning the endpoint itself is unreachable, as opposed to the request
+# being bad; only these fail a call over to another endpoint
+FAILOVER_ERRORS = (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout)
+TIMEOUT_ERRORS = (TimeoutError, requests.Timeout)
+
+ROUTING_POLICIES = ('least_loaded', 'round_robin')
+
+# Seconds between retries while another process holds every free slot
+SLOT_POLL_SECONDS = 0.05
+
+
+def openai_errors(*names):
+    """
+    The named openai exception classes, once the LLM client has imported
+    openai (its errors can't be raised before, and importing it is slow)
+    """
+    openai = sys.modules.get('openai')
+    return tuple(getattr(openai, name) for name in names if hasattr(openai, name))
+
+
+def is_timeout(error):
+    """Whether an error, or one it was raised from, is a request timeout"""
+    errors = TIMEOUT_ERRORS + openai_errors('APITimeoutError')
+    while error is not None:
+        if isinstance(error, errors):
+            return True
+        error = error.__cause__
+    return False
+
+
+class NoEndpointAvailable(RuntimeError):
+    """Raised when none of the endpoints a call may use is healthy"""
+
+
+class Endpoint:
+    """One Ollama server and its live counters"""
+
+    def __init__(self, name, url, max_concurrent=4):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.healthy = True
+        self.calls = 0
+        self.failures = 0
+        self.last_error = None
+
+
+def parse_endpoints(spec, default_max_concurrent=4):
+    """
+    Parse an endpoint list such as "gpu1=http://10.0.0.5:11434@4,http://10.0.0.6:11434"
+
+    Each entry is an optional name, a URL and an optional per-endpoint
+    concurrency cap. Unnamed endpoints are named after their host and port.
+    """
+    endpoints = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, url = entry.rpartition('=')
+        url, _, cap = url.partition('@')
+        name = name or url.split('://')[-1].rstrip('/')
+        endpoints.append(Endpoint(name, url, int(cap) if cap else default_max_concurrent))
+    return endpoints
+
+
+class SlotLocks:
+    """
+    Endpoint concurrency slots shared by the processes on this machine
+
+    Each of an endpoint's max_concurrent slots is a lock file, and a call holds
+    an flock on one while it runs. The OS drops a process's locks when it exits,
+    so a worker killed mid-call (a cancelled or timed out job) doesn't leak its
+    slots the way a multiprocessing semaphore would.
+
+    Args:
+        directory: Where the lock files live (created if needed); processes
+            sharing it share the caps
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, endpoint, index):
+        # Keyed on the URL: the cap belongs to the server, whatever it's named
+        key = hashlib.sha1(endpoint.url.encode('utf-8')).hexdigest()[:16]
+        return open(os.path.join(self.directory, f'{key}.{index}.lock'), 'a')
+
+    def _try_lock(self, endpoint, index):
+        slot = self._open(endpoint, index)
+        try:
+            fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return slot
+        except BlockingIOError:
+            slot.close()
+            return None
+
+    def try_acquire(self, endpoint):
+        """Lock a free slot of the endpoint; the open lock file, or None if every slot is held"""
+        for index in range(endpoint.max_concurrent):
+            slot = self._try_lock(endpoint, index)
+            if slot is not None:
+                return slot
+        return None
+
+    def in_use(self, endpoint):
+        """Slots of the endpoint held by any process"""
+        used = 0
+        for index in range(endpoint.max_concurrent):
+            slot = self._try_lock(endpoint, index)
+            if slot is None:
+                used += 1
+            else:
+                self.release(slot)
+        return used
+
+    def release(self, slot):
+        fcntl.flock(slot, fcntl.LOCK_UN)
+        slot.close()
+
+
+class OllamaRouter:
+    """
+    Chooses the endpoint for each LLM call
+
+    Args:
+        endpoints: List of Endpoint
+        policy: "least_loaded" (lowest in-flight share of its cap) or "round_robin"
+        health_interval: Seconds between background health checks
+        health_timeout: Seconds an endpoint gets to answer a health check
+        slot_dir: Directory of SlotLocks, so that the caps and the load
+            least_loaded balances are shared with the other processes using
+            it; without one (or without flock) they count this process's calls
+    """
+
+    def __init__(self, endpoints, policy='least_loaded', health_interval=15, health_timeout=3, slot_dir=None):
+        if not endpoints:
+            raise ValueError("OllamaRouter needs at least one endpoint")
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy {policy!r}; use one of {ROUTING_POLICIES}")
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self.policy = policy
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._order = list(self.endpoints)
+        self._turn = 0
+        self._changed = threading.Condition()
+        self._health_thread = None
+        self.slot_locks = SlotLocks(slot_dir) if slot_dir and fcntl else None
+        self._held = {name: [] for name in self.endpoints}  # lock files of this process's calls
+
+    def _pick(self, free, in_use):
+        # Rotate the tie-break so equally loaded endpoints take turns
+        self._turn = (self._turn + 1) % len(self._order)
+        rotation = {name: (index - self._turn) % len(self._order)
+                    for index, name in enumerate(self._order)}
+        if self.policy == 'round_robin':
+            return min(free, key=lambda e: rotation[e.name])
+        return min(free, key=lambda e: (in_use[e.name] / e.max_concurrent, rotation[e.name]))
+
+    def _take_slot(self, healthy):
+        """Reserve a slot on one of the healthy endpoints; None if all are at their cap"""
+        if not self.slot_locks:
+            in_use = {endpoint.name: endpoint.in_flight for endpoint in healthy}
+        else:
+            in_use = {endpoint.name: self.slot_locks.in_use(endpoint) for endpoint in healthy}
+        free = [endpoint for endpoint in healthy if in_use[endpoint.name] < endpoint.max_concurrent]
+        while free:
+            endpoint = self._pick(free, in_use)
+            if not self.slot_locks:
+                return endpoint
+            slot = self.slot_locks.try_acquire(endpoint)
+            if slot is not None:
+                self._held[endpoint.name].append(slot)
+                return endpoint
+            # Another process took the last free slot since it was counted
+            free.remove(endpoint)
+        return None
+
+    def acquire(self, names=None, exclude=()):
+        """
+        Reserve a slot on an endpoint, waiting while every candidate is at its cap
+
+        Args:
+            names: Endpoints the call may use (defaults to all of them)
+            exclude: Endpoints already tried for this call
+
+        Raises:
+            NoEndpointAvailable: If no candidate endpoint is healthy
+        """
+        candidates = [self.endpoints[name] for name in (names or self._order) if name not in exclude]
+        with self._changed:
+            while True:
+                healthy = [endpoint for endpoint in candidates if endpoint.healthy]
+                if not healthy:
+                    raise NoEndpointAvailable(
+                        "No healthy Ollama endpoint among: "
+                        + ", ".join(f"{e.name} ({e.last_error or 'excluded'})" for e in candidates)
+                        if candidates else "No Ollama endpoint left to try"
+                    )
+                endpoint = self._take_slot(healthy)
+                if endpoint:
+                    endpoint.in_flight += 1
+                    return endpoint
+                # Slots freed by other processes aren't signalled; check again shortly
+                self._changed.wait(SLOT_POLL_SECONDS if self.slot_locks else None)
+
+    def release(self, endpoint, error=None):
+        """Free a slot; an error marks the endpoint down until a health check passes"""
+        with self._changed:
+            if self.slot_locks:
+                self.slot_locks.release(self._held[endpoint.name].pop())
+            endpoint.in_flight -= 1
+            endpoint.calls += 1
+            if error is not None:
+                endpoint.failures += 1
+                endpoint.last_error = str(error)
+                if endpoint.healthy:
+                    endpoint.healthy = False
+                    print(f"⚠️  Ollama endpoint {endpoint.name} is down: {error}")
+            self._changed.notify_all()
+
+    def check_health(self):
+        """Probe every endpoint once and update its health"""
+        for endpoint in self.endpoints.values():
+            try:
+                response = requests.get(f"{endpoint.url}/api/version", timeout=self.health_timeout)
+                healthy, error = response.status_code < 500, f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                healthy, error = False, str(e)
+
+            with self._changed:
+                if healthy != endpoint.healthy:
+                    print(f"✅ Ollama endpoint {endpoint.name} is back up" if healthy
+                          else f"⚠️  Ollama endpoint {endpoint.name} failed its health check: {error}")
+                endpoint.healthy = healthy
+                if not healthy:
+                    endpoint.last_error = error
+                self._changed.notify_all()
+
+    def start_health_checks(self):
+        """Check endpoint health in a background thread every health_interval seconds"""
+        if self._health_thread is not None:
+            return
+
+        def loop():
+            while True:
+                self.check_health()
+                time.sleep(self.health_interval)
+
+        self._health_thread = threading.Thread(target=loop, name='ollama-health', daemon=True)
+        self._health_thread.start()
+
+    def stats(self):
+        """Per-endpoint counters for this process"""
+        with self._changed:
+            return {
+                endpoint.name: {
+                    'url': endpoint.url,
+                    'healthy': endpoint.healthy,
+                    'in_flight': endpoint.in_flight,
+                    'max_concurrent': endpoint.max_concurrent,
+                    'calls': endpoint.calls,
+                    'failures': endpoint.failures,
+                    'last_error': endpoint.last_error,
+                }
+                for endpoint in self.endpoints.values()
+            }
+
+
+def route_completions(llm, router, make_llm, names=None, failover_on_timeout=True):
+    """
+    Send an LLM object's call()s through the router
+
+    The object keeps its own model and parameters (and so its completion cache
+    keys); each call is made by a client for the chosen endpoint, built on first
+    use by make_llm(url).
+
+    Args:
+        names: Endpoints this LLM may use (defaults to all of them)
+        failover_on_timeout: Treat a timed out call as a dead endpoint. Off for
+            LLMs whose timeout is a latency budget rather than a liveness limit.
+    """
+    clients = {}
+    clients_lock = threading.Lock()
+
+    def client(endpoint):
+        with clients_lock:
+            if endpoint.name not in clients:
+                clients[endpoint.name] = make_llm(endpoint.url)
+            return clients[endpoint.name]
+
+    def routed_call(messages, *args, **kwargs):
+        tried = []
+        last_error = None
+        while True:
+            try:
+                endpoint = router.acquire(names, exclude=tried)
+            except NoEndpointAvailable:
+                if last_error is not None:
+                    raise last_error
+                raise
+            try:
+                result = client(endpoint).call(messages, *args, **kwargs)
+            except FAILOVER_ERRORS + openai_errors('APIConnectionError') as e:
+                if not failover_on_timeout and is_timeout(e):
+                    router.release(endpoint)
+                    raise
+                router.release(endpoint, e)
+                tried.append(endpoint.name)
+                last_error = e
+                continue
+            except BaseException:
+                router.release(endpoint)
+                raise
+            router.release(endpoint)
+            return result
+
+    # Every call goes to an endpoint's client; the object's own call() isn't used
+    return wrap_llm_call(llm, lambda call: routed_call)
@@ -0,0 +1,349 @@
+"""
+Structured research sections and deterministic report assembly
+Each research task returns one of the schemas below instead of free text.
+Sections 2-7 of the report are rendered from them by plain templates, so only
+the synthesis sections (1 and 8-10) still need the report generator's LLM call.
+"""
+
+import json
+import re
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+# ============================================================================
+# SECTION SCHEMAS
+# ============================================================================
+
+class MarketSize(BaseModel):
+    segment: str = Field(description="Region, indication or 'Global'")
+    year: Optional[int] = None
+    size_usd_millions: Optional[float] = None
+    cagr_percent: Optional[float] = None
+
+
+class Competitor(BaseModel):
+    company: str
+    product: Optional[str] = None
+    market_share_percent: Optional[float] = None
+    notes: Optional[str] = None
+
+
+class MarketAnalysis(BaseModel):
+    market_sizes: list[MarketSize] = Field(default_factory=list)
+    therapy_areas: list[str] = Field(default_factory=list)
+    competitors: list[Competitor] = Field(default_factory=list)
+    sales_trends: list[str] = Field(default_factory=list)
+    pricing_and_reimbursement: list[str] = Field(default_factory=list)
+
+
+class TradeFlow(BaseModel):
+    country: str
+    value_usd_millions: Optional[float] = None
+    share_percent: Optional[float] = None
+    notes: Optional[str] = None
+
+
+class TradeAnalysis(BaseModel):
+    top_exporters: list[TradeFlow] = Field(default_factory=list)
+    top_importers: list[TradeFlow] = Field(default_factory=list)
+    manufacturing_hubs: list[str] = Field(default_factory=list)
+    import_dependencies: list[str] = Field(default_factory=list)
+    supply_chain_risks: list[str] = Field(default_factory=list)
+    regulatory_considerations: list[str] = Field(default_factory=list)
+
+
+class Patent(BaseModel):
+    number: str
+    holder: Optional[str] = None
+    patent_type: Optional[str] = Field(default=None, description="composition, formulation, use or process")
+    jurisdiction: Optional[str] = None
+    expiry_date: Optional[str] = Field(default=None, description="YYYY-MM-DD, or YYYY if only the year is known")
+    status: Optional[str] = None
+
+
+class PatentLandscape(BaseModel):
+    patents: list[Patent] = Field(default_factory=list)
+    freedom_to_operate: list[str] = Field(default_factory=list)
+    white_space_opportunities: list[str] = Field(default_factory=list)
+    filing_strategies: list[str] = Field(default_factory=list)
+
+
+class Trial(BaseModel):
+    trial_id: Optional[str] = Field(default=None, description="Registry identifier, e.g. an NCT number")
+    indication: Optional[str] = None
+    phase: Optional[str] = None
+    status: Optional[str] = None
+    sponsor: Optional[str] = None
+
+
+class ClinicalPipeline(BaseModel):
+    trials_by_phase: dict[str, int] = Field(default_factory=dict, description="Phase -> number of trials")
+    trials: list[Trial] = Field(default_factory=list)
+    emerging_indications: list[str] = Field(default_factory=list)
+    sponsors: list[str] = Field(default_factory=list)
+    design_trends: list[str] = Field(default_factory=list)
+
+
+class InternalKnowledge(BaseModel):
+    key_insights: list[str] = Field(default_factory=list)
+    historical_context: list[str] = Field(default_factory=list)
+    knowledge_gaps: list[str] = Field(default_factory=list)
+
+
+class MoleculeOverview(BaseModel):
+    mechanism_of_action: Optional[str] = None
+    approved_indications: list[str] = Field(default_factory=list)
+    pharmacological_properties: list[str] = Field(default_factory=list)
+
+
+class UnmetNeed(BaseModel):
+    need: str
+    patient_population: Optional[str] = None
+    evidence: Optional[str] = None
+
+
+class Publication(BaseModel):
+    title: str
+    source: Optional[str] = None
+    year: Optional[int] = None
+    url: Optional[str] = None
+
+
+class WebIntelligence(BaseModel):
+    molecule_overview: MoleculeOverview = Field(default_factory=MoleculeOverview)
+    guidelines: list[str] = Field(default_factory=list)
+    publications: list[Publication] = Field(default_factory=list)
+    unmet_needs: list[UnmetNeed] = Field(default_factory=list)
+    patient_perspectives: list[str] = Field(default_factory=list)
+    potential_new_applications: list[str] = Field(default_factory=list)
+
+
+# Research task name -> schema of its output
+SECTION_SCHEMAS = {
+    'market': MarketAnalysis,
+    'trade': TradeAnalysis,
+    'patent': PatentLandscape,
+    'clinical_trials': ClinicalPipeline,
+    'internal_knowledge': InternalKnowledge,
+    'web_intelligence': WebIntelligence,
+}
+
+
+class MissingSection(str):
+    """
+    Stand-in for a section whose task didn't finish. It reads as a note wherever
+    the section's text would go and keeps the reason for the job's events.
+    """
+
+    def __new__(cls, name, reason):
+        section = super().__new__(cls, f'_Not available: the {name.replace("_", " ")} task {reason}._')
+        section.reason = reason
+        return section
+
+
+def section_data(output):
+    """A task output's structured section, or its raw text if it didn't validate"""
+    return output.pydantic if output.pydantic is not None else output.raw
+
+
+def section_context(data):
+    """Compact text form of a section for the synthesis prompt"""
+    if isinstance(data, BaseModel):
+        return data.model_dump_json(exclude_none=True, exclude_defaults=True)
+    return data
+
+
+def sections_to_json(sections):
+    """JSON document of every section; unstructured ones are kept as text"""
+    return json.dumps({
+        name: data.model_dump(mode='json') if isinstance(data, BaseModel)
+        else {'missing': data.reason} if isinstance(data, MissingSection)
+        else {'raw': data}
+        for name, data in sections.items()
+    }, indent=2)
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+def _value(value, suffix=''):
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, float):
+        value = f'{value:,.1f}'.rstrip('0').rstrip('.')
+    return f'{value}{suffix}'
+
+
+def _table(headers, rows):
+    if not rows:
+        return ''
+    lines = ['| ' + ' | '.join(headers) + ' |', '|' + '---|' * len(headers)]
+    lines += ['| ' + ' | '.join(_value(cell).replace('|', '/') for cell in row) + ' |' for row in rows]
+    return '\n'.join(lines) + '\n\n'
+
+
+def _bullets(title, items):
+    items = [item for item in items if item]
+    if not items:
+        return ''
+    return f'**{title}**\n\n' + ''.join(f'- {item}\n' for item in items) + '\n'
+
+
+def _section(number, title, body):
+    return f'## {number}. {title}\n\n{body.strip() or "_No data returned._"}\n\n'
+
+
+def render_molecule_overview(data):
+    overview = data.molecule_overview
+    body = f"**Mechanism of action:** {overview.mechanism_of_action}\n\n" if overview.mechanism_of_action else ''
+    body += _bullets('Approved indications', overview.approved_indications)
+    body += _bullets('Pharmacological properties', overview.pharmacological_properties)
+    return body
+
+
+def render_market(data):
+    body = _table(
+        ['Segment', 'Year', 'Market size (USD M)', 'CAGR (%)'],
+        [[m.segment, m.year, m.size_usd_millions, m.cagr_percent] for m in data.market_sizes]
+    )
+    body += _bullets('Therapy areas', data.therapy_areas)
+    if data.competitors:
+        body += '**Competitive landscape**\n\n' + _table(
+            ['Company', 'Product', 'Share (%)', 'Notes'],
+            [[c.company, c.product, c.market_share_percent, c.notes] for c in data.competitors]
+        )
+    body += _bullets('Sales trends', data.sales_trends)
+    body += _bullets('Pricing and reimbursement', data.pricing_and_reimbursement)
+    return body
+
+
+def render_patents(data):
+    # Soonest expiry first; undated patents last
+    patents = sorted(data.patents, key=lambda p: (p.expiry_date is None, p.expiry_date or ''))
+    body = _table(
+        ['Patent', 'Holder', 'Type', 'Jurisdiction', 'Expiry', 'Status'],
+        [[p.number, p.holder, p.patent_type, p.jurisdiction, p.expiry_date, p.status] for p in patents]
+    )
+    body += _bullets('Freedom to operate', data.freedom_to_operate)
+    body += _bullets('White space opportunities', data.white_space_opportunities)
+    body += _bullets('Filing strategies', data.filing_strategies)
+    return body
+
+
+def render_clinical(data):
+    body = ''
+    if data.trials_by_phase:
+        body += '**Trials by phase**\n\n' + _table(
+            ['Phase', 'Trials'], [[phase, count] for phase, count in data.trials_by_phase.items()]
+        )
+    if data.trials:
+        body += '**Notable trials**\n\n' + _table(
+            ['Trial', 'Indication', 'Phase', 'Status', 'Sponsor'],
+            [[t.trial_id, t.indication, t.phase, t.status, t.sponsor] for t in data.trials]
+        )
+    body += _bullets('Emerging indications', data.emerging_indications)
+    body += _bullets('Sponsors', data.sponsors)
+    body += _bullets('Trial design trends', data.design_trends)
+    return body
+
+
+def render_trade(data):
+    body = ''
+    for title, flows in (('Top exporters', data.top_exporters), ('Top importers', data.top_importers)):
+        if flows:
+            body += f'**{title}**\n\n' + _table(
+                ['Country', 'Value (USD M)', 'Share (%)', 'Notes'],
+                [[f.country, f.value_usd_millions, f.share_percent, f.notes] for f in flows]
+            )
+    body += _bullets('Manufacturing hubs', data.manufacturing_hubs)
+    body += _bullets('Import dependencies', data.import_dependencies)
+    body += _bullets('Supply chain risks', data.supply_chain_risks)
+    body += _bullets('Regulatory considerations', data.regulatory_considerations)
+    return body
+
+
+def render_unmet_needs(data):
+    body = _table(
+        ['Unmet need', 'Patient population', 'Evidence'],
+        [[n.need, n.patient_population, n.evidence] for n in data.unmet_needs]
+    )
+    body += _bullets('Patient perspectives', data.patient_perspectives)
+    body += _bullets('Clinical guidelines', data.guidelines)
+    body += _bullets('Key publications', [
+        ', '.join(str(part) for part in (p.title, p.source, p.year, p.url) if part)
+        for p in data.publications
+    ])
+    return body
+
+
+# Report section number, title, source task and renderer for sections 2-7
+TEMPLATE_SECTIONS = [
+    (2, 'MOLECULE OVERVIEW', 'web_intelligence', render_molecule_overview),
+    (3, 'MARKET ANALYSIS', 'market', render_market),
+    (4, 'PATENT LANDSCAPE', 'patent', render_patents),
+    (5, 'CLINICAL DEVELOPMENT PIPELINE', 'clinical_trials', render_clinical),
+    (6, 'TRADE AND SUPPLY CHAIN', 'trade', render_trade),
+    (7, 'UNMET MEDICAL NEEDS', 'web_intelligence', render_unmet_needs),
+]
+
+
+def render_template_sections(sections):
+    """
+    Render report sections 2-7 from the research sections
+
+    A section whose task output didn't match its schema is shown as the task's
+    raw text, once, under the first report section it feeds.
+    """
+    rendered = []
+    shown_raw = set()
+    for number, title, source, render in TEMPLATE_SECTIONS:
+        data = sections.get(source)
+        if isinstance(data, BaseModel):
+            body = render(data)
+        elif source in shown_raw:
+            body = f'_See the {source.replace("_", " ")} findings above._'
+        else:
+            body = data or ''
+            shown_raw.add(source)
+        rendered.append(_section(number, title, body))
+    return ''.join(rendered)
+
+
+# Where the synthesis text continues after the templated sections
+_SECTION_8 = re.compile(r'^[#*\s]*8\s*[.)]\s*INNOVATION', re.IGNORECASE | re.MULTILINE)
+
+
+def assemble_report(molecule_name, synthesis, sections):
+    """
+    Full report: the synthesized executive summary, templated sections 2-7, then
+    the synthesized sections 8-10
+    """
+    synthesis = synthesis.strip()
+    match = _SECTION_8.search(synthesis)
+    head, tail = (synthesis[:match.start()], synthesis[match.start():]) if match else (synthesis, '')
+    return (
+        f'# Innovation Opportunity Report: {molecule_name}\n\n'
+        f'{head.strip()}\n\n'
+        f'{render_template_sections(sections)}'
+        f'{tail.strip()}\n'
+    )
+
+
+def sections_report(molecule_name, note, sections):
+    """Report made of the research sections as written, for when synthesis didn't finish"""
+    return (
+        f'# Innovation Opportunity Report: {molecule_name}\n\n{note}\n\n'
+        + ''.join(f'## {name.replace("_", " ").upper()}\n\n{section_context(data).strip()}\n\n'
+                  for name, data in sections.items())
+    )
+
+
+def partial_report_notice(missing):
+    """Banner listing the parts of a report that missed their deadline ('' if none)"""
+    if not missing:
+        return ''
+    parts = ', '.join(f'{name.replace("_", " ")} ({reason})' for name, reason in missing.items())
+    return f'> **Partial report:** not every task finished: {parts}.\n\n'
@@ -0,0 +1,107 @@
+"""
+On-disk research result cache
+Entries are keyed on the normalized molecule name plus a fingerprint of the task
+prompts and model config, so a prompt or model change never serves stale reports.
+Entries expire after a TTL and the directory is kept under a size limit by
+evicting the least recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def normalize_molecule_name(molecule_name):
+    """Case- and whitespace-insensitive form of a molecule name"""
+    return ' '.join(molecule_name.split()).casefold()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished research reports
+
+    Args:
+        directory: Where entries are stored, one JSON file per entry
+        ttl_seconds: How long an entry may be served after it was created
+        max_bytes: Total size the directory is trimmed back to after each write
+    """
+
+    def __init__(self, directory, ttl_seconds=86400, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(molecule_name, fingerprint):
+        """Cache key for a molecule under a given prompt/model fingerprint"""
+        content = f"{normalize_molecule_name(molecule_name)}\0{fingerprint}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        """
+        Look up an entry
+
+        Returns:
+            Dict with molecule_name, result, created_at and age_seconds, or None
+            on a miss or an expired entry
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+
+            age = time.time() - entry['created_at']
+            if age > self.ttl_seconds:
+                self._remove(path)
+                return None
+
+            # The file's mtime records last use for LRU eviction
+            os.utime(path)
+
+        entry['age_seconds'] = age
+        return entry
+
+    def put(self, key, molecule_name, result):
+        """Store a finished report and trim the cache back under its size limit"""
+        entry = {'molecule_name': molecule_name, 'result': result, 'created_at': time.time()}
+        path = self._path(key)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.directory, name))
+            total -= size
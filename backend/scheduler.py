@@ -0,0 +1,170 @@
+"""
+Bounded job scheduler for the research API
+Caps how many research executions run at once and how many may wait. Waiting
+jobs are ordered by priority, and round-robin across clients within a priority
+so one caller's batch can't starve everyone else.
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the pending queue is at capacity"""
+
+
+class JobScheduler:
+    """
+    Admission control and fair ordering in front of the worker pool
+
+    Args:
+        max_concurrent: Executions allowed to run at once
+        max_pending: Executions allowed to wait; further submissions are rejected
+        default_duration: Seconds assumed per job until real durations are known
+    """
+
+    def __init__(self, max_concurrent=2, max_pending=20, default_duration=600):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.default_duration = default_duration
+        self._lock = threading.Lock()
+        # priority -> client_id -> deque of (job_id, start)
+        self._pending = {level: OrderedDict() for level in sorted(PRIORITIES.values())}
+        self._pending_count = 0
+        self._running = {}  # job_id -> started_at
+        self._durations = deque(maxlen=20)
+
+    def submit(self, job_id, start, client_id='anonymous', priority='normal'):
+        """
+        Queue a job, starting it right away if a slot is free
+
+        Args:
+            job_id: Identifier used for queue position lookups
+            start: Callable that launches the job and returns a Future
+            client_id: Caller identity used for fair ordering
+            priority: One of PRIORITIES
+
+        Raises:
+            QueueFullError: If max_pending jobs are already waiting
+        """
+        level = PRIORITIES[priority]
+        with self._lock:
+            if self._pending_count >= self.max_pending:
+                raise QueueFullError(f"Research queue is full ({self.max_pending} jobs waiting)")
+            self._pending[level].setdefault(client_id, deque()).append((job_id, start))
+            self._pending_count += 1
+        self._dispatch()
+
+    def cancel(self, job_id):
+        """
+        Drop a waiting job
+
+        Returns:
+            True if the job was still waiting; False if it has started or is unknown
+        """
+        with self._lock:
+            for clients in self._pending.values():
+                for client_id, queue in clients.items():
+                    for entry in queue:
+                        if entry[0] == job_id:
+                            queue.remove(entry)
+                            if not queue:
+                                del clients[client_id]
+                            self._pending_count -= 1
+                            return True
+        return False
+
+    def _next_locked(self):
+        """Pop the next job: highest priority first, round-robin across clients"""
+        for clients in self._pending.values():
+            if clients:
+                client_id, queue = next(iter(clients.items()))
+                job = queue.popleft()
+                del clients[client_id]
+                if queue:
+                    clients[client_id] = queue  # move the client to the back
+                self._pending_count -= 1
+                return job
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if len(self._running) >= self.max_concurrent:
+                    return
+                job = self._next_locked()
+                if job is None:
+                    return
+                job_id, start = job
+                self._running[job_id] = time.time()
+
+            try:
+                future = start()
+            except Exception:
+                self._finish(job_id, record=False)
+                raise
+            future.add_done_callback(lambda _, job_id=job_id: self._finish(job_id))
+
+    def _finish(self, job_id, record=True):
+        with self._lock:
+            started_at = self._running.pop(job_id, None)
+            if record and started_at is not None:
+                self._durations.append(time.time() - started_at)
+        self._dispatch()
+
+    def average_duration(self):
+        """Mean wall time of recent jobs, or the default before any have finished"""
+        with self._lock:
+            return self._average_duration_locked()
+
+    def _average_duration_locked(self):
+        if not self._durations:
+            return self.default_duration
+        return sum(self._durations) / len(self._durations)
+
+    def _order_locked(self):
+        """Pending job ids in the order they would be dispatched"""
+        order = []
+        for clients in self._pending.values():
+            queues = [list(queue) for queue in clients.values()]
+            index = 0
+            while any(index < len(queue) for queue in queues):
+                order.extend(queue[index][0] for queue in queues if index < len(queue))
+                index += 1
+        return order
+
+    def queue_info(self, job_id):
+        """
+        Queue position and estimated start for a pending job
+
+        Returns:
+            Dict with queue_position (1-based) and estimated_start_seconds, or
+            None if the job is not waiting
+        """
+        with self._lock:
+            order = self._order_locked()
+            if job_id not in order:
+                return None
+            position = order.index(job_id)
+
+            # Simulate the slots freeing up: running jobs finish after the
+            # average duration, then each queued job takes one average duration
+            average = self._average_duration_locked()
+            now = time.time()
+            slots = [max(0.0, average - (now - started)) for started in self._running.values()]
+            slots += [0.0] * max(0, self.max_concurrent - len(slots))
+            heapq.heapify(slots)
+            for _ in range(position):
+                heapq.heapreplace(slots, slots[0] + average)
+
+        return {'queue_position': position + 1, 'estimated_start_seconds': int(slots[0])}
+
+    def stats(self):
+        """Current queue depth and running count"""
+        with self._lock:
+            return {'pending': self._pending_count, 'running': len(self._running)}
@@ -0,0 +1,107 @@
+"""
+Per-section research store
+Each research task's output is kept per molecule with its own timestamp, so a
+later run only reruns the sections that have expired (or that the caller asks
+for) and reuses the rest. Every section has its own TTL: patent and trial data
+move faster than market or trade analysis. Entries also record a fingerprint of
+the task that produced them, so editing a task's prompt retires its entries.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from result_cache import normalize_molecule_name
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (
+    molecule_key TEXT NOT NULL,
+    section TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    structured INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (molecule_key, section)
+);
+"""
+
+
+class SectionStore:
+    """
+    SQLite store of research sections, one row per molecule and section
+
+    Args:
+        path: Database file
+        ttls: Dict of section name -> seconds a stored section stays fresh
+        default_ttl: TTL of sections missing from ttls
+    """
+
+    def __init__(self, path, ttls=None, default_ttl=7 * 86400):
+        self.path = path
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def ttl(self, section):
+        return self.ttls.get(section, self.default_ttl)
+
+    def load_fresh(self, molecule_name, fingerprints):
+        """
+        Stored sections of a molecule that are still within their TTL and were
+        produced by the current version of their task
+
+        Args:
+            fingerprints: Dict of section name -> fingerprint of its task
+
+        Returns:
+            Dict of section name -> dict with structured, payload and age_seconds
+        """
+        rows = self._connection().execute(
+            "SELECT section, fingerprint, structured, payload, created_at FROM sections "
+            "WHERE molecule_key = ?",
+            (normalize_molecule_name(molecule_name),)
+        ).fetchall()
+
+        now = time.time()
+        fresh = {}
+        for section, fingerprint, structured, payload, created_at in rows:
+            age = now - created_at
+            if fingerprints.get(section) == fingerprint and age <= self.ttl(section):
+                fresh[section] = {'structured': bool(structured), 'payload': payload,
+                                  'age_seconds': age}
+        return fresh
+
+    def save(self, molecule_name, section, fingerprint, payload, structured):
+        """Store a freshly researched section, replacing the previous one"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sections "
+            "(molecule_key, section, fingerprint, structured, payload, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (normalize_molecule_name(molecule_name), section, fingerprint, int(structured),
+             payload, time.time())
+        )
+
+    def purge(self):
+        """Delete every entry past its section's TTL"""
+        connection = self._connection()
+        now = time.time()
+        for (section,) in connection.execute("SELECT DISTINCT section FROM sections").fetchall():
+            connection.execute(
+                "DELETE FROM sections WHERE section = ? AND created_at < ?",
+                (section, now - self.ttl(section))
+            )
@@ -3,131 +3,778 @@ Flask API Server for Pharmaceutical Research System
 Run with: python server.py
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import subprocess
+import atexit
+import json
 import os
 import threading
 import uuid
 import time
 
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError
+
+from job_logs import prune_logs, read_log
+from job_store import FINISHED_STATUSES, JobStore
+from model_warmup import ModelWarmer
+from report_sections import SECTION_SCHEMAS
+from result_cache import ResultCache, normalize_molecule_name
+from scheduler import PRIORITIES, JobScheduler, QueueFullError
+from telemetry import ResearchMetrics, prometheus_client
+from worker_pool import JobCancelledError, WorkerPool
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend requests
 
+# Number of warm worker processes and the per-job timeout (seconds)
+RESEARCH_WORKERS = int(os.getenv('RESEARCH_WORKERS', '2'))
+RESEARCH_JOB_TIMEOUT = int(os.getenv('RESEARCH_JOB_TIMEOUT', '1800'))
+
+# Workers are asked to finish this long before the job timeout, cutting short
+# the tasks still running so a partial report gets written before the worker
+# would be killed
+JOB_DEADLINE_MARGIN = 60
+
+# Executions allowed to run at once and to wait; beyond that requests get a 429
+RESEARCH_MAX_CONCURRENT = int(os.getenv('RESEARCH_MAX_CONCURRENT', str(RESEARCH_WORKERS)))
+RESEARCH_MAX_PENDING = int(os.getenv('RESEARCH_MAX_PENDING', '20'))
+
+# Batches hand at most RESEARCH_BATCH_WINDOW of their jobs to the scheduler at a
+# time so a portfolio run never fills the pending queue interactive requests use
+RESEARCH_BATCH_MAX_SIZE = int(os.getenv('RESEARCH_BATCH_MAX_SIZE', '200'))
+RESEARCH_BATCH_WINDOW = int(os.getenv('RESEARCH_BATCH_WINDOW', str(RESEARCH_MAX_CONCURRENT)))
+BATCH_RETRY_SECONDS = 5
+
+# Each job writes its report to its own file here; nothing is shared between jobs
+REPORTS_DIR = os.getenv(
+    'RESEARCH_REPORTS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+)
+
+# Each execution's worker output (the agents' verbose logs, prints and
+# tracebacks) goes to JSON-lines files under JOB_LOG_DIR/<job id>, rotated every
+# JOB_LOG_MAX_BYTES with JOB_LOG_BACKUPS older files kept, instead of the
+# server's terminal. Logs untouched for JOB_RETENTION_DAYS are deleted at startup.
+JOB_LOG_DIR = os.getenv(
+    'JOB_LOG_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'jobs')
+)
+JOB_LOG_MAX_BYTES = int(os.getenv('JOB_LOG_MAX_BYTES', str(1024 * 1024)))
+JOB_LOG_BACKUPS = int(os.getenv('JOB_LOG_BACKUPS', '4'))
+LOG_READ_MAX_BYTES = 1024 * 1024
+
+# Finished reports are cached on disk; RESULT_CACHE_TTL=0 disables the cache
+RESULT_CACHE_DIR = os.getenv(
+    'RESULT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'results')
+)
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', '256'))
+
+result_cache = ResultCache(
+    RESULT_CACHE_DIR,
+    ttl_seconds=RESULT_CACHE_TTL,
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024
+) if RESULT_CACHE_TTL > 0 else None
+
+# Jobs are persisted in SQLite so they survive restarts; finished jobs older than
+# JOB_RETENTION_DAYS or beyond JOB_MAX_ROWS are purged
+JOB_DB_PATH = os.getenv(
+    'JOB_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jobs.sqlite3')
+)
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', '30'))
+JOB_MAX_ROWS = int(os.getenv('JOB_MAX_ROWS', '100000'))
+JOB_HOT_SIZE = int(os.getenv('JOB_HOT_SIZE', '1000'))
+
 # Store research job status
-jobs = {}
+jobs = JobStore(
+    JOB_DB_PATH,
+    hot_size=JOB_HOT_SIZE,
+    retention_days=JOB_RETENTION_DAYS,
+    max_jobs=JOB_MAX_ROWS
+)
+
+# Running executions keyed by normalized molecule name. Duplicate requests attach
+# their job to the execution already in flight instead of starting another one.
+inflight = {}
+inflight_lock = threading.Lock()
+
+# Progress events per execution, kept in memory only. Events of finished
+# executions are dropped once more than EVENT_HISTORY_SIZE have finished; later
+# stream readers get the final outcome from the job store instead.
+# Stream readers wait on events_changed for new events.
+EVENT_HISTORY_SIZE = 100
+execution_events = {}
+finished_executions = deque()
+events_changed = threading.Condition()
+TERMINAL_EVENTS = ('job_complete', 'job_error', 'job_cancelled')
+
+scheduler = JobScheduler(max_concurrent=RESEARCH_MAX_CONCURRENT, max_pending=RESEARCH_MAX_PENDING)
+
+# Batch jobs not yet handed to the scheduler, per batch id. batches_changed is
+# notified (and batch_generation bumped) whenever a batch job finishes, for
+# result stream readers.
+batch_queues = {}
+batch_lock = threading.Lock()
+batches_changed = threading.Condition()
+batch_generation = 0
+
+# Workers import main.py and build its agents once (main.warm_up) and are
+# reused across jobs. The pool is created on first use so the Flask reloader's
+# watcher process doesn't start one too.
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Return the shared worker pool, starting it on first use"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool(size=RESEARCH_WORKERS, job_timeout=RESEARCH_JOB_TIMEOUT,
+                                      log_max_bytes=JOB_LOG_MAX_BYTES, log_backups=JOB_LOG_BACKUPS)
+            atexit.register(_worker_pool.shutdown)
+        return _worker_pool
+
+
+def worker_pool_stats():
+    """Worker counts for the metrics gauges, without starting the pool"""
+    return _worker_pool.stats() if _worker_pool else {'workers': 0, 'busy': 0}
+
+
+# Prometheus metrics of executions, the queue and the workers' tasks, LLM and
+# tool calls, served on /api/metrics when prometheus_client is installed
+research_metrics = ResearchMetrics() if prometheus_client else None
+if research_metrics:
+    research_metrics.watch(scheduler.stats, worker_pool_stats)
 
-def run_research(job_id, molecule_name):
-    """Run the main.py research script in a background thread"""
+
+_research_fingerprint = None
+_research_fingerprint_lock = threading.Lock()
+
+
+def get_research_fingerprint():
+    """
+    Fingerprint of the prompts and model config the workers run with. Computed
+    once, in this process: importing main.py builds no agents or LLMs, and the
+    workers inherit the same environment, so it matches theirs without waiting
+    behind queued jobs for a worker.
+    """
+    global _research_fingerprint
+    with _research_fingerprint_lock:
+        if _research_fingerprint is None:
+            import main
+            _research_fingerprint = main.research_fingerprint()
+        return _research_fingerprint
+
+
+# Keeps the agents' Ollama models loaded (main.OLLAMA_WARM_UP); set at startup
+model_warmer = None
+
+
+def start_model_warm_up():
+    """
+    Load the models the workers' agents run on and keep them loaded, in the
+    background. The models and endpoints are read from main.py's config in
+    this process, so warm-up doesn't wait behind resumed jobs for a worker.
+    """
+    def warm_up():
+        global model_warmer
+        try:
+            import main
+            targets = main.model_warm_up_targets()
+        except Exception as e:
+            print(f"⚠️  Model warm-up skipped: {e}")
+            return
+        if targets:
+            model_warmer = ModelWarmer(**targets).start()
+    
+    thread = threading.Thread(target=warm_up, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_cache_key(molecule_name):
+    """Result cache key for a molecule, or None if caching is unavailable"""
+    if result_cache is None:
+        return None
     try:
-        jobs[job_id]['status'] = 'running'
-        
-        # Get the directory where this server.py is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        main_script = os.path.join(script_dir, 'main.py')
-        output_file = os.path.join(script_dir, 'output.txt')
-        
-        # Modify main.py execution to save output to output.txt
-        # We'll run a modified version that saves to output.txt
-        env = os.environ.copy()
-        env['MOLECULE_NAME'] = molecule_name
-        
-        # Run the research script
-        result = subprocess.run(
-            ['python', main_script, molecule_name],
-            capture_output=True,
-            text=True,
-            cwd=script_dir,
-            env=env,
-            timeout=1800  # 30 minute timeout
+        return result_cache.make_key(molecule_name, get_research_fingerprint())
+    except Exception as e:
+        print(f"⚠️  Result cache disabled for this request: {e}")
+        return None
+
+
+def new_event(event_type, **fields):
+    """Build a progress event in the same shape the workers emit"""
+    return {'type': event_type, 'timestamp': time.time(), **fields}
+
+
+def record_event(execution_id, event):
+    """Append a progress event to an execution and wake any stream readers"""
+    with events_changed:
+        execution_events.setdefault(execution_id, []).append(event)
+        if event['type'] in TERMINAL_EVENTS:
+            finished_executions.append(execution_id)
+            while len(finished_executions) > EVENT_HISTORY_SIZE:
+                execution_events.pop(finished_executions.popleft(), None)
+        events_changed.notify_all()
+
+
+def event_stream_id(job):
+    """
+    Key of the event stream a job's SSE clients read. A cancelled job keeps
+    the execution_id of the execution it joined (its logs and trace live
+    there), but its stream only holds the cancellation.
+    """
+    return f"{job['id']}:cancelled" if job['status'] == 'cancelled' else job['execution_id']
+
+
+def run_research(job_id, molecule_name, cache_key=None, client_id='anonymous', priority='normal',
+                 on_finish=None, refresh=None):
+    """
+    Schedule the research workflow on the warm worker pool, or attach the job
+    to an identical execution that is already in flight
+    
+    Args:
+        on_finish: Optional callable run once the job's execution has finished
+        refresh: Sections the worker researches again instead of reusing stored ones
+    
+    Returns:
+        True if the job attached to an existing execution
+    
+    Raises:
+        QueueFullError: If the scheduler's pending queue is full
+    """
+    key = normalize_molecule_name(molecule_name)
+    if refresh:
+        # Only share executions that refresh the same sections
+        key += '\0' + ','.join(sorted(refresh))
+    
+    with inflight_lock:
+        execution = inflight.get(key)
+        if execution:
+            execution['job_ids'].append(job_id)
+            if on_finish:
+                execution['callbacks'][job_id] = on_finish
+            jobs.update(job_id, status=execution['status'], execution_id=execution['id'])
+            jobs.update(execution['job_ids'], attached_callers=len(execution['job_ids']))
+            return True
+        # callbacks: job id -> on_finish; future: set once the job reaches the pool
+        execution = {'id': job_id, 'job_ids': [job_id], 'status': 'pending',
+                     'callbacks': {job_id: on_finish} if on_finish else {}, 'future': None, 'key': key,
+                     'submitted_at': time.monotonic(), 'running_at': None}
+        inflight[key] = execution
+    
+    def update_attached_jobs(**fields):
+        jobs.update(execution['job_ids'], **fields)
+    
+    def mark_running():
+        with inflight_lock:
+            execution['status'] = 'running'
+            execution['running_at'] = time.monotonic()
+            update_attached_jobs(status='running')
+        record_event(job_id, new_event('job_started'))
+    
+    def on_event(event):
+        # Task lifecycle events and metric observations from the worker
+        if research_metrics:
+            research_metrics.observe(event)
+        if event['type'] != 'metric':
+            record_event(job_id, event)
+    
+    def settle(outcome):
+        # Detach under the lock so no late duplicate attaches to a finished run
+        with inflight_lock:
+            if inflight.get(key) is execution:
+                inflight.pop(key)
+            update_attached_jobs(**outcome)
+            callbacks = list(execution['callbacks'].values())
+        if research_metrics:
+            running_at = execution['running_at']
+            research_metrics.job_finished(
+                outcome['status'], time.monotonic() - execution['submitted_at'],
+                running_at - execution['submitted_at'] if running_at else None
+            )
+        if outcome['status'] == 'complete':
+            record_event(job_id, new_event('job_complete', result=outcome['result']))
+        elif outcome['status'] == 'cancelled':
+            record_event(job_id, new_event('job_cancelled'))
+        else:
+            record_event(job_id, new_event('job_error', error=outcome['error']))
+        for callback in callbacks:
+            callback()
+    
+    def finish(future):
+        try:
+            result = future.result()
+            outcome = {'status': 'complete', 'result': result['report']}
+            # A partial report (sections or synthesis cut by their deadlines)
+            # isn't served to later requests; the next one retries in full
+            if cache_key and not result['missing']:
+                result_cache.put(cache_key, molecule_name, outcome['result'])
+        except (CancelledError, JobCancelledError):
+            outcome = {'status': 'cancelled', 'error': 'Cancelled by the caller'}
+        except TimeoutError:
+            outcome = {'status': 'error', 'error': f'Research timed out after {RESEARCH_JOB_TIMEOUT // 60} minutes'}
+        except Exception as e:
+            outcome = {'status': 'error', 'error': str(e)}
+        settle(outcome)
+    
+    def cancel():
+        # Every caller has detached: drop the execution from the queue, or stop
+        # its worker if it already started
+        if scheduler.cancel(job_id):
+            settle({'status': 'cancelled', 'error': 'Cancelled by the caller'})
+            return
+        with inflight_lock:
+            future = execution['future']
+        if future:
+            get_worker_pool().cancel(future)
+    
+    def start():
+        # The report comes back over the worker's pipe; the per-job file is
+        # only a durable artifact
+        future = get_worker_pool().submit(
+            'main:run_research_job',
+            args=(molecule_name,),
+            kwargs={'output_file': os.path.join(REPORTS_DIR, f'{job_id}.txt'), 'refresh': refresh,
+                    'deadline_seconds': max(RESEARCH_JOB_TIMEOUT - JOB_DEADLINE_MARGIN, 1)},
+            on_start=mark_running,
+            on_event=on_event,
+            log_dir=os.path.join(JOB_LOG_DIR, job_id)
         )
-        
-        # Read output file
-        if os.path.exists(output_file):
-            with open(output_file, 'r', encoding='utf-8') as f:
-                output_content = f.read()
-            jobs[job_id]['status'] = 'complete'
-            jobs[job_id]['result'] = output_content
+        with inflight_lock:
+            execution['future'] = future
+            cancelled = not execution['job_ids']
+        if cancelled:
+            # Cancelled while the scheduler was starting it
+            get_worker_pool().cancel(future)
+        future.add_done_callback(finish)
+        return future
+    
+    execution['cancel'] = cancel    
+    try:
+        scheduler.submit(job_id, start, client_id=client_id, priority=priority)
+    except QueueFullError:
+        with inflight_lock:
+            if inflight.get(key) is execution:
+                inflight.pop(key)
+        raise
+    return False
+
+
+def cancel_job(job_id):
+    """
+    Cancel a pending or running job. A job sharing its execution with other
+    callers is only detached from it; once no caller is left the execution is
+    dropped from the queue or its worker is stopped.
+    
+    Returns:
+        False if the job had already finished
+    """
+    job = jobs.get(job_id)
+    if job is None or job['status'] in FINISHED_STATUSES:
+        return False
+    
+    # Batch jobs still waiting for their batch's window never reached the scheduler
+    if job['batch_id'] and remove_waiting_batch_job(job['batch_id'], job_id):
+        jobs.update(job_id, status='cancelled', error='Cancelled by the caller')
+        record_event(job['execution_id'], new_event('job_cancelled'))
+        record_event(f'{job_id}:cancelled', new_event('job_cancelled'))
+        notify_batch_readers()
+        feed_batch(job['batch_id'])
+        return True
+    
+    with inflight_lock:
+        execution = next((execution for execution in inflight.values()
+                          if execution['id'] == job['execution_id']), None)
+        if execution is None or job_id not in execution['job_ids']:
+            return False
+        execution['job_ids'].remove(job_id)
+        callback = execution['callbacks'].pop(job_id, None)
+        stop = not execution['job_ids']
+        if stop:
+            # New requests for the molecule start afresh instead of attaching
+            inflight.pop(execution['key'], None)
         else:
-            # If no output.txt, use stdout
-            jobs[job_id]['status'] = 'complete'
-            jobs[job_id]['result'] = result.stdout or "Research completed but no output file found."
-            
-    except subprocess.TimeoutExpired:
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = 'Research timed out after 30 minutes'
-    except Exception as e:
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = str(e)
+            jobs.update(execution['job_ids'], attached_callers=len(execution['job_ids']))
+        jobs.update(job_id, status='cancelled', error='Cancelled by the caller')
+    
+    if stop:
+        execution['cancel']()
+    # The execution's events keep going to any other callers; this job's
+    # stream (see event_stream_id) holds just the cancellation
+    record_event(f'{job_id}:cancelled', new_event('job_cancelled'))
+    if callback:
+        callback()
+    return True
+
+
+def create_job(molecule_name, client_id, priority, refresh=None, batch_id=None):
+    """
+    Create a job, completing it straight away from the result cache if possible
+    
+    Args:
+        refresh: Sections to research again; the other sections are reused from
+            the workers' section store while they are fresh
+    
+    Returns:
+        (job, cache_key) - job['status'] is 'complete' on a cache hit
+    """
+    # Serve a cached report instantly unless the caller asks for a refresh
+    cache_key = get_cache_key(molecule_name)
+    cached = result_cache.get(cache_key) if cache_key and not refresh else None
+    if research_metrics and cache_key and not refresh:
+        research_metrics.cache_lookup('result', cached is not None)
+    
+    job_id = str(uuid.uuid4())
+    job = {
+        'id': job_id,
+        'molecule_name': molecule_name,
+        'status': 'pending',
+        'result': None,
+        'error': None,
+        'started_at': time.time(),
+        'cache': {'hit': False},
+        'attached_callers': 1,
+        'execution_id': job_id,
+        'client_id': client_id,
+        'priority': priority,
+        'batch_id': batch_id,
+        'refresh': refresh
+    }
+    
+    if cached:
+        job.update({
+            'status': 'complete',
+            'result': cached['result'],
+            'finished_at': job['started_at'],
+            'cache': {'hit': True, 'age_seconds': int(cached['age_seconds'])}
+        })
+        jobs.create(job)
+        record_event(job_id, new_event('job_complete', result=cached['result']))
+    else:
+        jobs.create(job)
+    return job, cache_key
+
+
+def notify_batch_readers():
+    global batch_generation
+    with batches_changed:
+        batch_generation += 1
+        batches_changed.notify_all()
+
+
+def batch_job_finished(batch_id):
+    with batch_lock:
+        batch = batch_queues.get(batch_id)
+        if batch:
+            batch['submitted'] -= 1
+    notify_batch_readers()
+    feed_batch(batch_id)
+
+
+def remove_waiting_batch_job(batch_id, job_id):
+    """Take a job off its batch's waiting list; False if it was already handed on"""
+    with batch_lock:
+        batch = batch_queues.get(batch_id)
+        for job in batch['waiting'] if batch else ():
+            if job['id'] == job_id:
+                batch['waiting'].remove(job)
+                return True
+    return False
+
+
+def feed_batch(batch_id):
+    """Hand a batch's waiting jobs to the scheduler while its window has room"""
+    while True:
+        with batch_lock:
+            batch = batch_queues.get(batch_id)
+            if batch is None:
+                return
+            if not batch['waiting']:
+                if batch['submitted'] == 0:
+                    del batch_queues[batch_id]
+                return
+            if batch['submitted'] >= RESEARCH_BATCH_WINDOW:
+                return
+            job = batch['waiting'].popleft()
+            batch['submitted'] += 1
+        
+        # Another caller may have researched this molecule while the job waited
+        cache_key = get_cache_key(job['molecule_name'])
+        cached = result_cache.get(cache_key) if cache_key and not job['refresh'] else None
+        if research_metrics and cache_key and not job['refresh']:
+            research_metrics.cache_lookup('result', cached is not None)
+        if cached:
+            jobs.update(job['id'], status='complete', result=cached['result'],
+                        cache={'hit': True, 'age_seconds': int(cached['age_seconds'])})
+            record_event(job['id'], new_event('job_complete', result=cached['result']))
+            with batch_lock:
+                batch['submitted'] -= 1
+            notify_batch_readers()
+            continue
+        
+        try:
+            run_research(
+                job['id'], job['molecule_name'], cache_key,
+                batch['client_id'], batch['priority'],
+                on_finish=lambda: batch_job_finished(batch_id), refresh=job['refresh']
+            )
+        except QueueFullError:
+            # Interactive traffic filled the queue; try again shortly
+            with batch_lock:
+                batch['waiting'].appendleft(job)
+                batch['submitted'] -= 1
+            retry = threading.Timer(BATCH_RETRY_SECONDS, feed_batch, args=(batch_id,))
+            retry.daemon = True
+            retry.start()
+            return
+
+
+def queue_batch(batch_id, pending_jobs, client_id, priority):
+    """Queue a batch's pending jobs behind its scheduling window"""
+    with batch_lock:
+        batch_queues[batch_id] = {
+            'waiting': deque(pending_jobs),
+            'submitted': 0,
+            'client_id': client_id,
+            'priority': priority
+        }
+    feed_batch(batch_id)
+
+
+def resume_interrupted_jobs():
+    """Requeue jobs that were pending or running when the server last stopped"""
+    interrupted = jobs.active_jobs()
+    
+    # Primary jobs first so duplicates re-attach to their restarted execution
+    interrupted.sort(key=lambda job: job['execution_id'] != job['id'])
+    batches = OrderedDict()
+    for job in interrupted:
+        jobs.update(job['id'], status='pending', attached_callers=1, execution_id=job['id'])
+        if job['batch_id']:
+            batches.setdefault(job['batch_id'], []).append(job)
+            continue
+        try:
+            run_research(
+                job['id'], job['molecule_name'], get_cache_key(job['molecule_name']),
+                job['client_id'] or 'anonymous', job['priority'] or 'normal',
+                refresh=job['refresh']
+            )
+        except QueueFullError as e:
+            jobs.update(job['id'], status='error', error=f'Could not resume after restart: {e}')
+    
+    for batch_id, batch_jobs in batches.items():
+        batch_jobs.sort(key=lambda job: job['started_at'])
+        queue_batch(batch_id, batch_jobs, batch_jobs[0]['client_id'] or 'anonymous',
+                    batch_jobs[0]['priority'] or 'normal')
+    
+    if interrupted:
+        print(f"Resumed {len(interrupted)} interrupted research job(s)")
+
+
+def requested_refresh(data):
+    """
+    Sections a start request wants researched again: every section with
+    force_refresh, otherwise those listed in `sections` (None for neither)
+    
+    Raises:
+        ValueError: If `sections` isn't a list of known section names
+    """
+    if data.get('force_refresh'):
+        return list(SECTION_SCHEMAS)
+    sections = data.get('sections')
+    if sections is None:
+        return None
+    if (not isinstance(sections, list) or not sections
+            or not all(isinstance(section, str) and section in SECTION_SCHEMAS for section in sections)):
+        raise ValueError(f"sections must be a non-empty list of: {', '.join(SECTION_SCHEMAS)}")
+    return [section for section in SECTION_SCHEMAS if section in sections]
+
+
+def requested_scheduling(data, default_priority):
+    """
+    (client_id, priority) of a start request. The client defaults to the
+    X-Client-Id header, then the caller's address.
+    
+    Raises:
+        ValueError: If priority isn't one of PRIORITIES or client_id isn't a string
+    """
+    priority = data.get('priority', default_priority)
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+    client_id = data.get('client_id') or request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+    if not isinstance(client_id, str):
+        raise ValueError('client_id must be a string')
+    return client_id, priority
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'Server is running'})
+    health = {'status': 'ok', 'message': 'Server is running'}
+    if model_warmer is not None:
+        health['models'] = model_warmer.stats()
+    return jsonify(health)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of jobs, the queue, workers, tasks, LLM and tool calls and caches"""
+    if research_metrics is None:
+        return jsonify({'error': 'Metrics need prometheus_client (pip install prometheus-client)'}), 501
+    body, content_type = research_metrics.render()
+    return Response(body, content_type=content_type)
 
 
 @app.route('/api/research/start', methods=['POST'])
 def start_research():
     """Start a new research job for a molecule"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
     molecule_name = data.get('molecule_name')
     
-    if not molecule_name:
+    if not molecule_name or not isinstance(molecule_name, str):
         return jsonify({'error': 'molecule_name is required'}), 400
+    try:
+        client_id, priority = requested_scheduling(data, 'normal')
+        refresh = requested_refresh(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Create a new job
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {
-        'id': job_id,
-        'molecule_name': molecule_name,
-        'status': 'pending',
-        'result': None,
-        'error': None,
-        'started_at': time.time()
-    }
+    job, cache_key = create_job(molecule_name, client_id, priority, refresh)
+    job_id = job['id']
+    if job['status'] == 'complete':
+        return jsonify({
+            'job_id': job_id,
+            'message': f'Cached research returned for {molecule_name}',
+            'cache': job['cache']
+        })
     
-    # Start research in background thread
-    thread = threading.Thread(target=run_research, args=(job_id, molecule_name))
-    thread.daemon = True
-    thread.start()
+    # Queue research on the worker pool, sharing any identical in-flight run
+    try:
+        attached = run_research(job_id, molecule_name, cache_key, client_id, priority, refresh=refresh)
+    except QueueFullError as e:
+        jobs.delete(job_id)
+        retry_after = int(scheduler.average_duration() / max(1, RESEARCH_MAX_CONCURRENT))
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(retry_after)}
     
+    job = jobs.get(job_id)
     return jsonify({
         'job_id': job_id,
-        'message': f'Research started for {molecule_name}'
+        'message': (f'Attached to in-flight research for {molecule_name}' if attached
+                    else f'Research started for {molecule_name}'),
+        'cache': job['cache'],
+        'attached_callers': job['attached_callers']
     })
 
 
 @app.route('/api/research/status/<job_id>', methods=['GET'])
 def get_research_status(job_id):
     """Get the status of a research job"""
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id]
     response = {
         'job_id': job_id,
         'molecule_name': job['molecule_name'],
         'status': job['status'],
-        'elapsed_seconds': int(time.time() - job['started_at'])
+        'elapsed_seconds': int(time.time() - job['started_at']),
+        'cache': job['cache'],
+        'attached_callers': job['attached_callers']
     }
     
+    if job['status'] == 'pending':
+        queue_info = scheduler.queue_info(job['execution_id'])
+        if queue_info:
+            response.update(queue_info)
+            response['estimated_start_at'] = int(time.time() + queue_info['estimated_start_seconds'])
+    
     if job['status'] == 'complete':
-        response['result'] = job['result']
-    elif job['status'] == 'error':
+        response['result'] = jobs.get_result(job_id)
+    elif job['status'] in ('error', 'cancelled'):
         response['error'] = job['error']
     
     return jsonify(response)
 
 
+@app.route('/api/research/events/<job_id>', methods=['GET'])
+def stream_research_events(job_id):
+    """
+    Server-Sent Events stream of a job's progress: job_started, task_started,
+    task_finished (with duration), task_failed, task_timed_out, and finally
+    job_complete (with the result), job_error or job_cancelled. Reconnecting
+    clients resume via Last-Event-ID; one that isn't an id of this job's
+    events replays them from the start.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    execution_id = event_stream_id(job)
+    try:
+        next_index = max(0, int(request.headers.get('Last-Event-ID', -1)) + 1)
+    except ValueError:
+        # Not an id this server sent; replay the job's events from the start
+        next_index = 0
+    
+    with events_changed:
+        if execution_id not in execution_events and job['status'] in FINISHED_STATUSES:
+            # Events of long-finished executions are not kept; replay the outcome
+            execution_events[execution_id] = [
+                new_event('job_complete', result=jobs.get_result(job_id))
+                if job['status'] == 'complete'
+                else new_event('job_cancelled') if job['status'] == 'cancelled'
+                else new_event('job_error', error=job['error'])
+            ]
+            finished_executions.append(execution_id)
+        events = execution_events.get(execution_id)
+        if events and events[-1]['type'] in TERMINAL_EVENTS and next_index >= len(events):
+            if next_index == len(events):
+                # The client already has the outcome; 204 stops EventSource reconnecting
+                return Response(status=204)
+            # An id from another run of the job (e.g. before a restart); replay the outcome
+            next_index = 0
+    
+    def generate():
+        index = next_index
+        while True:
+            with events_changed:
+                events = execution_events.setdefault(execution_id, [])
+                if index >= len(events):
+                    events_changed.wait(timeout=15)
+                new_events = events[index:]
+            
+            if not new_events:
+                yield ": keep-alive\n\n"
+                continue
+            
+            for event in new_events:
+                yield f"id: {index}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                index += 1
+                if event['type'] in TERMINAL_EVENTS:
+                    return
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/research/result/<job_id>', methods=['GET'])
 def get_research_result(job_id):
     """Get the final result of a completed research job"""
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    job = jobs[job_id]
-    
     if job['status'] != 'complete':
         return jsonify({
             'error': 'Research not complete yet',
@@ -137,10 +784,188 @@ def get_research_result(job_id):
     return jsonify({
         'job_id': job_id,
         'molecule_name': job['molecule_name'],
-        'result': job['result']
+        'result': jobs.get_result(job_id),
+        'cache': job['cache']
+    })
+
+
+@app.route('/api/research/<job_id>/trace', methods=['GET'])
+def get_research_trace(job_id):
+    """Get the span timeline a job's worker recorded (needs TRACING_ENABLED=true)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Attached jobs share the trace of the execution they joined
+    trace_file = os.path.join(REPORTS_DIR, f"{job['execution_id']}.trace.json")
+    if job['status'] not in FINISHED_STATUSES:
+        return jsonify({'error': 'Research not finished yet', 'status': job['status']}), 400
+    if not os.path.exists(trace_file):
+        return jsonify({'error': 'No trace was recorded for this job (tracing is off, or the report came from the result cache)'}), 404
+    
+    with open(trace_file, encoding='utf-8') as f:
+        return Response(f.read(), mimetype='application/json')
+
+
+@app.route('/api/research/<job_id>/logs', methods=['GET'])
+def get_research_logs(job_id):
+    """
+    Read a job's worker output from a byte offset. Tail it by passing each
+    response's next_offset as the next request's `since`.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 65536)), LOG_READ_MAX_BYTES)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit must be >= 1'}), 400
+    
+    # Attached jobs share the log of the execution they joined
+    log = read_log(os.path.join(JOB_LOG_DIR, job['execution_id']), since, limit)
+    return jsonify({'job_id': job_id, 'status': job['status'], **log})
+
+
+@app.route('/api/research/<job_id>', methods=['DELETE'])
+def cancel_research(job_id):
+    """Cancel a pending or running research job, stopping its worker if no one else is waiting on it"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not cancel_job(job_id):
+        return jsonify({
+            'error': 'Research already finished',
+            'status': jobs.get(job_id)['status']
+        }), 409
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'cancelled',
+        'message': f'Research cancelled for {job["molecule_name"]}'
+    })
+
+
+@app.route('/api/research/batch', methods=['POST'])
+def start_batch_research():
+    """Start research for a list of molecules, tracked together as one batch"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    molecule_names = data.get('molecule_names')
+    
+    if (not isinstance(molecule_names, list) or not molecule_names
+            or not all(isinstance(name, str) and name.strip() for name in molecule_names)):
+        return jsonify({'error': 'molecule_names must be a non-empty list of names'}), 400
+    try:
+        client_id, priority = requested_scheduling(data, 'low')
+        refresh = requested_refresh(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Each molecule is researched once per batch
+    unique = OrderedDict()
+    for name in molecule_names:
+        unique.setdefault(normalize_molecule_name(name), name.strip())
+    unique_names = list(unique.values())
+    if len(unique_names) > RESEARCH_BATCH_MAX_SIZE:
+        return jsonify({'error': f'A batch may hold at most {RESEARCH_BATCH_MAX_SIZE} molecules'}), 400
+    
+    batch_id = str(uuid.uuid4())
+    jobs.create_batch({
+        'id': batch_id,
+        'created_at': time.time(),
+        'client_id': client_id,
+        'priority': priority,
+        'size': len(unique_names)
+    })
+    batch_jobs = [create_job(name, client_id, priority, refresh, batch_id)[0]
+                  for name in unique_names]
+    queue_batch(batch_id, [job for job in batch_jobs if job['status'] == 'pending'],
+                client_id, priority)
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'message': f'Batch research started for {len(unique_names)} molecules',
+        'size': len(unique_names),
+        'jobs': [{'job_id': job['id'], 'molecule_name': job['molecule_name'], 'cache': job['cache']}
+                 for job in batch_jobs]
     })
 
 
+@app.route('/api/research/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Overall progress of a batch plus the status of each molecule"""
+    batch = jobs.get_batch(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    batch_jobs = jobs.find_by_batch(batch_id)
+    counts = {status: 0 for status in ('pending', 'running') + FINISHED_STATUSES}
+    for job in batch_jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+    finished = sum(counts[status] for status in FINISHED_STATUSES)
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'status': 'complete' if finished == len(batch_jobs) else 'running',
+        'size': batch['size'],
+        'counts': counts,
+        'elapsed_seconds': int(time.time() - batch['created_at']),
+        'jobs': [{
+            'job_id': job['id'],
+            'molecule_name': job['molecule_name'],
+            'status': job['status'],
+            'cache': job['cache'],
+            'attached_callers': job['attached_callers'],
+            **({'error': job['error']} if job['status'] in ('error', 'cancelled') else {})
+        } for job in batch_jobs]
+    })
+
+
+@app.route('/api/research/batch/<batch_id>/results', methods=['GET'])
+def stream_batch_results(batch_id):
+    """
+    JSON Lines stream of a batch's results, one line per molecule as it
+    finishes. Pass ?wait=false to get only the molecules finished so far.
+    """
+    if jobs.get_batch(batch_id) is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    wait = request.args.get('wait', 'true').lower() not in ('0', 'false', 'no')
+    
+    def generate():
+        sent = set()
+        while True:
+            generation = batch_generation
+            batch_jobs = jobs.find_by_batch(batch_id)
+            for job in batch_jobs:
+                if job['id'] in sent or job['status'] not in FINISHED_STATUSES:
+                    continue
+                sent.add(job['id'])
+                line = {'job_id': job['id'], 'molecule_name': job['molecule_name'],
+                        'status': job['status'], 'cache': job['cache']}
+                if job['status'] == 'complete':
+                    line['result'] = jobs.get_result(job['id'])
+                else:
+                    line['error'] = job['error']
+                yield json.dumps(line) + "\n"
+            
+            if len(sent) == len(batch_jobs) or not wait:
+                return
+            with batches_changed:
+                if generation == batch_generation:
+                    batches_changed.wait(timeout=15)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Pharmaceutical Research API Server")
@@ -149,8 +974,26 @@ if __name__ == '__main__':
     print("  POST /api/research/start   - Start new research")
     print("  GET  /api/research/status/<job_id> - Check status")
     print("  GET  /api/research/result/<job_id> - Get results")
-    print("  GET  /api/health           - Health check")
-    print("\nStarting server on http://localhost:5000")
+    print("  GET  /api/research/events/<job_id> - Stream progress (SSE)")
+    print("  GET  /api/research/<job_id>/trace - Span timeline (TRACING_ENABLED)")
+    print("  GET  /api/research/<job_id>/logs?since=0 - Tail the job's worker output")
+    print("  DELETE /api/research/<job_id> - Cancel a job")
+    print("  POST /api/research/batch   - Start research for many molecules")
+    print("  GET  /api/research/batch/<batch_id> - Batch status")
+    print("  GET  /api/research/batch/<batch_id>/results - Stream batch results (JSONL)")
+    print("  GET  /api/metrics          - Prometheus metrics")
+    print("  GET  /api/health           - Health check and model warm-up state")
+    print(f"\nWorker processes: {RESEARCH_WORKERS}")
+    print(f"Max concurrent jobs: {RESEARCH_MAX_CONCURRENT}, max pending: {RESEARCH_MAX_PENDING}")
+    print("Starting server on http://localhost:5000")
     print("=" * 60)
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    debug = True
+    # With the reloader this block also runs in the watcher process; only the
+    # serving process resumes jobs and warms up the models
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        prune_logs(JOB_LOG_DIR, JOB_RETENTION_DAYS * 86400)
+        resume_interrupted_jobs()
+        start_model_warm_up()
+    
+    app.run(host='0.0.0.0', port=5000, debug=debug)
@@ -0,0 +1,114 @@
+"""
+Per-task deadlines for research tasks
+A single slow scrape or a stalled model used to hold the whole job until the
+server's job timeout threw every finished section away. Each task now gets its
+own deadline: LLM calls made for a task past its deadline raise
+TaskDeadlineExceeded, and a call still running when the deadline passes is
+abandoned, so the task gives up on time and the report is written from the
+sections that did finish.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_wrappers import wrap_llm_call
+
+
+class TaskDeadlineExceeded(RuntimeError):
+    """Raised inside a task's LLM call once the task has run out of time"""
+
+
+class TaskDeadlines:
+    """Deadlines of the tasks currently running, keyed by crewAI task id"""
+
+    def __init__(self):
+        self._deadlines = {}
+        self._lock = threading.Lock()
+        # Deadline of LLM calls made without a task, e.g. context compaction
+        self._outside_tasks = contextvars.ContextVar('outside_task_deadline', default=None)
+
+    def start(self, task, name, seconds):
+        """Give a task `seconds` from now; None means no deadline"""
+        if seconds is None:
+            return
+        with self._lock:
+            self._deadlines[str(task.id)] = (name, seconds, time.monotonic() + seconds)
+
+    def stop(self, task):
+        with self._lock:
+            self._deadlines.pop(str(task.id), None)
+
+    @contextmanager
+    def applied(self, name, seconds, deadline):
+        """
+        Hold the LLM calls made without a task inside the block, on this thread,
+        to a deadline (a time.monotonic() value); seconds is the time allowed,
+        for the error message
+        """
+        token = self._outside_tasks.set((name, seconds, deadline))
+        try:
+            yield
+        finally:
+            self._outside_tasks.reset(token)
+
+    def get(self, task):
+        """
+        (name, seconds allowed, seconds left) of a task's deadline, or of the
+        applied() block a call without a task (task=None) is made in; None if
+        there is no deadline
+        """
+        if task is None:
+            entry = self._outside_tasks.get()
+        else:
+            with self._lock:
+                entry = self._deadlines.get(str(task.id))
+        if entry is None:
+            return None
+        name, seconds, deadline = entry
+        return name, seconds, deadline - time.monotonic()
+
+
+def deadline_completions(llm, deadlines):
+    """
+    Enforce task deadlines on an LLM object's call()s
+
+    Calls made for a task without a deadline, or without a task outside an
+    applied() block, go straight through. Otherwise the call runs on its own thread and the task stops
+    waiting for it at the deadline; the abandoned request finishes (or times
+    out) in the background.
+    """
+    def wrap(call):
+        def guarded_call(messages, *args, **kwargs):
+            deadline = deadlines.get(kwargs.get('from_task'))
+            if deadline is None:
+                return call(messages, *args, **kwargs)
+
+            name, seconds, remaining = deadline
+            if remaining <= 0:
+                raise TaskDeadlineExceeded(f"{name} task exceeded its {seconds:.0f}s deadline")
+
+            outcome = {}
+            done = threading.Event()
+            # Keep crewAI's context variables (event scopes) on the call's thread
+            context = contextvars.copy_context()
+
+            def run():
+                try:
+                    outcome['result'] = context.run(call, messages, *args, **kwargs)
+                except BaseException as e:
+                    outcome['error'] = e
+                finally:
+                    done.set()
+
+            threading.Thread(target=run, name=f'llm-call-{name}', daemon=True).start()
+            if not done.wait(remaining):
+                raise TaskDeadlineExceeded(f"{name} task exceeded its {seconds:.0f}s deadline")
+            if 'error' in outcome:
+                raise outcome['error']
+            return outcome['result']
+
+        return guarded_call
+
+    return wrap_llm_call(llm, wrap)
@@ -0,0 +1,359 @@
+"""
+Metrics and tracing for the research hot paths
+Workers observe crew kickoffs, tasks, LLM calls and tool calls of the job they
+are running and send the observations to the API server with the job's other
+events; the server keeps them in Prometheus metrics served on /api/metrics.
+A job can also record the span timeline of everything it did, exported as JSON.
+"""
+
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_wrappers import wrap_llm_call
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+# ============================================================================
+# WORKER SIDE: SPANS AND OBSERVATIONS OF THE RUNNING JOB
+# ============================================================================
+
+def stream_chunk_event():
+    """crewAI's LLMStreamChunkEvent, or None on releases that don't emit streamed chunks"""
+    try:
+        from crewai.events import LLMStreamChunkEvent
+    except ImportError:
+        return None
+    return LLMStreamChunkEvent
+
+
+class Tracer:
+    """Spans of one job's timeline; times are Unix timestamps"""
+
+    def __init__(self):
+        self._spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, name, kind, parent=None, start=None, **attributes):
+        span = {
+            'id': next(self._ids),
+            'parent_id': parent['id'] if parent else None,
+            'name': name,
+            'kind': kind,
+            'start': time.time() if start is None else start,
+            'end': None,
+            'attributes': attributes,
+        }
+        with self._lock:
+            self._spans.append(span)
+        return span
+
+    def end(self, span, end=None, **attributes):
+        with self._lock:
+            span['end'] = time.time() if end is None else end
+            span['attributes'].update(attributes)
+
+    def to_json(self):
+        """The timeline as JSON, spans in start order"""
+        with self._lock:
+            spans = sorted((dict(span) for span in self._spans), key=lambda span: span['start'])
+        for span in spans:
+            span['duration_seconds'] = round(span['end'] - span['start'], 3) if span['end'] else None
+        return json.dumps({'spans': spans}, indent=2, default=str)
+
+
+class JobTelemetry:
+    """
+    Observations of one job, sent to `emit` as metric events, plus its span
+    timeline when tracing. Without either it does nothing.
+    """
+
+    def __init__(self, emit=None, trace=False, **attributes):
+        self.emit = emit
+        self.tracer = Tracer() if trace else None
+        self.root = self.tracer.start('research', 'job', **attributes) if self.tracer else None
+        self._tasks = {}       # task name -> open span
+        self._task_spans = {}  # crewAI task id -> span, for LLM and tool calls
+        self.first_token_seconds = {}  # task name -> time to its first LLM token
+        self._lock = threading.Lock()
+
+    def observe(self, kind, **fields):
+        if self.emit:
+            self.emit({'type': 'metric', 'timestamp': time.time(), 'kind': kind, **fields})
+
+    def _parent(self, task_id):
+        with self._lock:
+            return self._task_spans.get(str(task_id), self.root)
+
+    def task_started(self, name, task=None):
+        if not self.tracer:
+            return
+        span = self.tracer.start(name, 'task', parent=self.root)
+        with self._lock:
+            self._tasks[name] = span
+            if task is not None:
+                self._task_spans[str(task.id)] = span
+
+    def task_ended(self, name, outcome, first_token_seconds=None):
+        # Task durations reach the server through the task lifecycle events
+        with self._lock:
+            span = self._tasks.pop(name, None)
+            if first_token_seconds is not None:
+                self.first_token_seconds[name] = first_token_seconds
+        if span:
+            self.tracer.end(span, outcome=outcome, first_token_seconds=first_token_seconds)
+
+    @contextmanager
+    def crew_kickoff(self, tasks):
+        """Time a crew.kickoff() running the named tasks"""
+        span = self.tracer.start('crew', 'crew', parent=self.root, tasks=tasks) if self.tracer else None
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe('crew', outcome=outcome, seconds=round(time.perf_counter() - started, 3))
+            if span:
+                self.tracer.end(span, outcome=outcome)
+
+    def llm_call(self, record):
+        """A finished LLM call, as recorded by AgentMetrics"""
+        outcome = 'ok' if record['error'] is None else 'error'
+        self.observe('llm_call', agent=record['agent'], model=record['model'], outcome=outcome,
+                     seconds=record['seconds'], prompt_tokens=record['prompt_tokens'],
+                     completion_tokens=record['completion_tokens'])
+        if self.tracer and record['seconds'] is not None:
+            span = self.tracer.start(
+                record['model'], 'llm', parent=self._parent(record.get('task_id')),
+                start=record['timestamp'] - record['seconds'], agent=record['agent'],
+                prompt_tokens=record['prompt_tokens'], completion_tokens=record['completion_tokens']
+            )
+            self.tracer.end(span, end=record['timestamp'], outcome=outcome)
+
+    def tool_call(self, tool, task_id, outcome, started=None, finished=None):
+        seconds = round(finished - started, 3) if started is not None and finished is not None else None
+        self.observe('tool_call', tool=tool, outcome=outcome, seconds=seconds)
+        if self.tracer and seconds is not None:
+            span = self.tracer.start(tool, 'tool', parent=self._parent(task_id), start=started)
+            self.tracer.end(span, end=finished, outcome=outcome)
+
+    def cache_lookups(self, cache, hits, misses):
+        if hits or misses:
+            self.observe('cache', cache=cache, hits=hits, misses=misses)
+
+    def close(self):
+        """End the job's root span"""
+        if self.root and self.root['end'] is None:
+            self.tracer.end(self.root)
+
+
+class FirstTokens:
+    """
+    Time to first token of the tasks running in this process: from a task's
+    start to the first token of its LLM calls. A call that isn't streamed
+    delivers its first token with the whole response.
+    """
+
+    def __init__(self):
+        self._started = {}  # crewAI task id -> start time
+        self._first = {}    # crewAI task id -> seconds to its first token
+        self._lock = threading.Lock()
+
+    def start(self, task):
+        with self._lock:
+            self._started[str(task.id)] = time.perf_counter()
+            self._first.pop(str(task.id), None)
+
+    def token(self, task_id):
+        """Note that a task received a token; only its first one counts"""
+        with self._lock:
+            if task_id in self._started and task_id not in self._first:
+                self._first[task_id] = time.perf_counter() - self._started[task_id]
+
+    def stop(self, task):
+        """Stop timing a task; returns its time to first token in seconds, or None if it got none"""
+        with self._lock:
+            self._started.pop(str(task.id), None)
+            return self._first.pop(str(task.id), None)
+
+
+def first_token_completions(llm, first_tokens):
+    """
+    Count an LLM object's call()s returning as their task's first token (streamed
+    calls are caught earlier, by their first chunk event)
+    """
+    def wrap(call):
+        def timed_call(messages, *args, **kwargs):
+            result = call(messages, *args, **kwargs)
+            task = kwargs.get('from_task')
+            if task is not None:
+                first_tokens.token(str(task.id))
+            return result
+
+        return timed_call
+
+    return wrap_llm_call(llm, wrap)
+
+
+class Telemetry:
+    """
+    Process-wide hooks that feed the job in progress. A worker runs one job at
+    a time; outside job_scope() every hook is a no-op.
+    """
+
+    def __init__(self):
+        self.job = JobTelemetry()
+        self.first_tokens = FirstTokens()
+
+    @contextmanager
+    def job_scope(self, emit=None, trace=False, **attributes):
+        """Within the block, hooks report to a new JobTelemetry, which is yielded"""
+        job = JobTelemetry(emit, trace, **attributes)
+        self.job = job
+        try:
+            yield job
+        finally:
+            job.close()
+            self.job = JobTelemetry()
+
+    def register(self, event_bus):
+        """
+        Subscribe to an event bus's tool usage and stream chunk events; time to
+        first token is only seen on crewai releases with stream chunk events
+        """
+        from crewai.events import ToolUsageErrorEvent, ToolUsageFinishedEvent
+
+        chunk_event = stream_chunk_event()
+        if chunk_event is not None:
+            @event_bus.on(chunk_event)
+            def _first_chunk(source, event):
+                # Delivered synchronously on the calling thread, as the chunk arrives
+                self.first_tokens.token(event.task_id)
+
+        @event_bus.on(ToolUsageFinishedEvent)
+        def _tool_finished(source, event):
+            self.job.tool_call(event.tool_name, event.task_id, 'ok',
+                               event.started_at.timestamp(), event.finished_at.timestamp())
+
+        @event_bus.on(ToolUsageErrorEvent)
+        def _tool_failed(source, event):
+            self.job.tool_call(event.tool_name, event.task_id, 'error')
+
+
+# ============================================================================
+# SERVER SIDE: PROMETHEUS METRICS
+# ============================================================================
+
+# Research jobs, tasks and LLM calls take seconds to tens of minutes
+LONG_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+TOOL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+# A model load or a long uncached prompt shows up here
+FIRST_TOKEN_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+TASK_EVENT_OUTCOMES = {'task_finished': 'ok', 'task_failed': 'error', 'task_timed_out': 'timed_out'}
+
+
+class ResearchMetrics:
+    """
+    Prometheus metrics of the API server and its workers
+
+    Args:
+        registry: Registry to register the metrics in (defaults to a new one)
+    """
+
+    def __init__(self, registry=None):
+        if prometheus_client is None:
+            raise RuntimeError("prometheus_client is not installed")
+        p = prometheus_client
+        self.registry = registry or p.CollectorRegistry()
+        r = self.registry
+
+        self.jobs = p.Counter('research_jobs', 'Research executions finished', ['status'], registry=r)
+        self.job_seconds = p.Histogram(
+            'research_job_duration_seconds', 'Research executions from submission to finish',
+            ['status'], buckets=LONG_BUCKETS, registry=r)
+        self.queue_seconds = p.Histogram(
+            'research_job_queue_seconds', 'Time research executions waited for a worker',
+            buckets=LONG_BUCKETS, registry=r)
+        self.task_seconds = p.Histogram(
+            'research_task_duration_seconds', 'Research and report task wall time',
+            ['task', 'outcome'], buckets=LONG_BUCKETS, registry=r)
+        self.task_first_token_seconds = p.Histogram(
+            'research_task_first_token_seconds', "Time from a task's start to its first LLM token",
+            ['task'], buckets=FIRST_TOKEN_BUCKETS, registry=r)
+        self.crew_seconds = p.Histogram(
+            'research_crew_kickoff_seconds', 'Wall time of crew.kickoff()',
+            ['outcome'], buckets=LONG_BUCKETS, registry=r)
+        self.llm_seconds = p.Histogram(
+            'research_llm_call_duration_seconds', 'LLM call latency',
+            ['agent', 'model', 'outcome'], buckets=LONG_BUCKETS, registry=r)
+        self.llm_tokens = p.Counter(
+            'research_llm_tokens', 'Tokens of LLM calls', ['agent', 'model', 'type'], registry=r)
+        self.tool_calls = p.Counter(
+            'research_tool_calls', 'Agent tool calls', ['tool', 'outcome'], registry=r)
+        self.tool_seconds = p.Histogram(
+            'research_tool_call_duration_seconds', 'Agent tool call latency',
+            ['tool', 'outcome'], buckets=TOOL_BUCKETS, registry=r)
+        self.cache_lookups = p.Counter(
+            'research_cache_lookups', 'Result, LLM completion and web cache lookups',
+            ['cache', 'result'], registry=r)
+        self._gauges = {
+            name: p.Gauge(name, documentation, registry=r)
+            for name, documentation in (
+                ('research_queue_depth', 'Research executions waiting for a slot'),
+                ('research_jobs_running', 'Research executions running'),
+                ('research_workers', 'Worker processes in the pool'),
+                ('research_workers_busy', 'Worker processes running a job'),
+            )
+        }
+
+    def watch(self, scheduler_stats, pool_stats):
+        """Read queue depth and worker counts from callables at scrape time"""
+        self._gauges['research_queue_depth'].set_function(lambda: scheduler_stats()['pending'])
+        self._gauges['research_jobs_running'].set_function(lambda: scheduler_stats()['running'])
+        self._gauges['research_workers'].set_function(lambda: pool_stats()['workers'])
+        self._gauges['research_workers_busy'].set_function(lambda: pool_stats()['busy'])
+
+    def job_finished(self, status, seconds, queued_seconds=None):
+        self.jobs.labels(status).inc()
+        self.job_seconds.labels(status).observe(seconds)
+        if queued_seconds is not None:
+            self.queue_seconds.observe(queued_seconds)
+
+    def cache_lookup(self, cache, hit):
+        self.cache_lookups.labels(cache, 'hit' if hit else 'miss').inc()
+
+    def observe(self, event):
+        """Record a worker event: task lifecycle events and metric observations"""
+        kind = event.get('kind') if event['type'] == 'metric' else event['type']
+        if kind in TASK_EVENT_OUTCOMES:
+            self.task_seconds.labels(event['task'], TASK_EVENT_OUTCOMES[kind]).observe(event['duration_seconds'])
+            if event.get('first_token_seconds') is not None:
+                self.task_first_token_seconds.labels(event['task']).observe(event['first_token_seconds'])
+        elif kind == 'crew':
+            self.crew_seconds.labels(event['outcome']).observe(event['seconds'])
+        elif kind == 'llm_call':
+            labels = (event['agent'], str(event['model']))
+            if event['seconds'] is not None:
+                self.llm_seconds.labels(*labels, event['outcome']).observe(event['seconds'])
+            self.llm_tokens.labels(*labels, 'prompt').inc(event['prompt_tokens'] or 0)
+            self.llm_tokens.labels(*labels, 'completion').inc(event['completion_tokens'] or 0)
+        elif kind == 'tool_call':
+            self.tool_calls.labels(event['tool'], event['outcome']).inc()
+            if event['seconds'] is not None:
+                self.tool_seconds.labels(event['tool'], event['outcome']).observe(event['seconds'])
+        elif kind == 'cache':
+            self.cache_lookups.labels(event['cache'], 'hit').inc(event['hits'])
+            self.cache_lookups.labels(event['cache'], 'miss').inc(event['misses'])
+
+    def render(self):
+        """(body, content type) of the Prometheus text exposition"""
+        return prometheus_client.generate_latest(self.registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,312 @@
+"""
+Pooled, cached HTTP layer for the agents' web tools
+The scrape and search tools fetch the same pages (patent and trial registry
+entries for a molecule) over and over, across tasks and across jobs. Requests
+go through one keep-alive session with a per-host concurrency limit, responses
+are kept in an on-disk cache that revalidates with ETag/Last-Modified once
+their TTL runs out, and duplicate fetches within a job are made only once.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlparse
+
+import requests
+from crewai_tools import ScrapeWebsiteTool, SerperDevTool
+from pydantic import Field
+
+try:
+    from crewai_tools.security.safe_path import validate_url
+    from crewai_tools.security.ssrf_adapter import SSRFProtectedAdapter
+except ImportError:  # older crewai-tools releases fetch without SSRF checks
+    from requests.adapters import HTTPAdapter as SSRFProtectedAdapter
+
+    def validate_url(url):
+        return url
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class CachedResponse:
+    """The parts of a response the tools use, whether fetched or cached"""
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        encoding = requests.utils.get_encoding_from_headers(self.headers) or 'utf-8'
+        return self.content.decode(encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+
+class WebClient:
+    """
+    Shared HTTP client for the web tools
+
+    Args:
+        cache_path: SQLite file for the response cache
+        ttl_seconds: How long a cached response is served before revalidating; 0
+            disables the disk cache
+        max_bytes: Size the response cache is trimmed back to
+        max_per_host: Requests allowed in flight to one host at a time
+    """
+
+    def __init__(self, cache_path, ttl_seconds=86400, max_bytes=256 * 1024 * 1024,
+                 max_per_host=4):
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_per_host = max_per_host
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._job_fetches = None
+        self.counters = {'fetches': 0, 'cache_hits': 0, 'revalidated': 0, 'deduplicated': 0}
+
+        self.session = requests.Session()
+        self.session.trust_env = False
+        adapter = SSRFProtectedAdapter(pool_connections=32, pool_maxsize=max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        if ttl_seconds > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            connection = self._connection()
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.cache_path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    @contextmanager
+    def job_scope(self):
+        """Within the block, each distinct request is made at most once"""
+        with self._lock:
+            self._job_fetches = {}
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._job_fetches = None
+
+    def get(self, url, headers=None, timeout=15):
+        return self.request('GET', url, headers=headers, timeout=timeout)
+
+    def post_json(self, url, payload, headers=None, timeout=10):
+        return self.request('POST', url, headers=headers, json_body=payload, timeout=timeout)
+
+    def request(self, method, url, headers=None, json_body=None, timeout=15):
+        """
+        Fetch a URL through the job dedupe table, the disk cache and the pool
+
+        Headers are not part of the cache key, so API keys never are either.
+
+        Returns:
+            CachedResponse
+        """
+        body = json.dumps(json_body, sort_keys=True) if json_body is not None else ''
+        key = hashlib.sha256(f"{method}\0{url}\0{body}".encode('utf-8')).hexdigest()
+
+        with self._lock:
+            fetches = self._job_fetches
+            future = fetches.get(key) if fetches is not None else None
+            owner = fetches is not None and future is None
+            if owner:
+                future = fetches[key] = Future()
+        if fetches is not None and not owner:
+            self._count('deduplicated')
+            return future.result()
+
+        try:
+            response = self._fetch(key, method, url, headers, json_body, timeout)
+        except BaseException as e:
+            if owner:
+                with self._lock:
+                    fetches.pop(key, None)  # let a later call retry
+                future.set_exception(e)
+            raise
+        if owner:
+            future.set_result(response)
+        return response
+
+    def _fetch(self, key, method, url, headers, json_body, timeout):
+        cached = self._load(key) if self.ttl_seconds > 0 else None
+        if cached and time.time() - cached['fetched_at'] < self.ttl_seconds:
+            self._count('cache_hits')
+            return self._to_response(cached)
+
+        headers = dict(headers or {})
+        if cached:
+            if cached['headers'].get('ETag'):
+                headers['If-None-Match'] = cached['headers']['ETag']
+            if cached['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = cached['headers']['Last-Modified']
+
+        validate_url(url)
+        with self._host_slot(urlparse(url).netloc):
+            self._count('fetches')
+            response = self.session.request(method, url, headers=headers, json=json_body,
+                                            timeout=timeout)
+
+        if cached and response.status_code == 304:
+            self._count('revalidated')
+            self._touch(key)
+            return self._to_response(cached)
+
+        result = CachedResponse(response.url, response.status_code,
+                                {name: response.headers[name] for name in response.headers},
+                                response.content)
+        cache_control = response.headers.get('Cache-Control', '')
+        if self.ttl_seconds > 0 and response.status_code == 200 and 'no-store' not in cache_control:
+            self._store(key, result)
+        return result
+
+    @contextmanager
+    def _host_slot(self, host):
+        with self._lock:
+            slot = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        with slot:
+            yield
+
+    def _to_response(self, entry):
+        return CachedResponse(entry['url'], entry['status'], entry['headers'], entry['body'],
+                              from_cache=True)
+
+    def _load(self, key):
+        row = self._connection().execute(
+            "SELECT url, status, headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, fetched_at = row
+        return {'url': url, 'status': status, 'headers': json.loads(headers),
+                'body': zlib.decompress(body), 'fetched_at': fetched_at}
+
+    def _touch(self, key):
+        now = time.time()
+        self._connection().execute(
+            "UPDATE responses SET fetched_at = ?, last_used = ? WHERE key = ?", (now, now, key)
+        )
+
+    def _store(self, key, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        blob = zlib.compress(response.content)
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, url, status, headers, body, fetched_at, last_used, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, response.url, response.status_code, json.dumps(headers), blob, now, now, len(blob))
+        )
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            for old_key, size in connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes * 0.9:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                total -= size
+
+    def stats(self):
+        """Request counters for this process"""
+        with self._lock:
+            return dict(self.counters)
+
+
+# ============================================================================
+# TOOLS
+# ============================================================================
+
+class PooledScrapeWebsiteTool(ScrapeWebsiteTool):
+    """ScrapeWebsiteTool that fetches through a shared WebClient"""
+
+    client: Any = Field(default=None, exclude=True)
+
+    def _run(self, **kwargs: Any) -> Any:
+        website_url = kwargs.get("website_url", self.website_url)
+        if website_url is None:
+            raise ValueError("Website URL must be provided.")
+
+        page = self.client.get(website_url, headers=self.headers)
+        parsed = BeautifulSoup(page.content, "html.parser")
+
+        text = "The following text is scraped website content:\n\n"
+        text += parsed.get_text(" ")
+        text = re.sub("[ \t]+", " ", text)
+        return re.sub("\\s+\n\\s+", "\n", text)
+
+
+class PooledSerperDevTool(SerperDevTool):
+    """SerperDevTool whose API calls go through a shared WebClient"""
+
+    client: Any = Field(default=None, exclude=True)
+
+    def _make_api_request(self, search_query, search_type):
+        payload = {"q": search_query, "num": self.n_results}
+        if self.country != "":
+            payload["gl"] = self.country
+        if self.location != "":
+            payload["location"] = self.location
+        if self.locale != "":
+            payload["hl"] = self.locale
+
+        headers = {"X-API-KEY": os.environ["SERPER_API_KEY"], "content-type": "application/json"}
+        response = self.client.post_json(self._get_search_url(search_type), payload, headers=headers)
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise ValueError("Empty response from Serper API")
+        return dict(results)
@@ -0,0 +1,298 @@
+"""
+Warm worker pool for the pharmaceutical research API
+Each worker process imports main.py once and keeps its LLM client, tools and
+agents alive between jobs. A crash, timeout or cancellation in one worker only
+fails the job it was running; the slot respawns a fresh worker for the next job.
+A job's output can be captured to its own rotating log (see job_logs.py).
+"""
+
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+from job_logs import JobLog
+
+
+# Modules imported, or 'module:function' warm-up hooks called, by every worker
+# before it reports ready
+PRELOAD_MODULES = ['main:warm_up']
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a worker process dies while running a job"""
+
+
+class JobCancelledError(RuntimeError):
+    """Raised for a job whose worker was stopped by WorkerPool.cancel()"""
+
+
+def resolve_target(target):
+    """Resolve a 'module:function' string to the callable it names"""
+    module_name, _, function_name = target.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _locked_sender(conn):
+    """Callable sending a (kind, payload) message to the pool; safe to call from any thread"""
+    lock = threading.Lock()
+
+    def send(kind, payload):
+        with lock:
+            conn.send((kind, payload))
+
+    return send
+
+
+def _worker_main(conn, preload):
+    """Worker process entry point: import heavy modules once, then serve jobs"""
+    for target in preload:
+        if ':' in target:
+            resolve_target(target)()
+        else:
+            importlib.import_module(target)
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+
+        target, args, kwargs, wants_events, log = job
+        # Events and the outcome share one lock, so an event sent by a thread
+        # the job left running can't interleave with the outcome on the pipe
+        send = _locked_sender(conn)
+        if wants_events:
+            kwargs['on_event'] = lambda event: send('event', event)
+        job_log = JobLog(*log) if log else None
+        with job_log.capture() if job_log else nullcontext():
+            try:
+                result = resolve_target(target)(*args, **kwargs)
+                outcome = ('result', result)
+            except Exception as e:
+                traceback.print_exc()
+                outcome = ('error', f"{type(e).__name__}: {e}")
+        if job_log:
+            job_log.close()
+        send(*outcome)
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of long-lived worker processes fed from a job queue
+
+    Args:
+        size: Number of worker processes
+        job_timeout: Seconds a single job may run before its worker is killed
+        preload: Modules each worker imports (or 'module:function' hooks it
+            calls) before taking jobs
+        log_max_bytes: Segment size of job logs (see submit's log_dir)
+        log_backups: Older segments each job log keeps
+    """
+
+    def __init__(self, size=2, job_timeout=1800, preload=None, log_max_bytes=1024 * 1024, log_backups=4):
+        self.size = size
+        self.job_timeout = job_timeout
+        self.preload = PRELOAD_MODULES if preload is None else preload
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self._context = multiprocessing.get_context('spawn')
+        self._jobs = queue.Queue()
+        self._ready = threading.Semaphore(0)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._running = {}  # future -> process running its job
+        self._cancelled = set()
+        self._slots = []
+        for index in range(size):
+            slot = threading.Thread(target=self._run_slot, name=f'worker-slot-{index}', daemon=True)
+            slot.start()
+            self._slots.append(slot)
+
+    def submit(self, target, args=(), kwargs=None, on_start=None, on_event=None, log_dir=None):
+        """
+        Queue a job for the next free worker
+
+        Args:
+            target: 'module:function' to call inside the worker
+            args: Positional arguments for the target (must be picklable)
+            kwargs: Keyword arguments for the target (must be picklable)
+            on_start: Optional callable invoked when a worker picks the job up
+            on_event: Optional callable receiving events the job emits; the
+                target is called with a matching on_event keyword argument
+            log_dir: Optional directory the job's stdout and stderr are
+                written to as a JobLog, instead of the server's terminal
+
+        Returns:
+            concurrent.futures.Future resolved with the target's return value
+        """
+        if self._closed:
+            raise RuntimeError("Worker pool is shut down")
+        future = Future()
+        log = (log_dir, self.log_max_bytes, self.log_backups) if log_dir else None
+        job = (target, tuple(args), kwargs or {}, on_event is not None, log)
+        self._jobs.put((future, job, on_start, on_event))
+        return future
+
+    def cancel(self, future):
+        """
+        Cancel a job: a queued job is dropped, a running one has its worker
+        killed, which stops its LLM and tool calls (the slot starts a fresh
+        worker for the next job). The future then raises JobCancelledError,
+        or CancelledError if the job never started.
+
+        Returns:
+            False if the job had already finished
+        """
+        if future.cancel():
+            return True
+        with self._lock:
+            if future not in self._running:
+                return False
+            self._cancelled.add(future)
+            process = self._running[future]
+        # A job whose worker is still starting is failed once the worker is up
+        if process is not None:
+            process.kill()
+        return True
+
+    def stats(self):
+        """Worker processes in the pool and how many are running a job"""
+        with self._lock:
+            return {'workers': self.size, 'busy': len(self._running)}
+
+    def wait_until_ready(self, timeout=None):
+        """Block until every worker has finished preloading"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in range(self.size):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not self._ready.acquire(timeout=remaining):
+                return False
+        for _ in range(self.size):
+            self._ready.release()
+        return True
+
+    def shutdown(self):
+        """Stop accepting jobs and let every worker exit after its current job"""
+        self._closed = True
+        for _ in self._slots:
+            self._jobs.put(None)
+
+    def _start_worker(self):
+        """Spawn a worker and wait for it to finish preloading"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.preload), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        try:
+            parent_conn.recv()  # ('ready', pid)
+        except EOFError:
+            process.join()
+            parent_conn.close()
+            return None, None
+        return process, parent_conn
+
+    def _deliver(self, on_event, event):
+        try:
+            on_event(event)
+        except Exception:
+            traceback.print_exc()
+
+    def _stop_worker(self, process, conn):
+        process.kill()
+        process.join()
+        conn.close()
+
+    def _run_slot(self):
+        process, conn = self._start_worker()
+        if process:
+            self._ready.release()
+
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            future, job, on_start, on_event = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._running[future] = None
+
+            if not (process and process.is_alive()):
+                if process:
+                    conn.close()
+                process, conn = self._start_worker()
+                if not process:
+                    with self._lock:
+                        self._running.pop(future, None)
+                        self._cancelled.discard(future)
+                    future.set_exception(WorkerCrashedError("Worker failed to start"))
+                    continue
+
+            with self._lock:
+                self._running[future] = process
+                cancelled = future in self._cancelled
+            if cancelled:
+                with self._lock:
+                    self._running.pop(future, None)
+                    self._cancelled.discard(future)
+                future.set_exception(JobCancelledError("Job was cancelled"))
+                continue
+
+            if on_start:
+                on_start()
+
+            try:
+                conn.send(job)
+                deadline = time.monotonic() + self.job_timeout
+                while True:
+                    if not conn.poll(max(0, deadline - time.monotonic())):
+                        raise TimeoutError(f"Job exceeded {self.job_timeout} seconds")
+                    kind, payload = conn.recv()
+                    if kind != 'event':
+                        break
+                    self._deliver(on_event, payload)
+            except (EOFError, OSError, TimeoutError) as e:
+                # The worker died, hung or was cancelled; fail this job and start a fresh worker
+                self._stop_worker(process, conn)
+                with self._lock:
+                    self._running.pop(future, None)
+                    cancelled = future in self._cancelled
+                    self._cancelled.discard(future)
+                if cancelled:
+                    future.set_exception(JobCancelledError("Job was cancelled"))
+                elif isinstance(e, TimeoutError):
+                    future.set_exception(e)
+                else:
+                    future.set_exception(WorkerCrashedError(
+                        f"Worker exited with code {process.exitcode} while running the job"
+                    ))
+                process, conn = self._start_worker()
+                continue
+
+            with self._lock:
+                self._running.pop(future, None)
+                # Cancelled just as it finished; the slot replaces the killed worker
+                self._cancelled.discard(future)
+            if kind == 'result':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+        if process:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+            conn.close()
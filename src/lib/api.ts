@@ -5,16 +5,28 @@
 // Configure your backend URL here
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
+export interface CacheInfo {
+  hit: boolean;
+  age_seconds?: number;
+}
+
 export interface StartResearchResponse {
   job_id: string;
   message: string;
+  cache: CacheInfo;
+  attached_callers: number;
 }
 
 export interface ResearchStatusResponse {
   job_id: string;
   molecule_name: string;
-  status: 'pending' | 'running' | 'complete' | 'error';
+  status: 'pending' | 'running' | 'complete' | 'error' | 'cancelled';
   elapsed_seconds: number;
+  cache: CacheInfo;
+  attached_callers: number;
+  queue_position?: number;
+  estimated_start_seconds?: number;
+  estimated_start_at?: number;
   result?: string;
   error?: string;
 }
@@ -23,6 +35,7 @@ export interface ResearchResultResponse {
   job_id: string;
   molecule_name: string;
   result: string;
+  cache: CacheInfo;
 }
 
 /**
@@ -37,16 +50,38 @@ export async function checkHealth(): Promise<boolean> {
   }
 }
 
+export type ResearchPriority = 'high' | 'normal' | 'low';
+
+export type ResearchSection =
+  | 'market'
+  | 'trade'
+  | 'patent'
+  | 'clinical_trials'
+  | 'internal_knowledge'
+  | 'web_intelligence';
+
 /**
- * Start a new research job for a molecule
+ * Start a new research job for a molecule.
+ * Pass forceRefresh to bypass the server's result cache and research every
+ * section again, or sections to research only those again.
  */
-export async function startResearch(moleculeName: string): Promise<StartResearchResponse> {
+export async function startResearch(
+  moleculeName: string,
+  forceRefresh = false,
+  priority: ResearchPriority = 'normal',
+  sections?: ResearchSection[]
+): Promise<StartResearchResponse> {
   const response = await fetch(`${API_BASE_URL}/api/research/start`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ molecule_name: moleculeName }),
+    body: JSON.stringify({
+      molecule_name: moleculeName,
+      force_refresh: forceRefresh,
+      priority,
+      sections,
+    }),
   });
 
   if (!response.ok) {
@@ -84,3 +119,89 @@ export async function getResearchResult(jobId: string): Promise<ResearchResultRe
 
   return response.json();
 }
+
+/**
+ * Cancel a pending or running research job. The job's worker is stopped
+ * unless other callers are waiting on the same research.
+ */
+export async function cancelResearch(jobId: string): Promise<void> {
+  const response = await fetch(`${API_BASE_URL}/api/research/${jobId}`, { method: 'DELETE' });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to cancel research');
+  }
+}
+
+export type ResearchEvent =
+  | { type: 'job_started'; timestamp: number }
+  | { type: 'task_started'; timestamp: number; task: string }
+  | { type: 'task_finished'; timestamp: number; task: string; duration_seconds: number }
+  | { type: 'task_failed'; timestamp: number; task: string; duration_seconds: number; error: string }
+  | {
+      type: 'task_timed_out';
+      timestamp: number;
+      task: string;
+      duration_seconds: number;
+      deadline_seconds: number;
+    }
+  | {
+      type: 'context_compacted';
+      timestamp: number;
+      budget_tokens: number;
+      sections: Record<string, { input_tokens: number; output_tokens: number }>;
+    }
+  | { type: 'sections_reused'; timestamp: number; sections: Record<string, number> }
+  | { type: 'sections_missing'; timestamp: number; sections: Record<string, string> }
+  | { type: 'report_token'; timestamp: number; text: string }
+  | { type: 'report_restart'; timestamp: number }
+  | { type: 'job_complete'; timestamp: number; result: string }
+  | { type: 'job_error'; timestamp: number; error: string }
+  | { type: 'job_cancelled'; timestamp: number };
+
+const RESEARCH_EVENT_TYPES: ResearchEvent['type'][] = [
+  'job_started',
+  'task_started',
+  'task_finished',
+  'task_failed',
+  'task_timed_out',
+  'context_compacted',
+  'sections_reused',
+  'sections_missing',
+  'report_token',
+  'report_restart',
+  'job_complete',
+  'job_error',
+  'job_cancelled',
+];
+
+/**
+ * Subscribe to a research job's progress stream (Server-Sent Events).
+ * The stream closes itself after job_complete, job_error or job_cancelled.
+ * Returns a function that closes the stream.
+ */
+export function subscribeToResearchEvents(
+  jobId: string,
+  onEvent: (event: ResearchEvent) => void,
+  onStreamError?: () => void
+): () => void {
+  const source = new EventSource(`${API_BASE_URL}/api/research/events/${jobId}`);
+
+  RESEARCH_EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (message) => {
+      const event = JSON.parse((message as MessageEvent).data) as ResearchEvent;
+      if (event.type === 'job_complete' || event.type === 'job_error' || event.type === 'job_cancelled') {
+        source.close();
+      }
+      onEvent(event);
+    });
+  });
+
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      onStreamError?.();
+    }
+  };
+
+  return () => source.close();
+}
@@ -4,7 +4,7 @@ import { ResearchForm } from '@/components/ResearchForm';
 import { ProgressBar } from '@/components/ProgressBar';
 import { ResultsPanel } from '@/components/ResultsPanel';
 import { toast } from '@/hooks/use-toast';
-import { startResearch, getResearchStatus, checkHealth } from '@/lib/api';
+import { startResearch, getResearchStatus, checkHealth, subscribeToResearchEvents } from '@/lib/api';
 
 type AppState = 'idle' | 'loading' | 'complete';
 
@@ -12,25 +12,35 @@ const Index = () => {
   const [appState, setAppState] = useState<AppState>('idle');
   const [moleculeName, setMoleculeName] = useState('');
   const [reportContent, setReportContent] = useState('');
+  const [partialReport, setPartialReport] = useState('');
   const [elapsedSeconds, setElapsedSeconds] = useState(0);
   const [backendConnected, setBackendConnected] = useState<boolean | null>(null);
   const jobIdRef = useRef<string | null>(null);
   const pollingRef = useRef<NodeJS.Timeout | null>(null);
+  const unsubscribeRef = useRef<(() => void) | null>(null);
 
   // Check backend connection on mount
   useEffect(() => {
     checkHealth().then(setBackendConnected);
   }, []);
 
-  // Cleanup polling on unmount
+  // Cleanup polling and event stream on unmount
   useEffect(() => {
     return () => {
       if (pollingRef.current) {
         clearInterval(pollingRef.current);
       }
+      unsubscribeRef.current?.();
     };
   }, []);
 
+  const startPolling = useCallback((poll: () => void) => {
+    // Start polling for status every 10 seconds
+    pollingRef.current = setInterval(poll, 10000);
+    // Also poll immediately after a short delay
+    setTimeout(poll, 2000);
+  }, []);
+
   const pollStatus = useCallback(async () => {
     if (!jobIdRef.current) return;
 
@@ -64,6 +74,18 @@ const Index = () => {
           description: status.error || "An error occurred during research.",
           variant: "destructive",
         });
+      } else if (status.status === 'cancelled') {
+        // Stop polling
+        if (pollingRef.current) {
+          clearInterval(pollingRef.current);
+          pollingRef.current = null;
+        }
+
+        setAppState('idle');
+        toast({
+          title: "Research Cancelled",
+          description: "The research job was cancelled.",
+        });
       }
     } catch (error) {
       console.error('Error polling status:', error);
@@ -74,6 +96,7 @@ const Index = () => {
     setMoleculeName(name);
     setAppState('loading');
     setElapsedSeconds(0);
+    setPartialReport('');
 
     // Check if backend is connected
     const isConnected = await checkHealth();
@@ -144,10 +167,47 @@ Based on the comprehensive analysis, strategic recommendations for market entry
         description: `Analyzing ${name} with multi-agent system...`,
       });
 
-      // Start polling for status every 10 seconds
-      pollingRef.current = setInterval(pollStatus, 10000);
-      // Also poll immediately after a short delay
-      setTimeout(pollStatus, 2000);
+      // Follow progress over the event stream; fall back to polling if it drops
+      const startedAt = Date.now();
+      unsubscribeRef.current = subscribeToResearchEvents(
+        response.job_id,
+        (event) => {
+          setElapsedSeconds(Math.floor((Date.now() - startedAt) / 1000));
+
+          if (event.type === 'report_token') {
+            setPartialReport((text) => text + event.text);
+          } else if (event.type === 'report_restart') {
+            setPartialReport('');
+          } else if (event.type === 'job_complete') {
+            unsubscribeRef.current = null;
+            setReportContent(event.result);
+            setAppState('complete');
+            toast({
+              title: "Analysis Complete",
+              description: "Your research report is ready for download.",
+            });
+          } else if (event.type === 'job_error') {
+            unsubscribeRef.current = null;
+            setAppState('idle');
+            toast({
+              title: "Research Error",
+              description: event.error || "An error occurred during research.",
+              variant: "destructive",
+            });
+          } else if (event.type === 'job_cancelled') {
+            unsubscribeRef.current = null;
+            setAppState('idle');
+            toast({
+              title: "Research Cancelled",
+              description: "The research job was cancelled.",
+            });
+          }
+        },
+        () => {
+          unsubscribeRef.current = null;
+          startPolling(pollStatus);
+        }
+      );
     } catch (error) {
       console.error('Error starting research:', error);
       setAppState('idle');
@@ -157,11 +217,11 @@ Based on the comprehensive analysis, strategic recommendations for market entry
         variant: "destructive",
       });
     }
-  }, [pollStatus]);
+  }, [pollStatus, startPolling]);
 
   const handleComplete = useCallback(() => {
     // This is called by ProgressBar in demo mode
-    // In real mode, completion is handled by polling
+    // In real mode, completion is handled by the event stream (or polling)
   }, []);
 
   const handleDownload = useCallback(() => {
@@ -235,6 +295,7 @@ Based on the comprehensive analysis, strategic recommendations for market entry
     setAppState('idle');
     setMoleculeName('');
     setReportContent('');
+    setPartialReport('');
     setElapsedSeconds(0);
   }, []);
 
@@ -287,6 +348,16 @@ Based on the comprehensive analysis, strategic recommendations for market entry
               duration={backendConnected ? 900000 : 15000} // 15 min for real, 15 sec for demo
               onComplete={handleComplete}
             />
+            {partialReport && (
+              <div className="w-full max-w-2xl mx-auto max-h-96 overflow-y-auto rounded-lg border border-border bg-secondary/50 p-4">
+                <p className="text-xs uppercase tracking-wide text-muted-foreground mb-2">
+                  Report preview (writing...)
+                </p>
+                <pre className="whitespace-pre-wrap text-sm text-foreground font-sans">
+                  {partialReport}
+                </pre>
+              </div>
+            )}
           </div>
         )}
 